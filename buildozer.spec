@@ -66,6 +66,7 @@ requirements =
     kivy-garden.zbarcam==2019.1020,
     layoutmargin==20190911,
     lru-dict==1.1.5,
+    numpy==1.18.1,
     openssl,
     oscpy==0.3.0,
     parsimonious==0.8.1,
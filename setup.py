@@ -41,6 +41,7 @@ setup_params = {
         'eth-utils',
         'kivy-garden.kivymd',
         'layoutmargin',
+        'numpy',
         'oscpy',
         'pyetheroll>=20200320',
         'python-dotenv',
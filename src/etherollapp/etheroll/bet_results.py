@@ -0,0 +1,188 @@
+"""
+Pending bets results lookup.
+Rather than refetching the whole account history, each pending bet result
+is looked up with a narrow log query: contract address, `LogResult` topic
+and bet id, from the block the bet was mined in.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic, sleep
+
+from hexbytes import HexBytes
+from pyetheroll.constants import ROUND_DIGITS
+
+from etherollapp.etheroll import rpc
+
+logger = logging.getLogger(__name__)
+
+# how often pending bets results get looked up
+RESULT_POLL_SECONDS = 10
+# the oracle usually resolves bets within minutes
+RESULT_TIMEOUT_SECONDS = 60 * 60
+# results kept for display until the roll history has them, the most
+# recent ones only
+MAX_RESULTS = 100
+
+
+def get_topic_position(contract_abi, event_name, input_name):
+    """
+    Returns the topic index of the event indexed input, topic 0 being the
+    event signature.
+    """
+    event = next(
+        definition for definition in contract_abi
+        if definition['type'] == 'event' and definition['name'] == event_name)
+    indexed_inputs = [
+        event_input['name'] for event_input in event['inputs']
+        if event_input.get('indexed')]
+    return indexed_inputs.index(input_name) + 1
+
+
+def build_result_filter(pyetheroll, bet_id, from_block):
+    """Returns the `eth_getLogs` filter matching the bet `LogResult`."""
+    position = get_topic_position(
+        pyetheroll.contract_abi, 'LogResult', 'BetID')
+    topics = [None] * (position + 1)
+    topics[0] = pyetheroll.events_signatures['LogResult'].hex()
+    topics[position] = HexBytes(bet_id).hex()
+    return {
+        'address': pyetheroll.contract_address,
+        'fromBlock': hex(from_block),
+        'toBlock': 'latest',
+        'topics': topics,
+    }
+
+
+def decode_result_log(pyetheroll, log):
+    """
+    Decodes the `LogResult` event log, returns a bet result dictionary like
+    `Etheroll.get_bet_results_logs()` ones.
+    """
+    # lazy loading
+    from pyetheroll.transaction_debugger import TransactionDebugger
+    transaction_debugger = TransactionDebugger(pyetheroll.contract_abi)
+    topics = [HexBytes(topic) for topic in log['topics']]
+    call = transaction_debugger.decode_method(topics, log['data'])['call']
+    return {
+        'bet_id': call['BetID'].hex(),
+        'roll_under': call['PlayerNumber'],
+        'dice_result': call['DiceResult'],
+        'bet_value_ether': round(call['Value'] / 1e18, ROUND_DIGITS),
+        'transaction_hash': HexBytes(log['transactionHash']).hex(),
+    }
+
+
+def get_bet_results(pyetheroll, bet_logs):
+    """
+    Returns the results of the bets, `None` for the ones not yet resolved.
+    Several bets are looked up with a single batch request.
+    """
+    filters = [
+        build_result_filter(
+            pyetheroll, bet_log['bet_id'], bet_log['block_number'])
+        for bet_log in bet_logs
+    ]
+    if len(filters) == 1:
+        results = [rpc.request(pyetheroll, 'eth_getLogs', filters)]
+    else:
+        results = rpc.batch_request(
+            pyetheroll, [('eth_getLogs', [f]) for f in filters])
+    bet_results = []
+    for bet_log, logs in zip(bet_logs, results):
+        if isinstance(logs, rpc.RPCError):
+            # will be looked up again on next poll
+            logger.warning(
+                'Error getting bet %s result: %s', bet_log['bet_id'], logs)
+            logs = None
+        bet_result = decode_result_log(pyetheroll, logs[0]) if logs else None
+        bet_results.append(bet_result)
+    return bet_results
+
+
+class PendingBetWatcher:
+    """
+    Watches bets placed from the app until the oracle resolves them.
+    `on_result(bet_log, bet_result)` gets called from the watcher thread,
+    which only lives while there are pending bets.
+    """
+
+    def __init__(
+            self, on_result, poll_seconds=RESULT_POLL_SECONDS,
+            timeout_seconds=RESULT_TIMEOUT_SECONDS, clock=monotonic):
+        self.on_result = on_result
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # bet_id -> (bet_log, pyetheroll, watch start time)
+        self._pending = {}
+        self._thread = None
+        # bet_id -> bet result, up to `MAX_RESULTS` most recent
+        self.results = OrderedDict()
+
+    def watch(self, pyetheroll, bet_log):
+        """Watches the bet decoded from its mined transaction receipt."""
+        with self._lock:
+            self._pending[bet_log['bet_id']] = (
+                bet_log, pyetheroll, self._clock())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.start()
+
+    def join(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            sleep(self.poll_seconds)
+            self.poll()
+
+    def poll(self):
+        """Looks up pending bets results once, one request per chain."""
+        with self._lock:
+            pending = list(self._pending.values())
+        chains = {}
+        for item in pending:
+            _, pyetheroll, _ = item
+            chains.setdefault(id(pyetheroll), []).append(item)
+        done = []
+        for items in chains.values():
+            pyetheroll = items[0][1]
+            bet_logs = [bet_log for bet_log, _, _ in items]
+            try:
+                bet_results = get_bet_results(pyetheroll, bet_logs)
+            except Exception:
+                # network hiccup, will try again next time
+                logger.exception('Error looking up bet results')
+                bet_results = [None] * len(items)
+            for (bet_log, _, start_time), bet_result in zip(
+                    items, bet_results):
+                bet_id = bet_log['bet_id']
+                if bet_result is not None:
+                    self.add_result(bet_id, bet_result)
+                    done.append(bet_id)
+                    self.notify(bet_log, bet_result)
+                elif self._clock() - start_time >= self.timeout_seconds:
+                    logger.info('Stopped watching bet %s', bet_id)
+                    done.append(bet_id)
+        with self._lock:
+            for bet_id in done:
+                self._pending.pop(bet_id, None)
+
+    def add_result(self, bet_id, bet_result):
+        self.results[bet_id] = bet_result
+        while len(self.results) > MAX_RESULTS:
+            self.results.popitem(last=False)
+
+    def notify(self, bet_log, bet_result):
+        try:
+            self.on_result(bet_log, bet_result)
+        except Exception:
+            logger.exception('Error notifying bet %s', bet_log['bet_id'])
@@ -0,0 +1,233 @@
+"""
+Chain head tracking and block-number-keyed read cache.
+Nothing read from the chain can change until a new block is mined, so reads
+made within the same block are served from memory.
+One head tracker and cache per chain, shared by the whole process.
+"""
+import logging
+import threading
+from time import monotonic
+from typing import Dict
+
+from eth_utils import to_int
+from pyetheroll.constants import ROUND_DIGITS, ChainID
+
+from etherollapp.etheroll import history, rpc
+
+logger = logging.getLogger(__name__)
+
+# roughly the Ethereum block time
+BLOCK_INTERVAL_SECONDS = 13
+
+
+class HeadTracker:
+    """
+    Keeps track of the chain head block number, fetching it at most once per
+    block interval.
+    Listeners get called with the new block number when the head moves.
+    """
+
+    # chain_id -> HeadTracker
+    _head_trackers: Dict[ChainID, 'HeadTracker'] = {}
+    _head_trackers_lock = threading.Lock()
+
+    def __init__(
+            self, get_block_number, interval=BLOCK_INTERVAL_SECONDS,
+            clock=monotonic):
+        self.get_block_number = get_block_number
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._block_number = None
+        self._polled_at = None
+
+    @classmethod
+    def get_or_create(cls, pyetheroll):
+        chain_id = pyetheroll.chain_id
+        with cls._head_trackers_lock:
+            head_tracker = cls._head_trackers.get(chain_id)
+            if head_tracker is None:
+                # fails over to the other chain endpoints
+                head_tracker = cls(lambda: to_int(hexstr=rpc.request(
+                    pyetheroll, 'eth_blockNumber', [])))
+                cls._head_trackers[chain_id] = head_tracker
+        return head_tracker
+
+    def bind(self, listener):
+        self._listeners.append(listener)
+
+    def unbind(self, listener):
+        self._listeners.remove(listener)
+
+    @property
+    def stale(self):
+        return self._polled_at is None or \
+            self._clock() - self._polled_at >= self.interval
+
+    @property
+    def block_number(self):
+        """Returns the head block number, polling it if stale."""
+        if self.stale:
+            return self.poll()
+        return self._block_number
+
+    def poll(self):
+        """Fetches the head block number and notifies if it moved."""
+        block_number = self.get_block_number()
+        with self._lock:
+            moved = block_number != self._block_number
+            self._block_number = block_number
+            self._polled_at = self._clock()
+        if moved:
+            self._notify(block_number)
+        return block_number
+
+    def observe(self, block_number):
+        """
+        Moves the head forward to a block known to be mined, e.g. from a
+        transaction receipt, without waiting for the next poll.
+        """
+        with self._lock:
+            moved = self._block_number is not None and \
+                block_number > self._block_number
+            if moved:
+                self._block_number = block_number
+        if moved:
+            self._notify(block_number)
+
+    def _notify(self, block_number):
+        for listener in list(self._listeners):
+            try:
+                listener(block_number)
+            except Exception:
+                logger.exception('Error notifying block %s', block_number)
+
+
+class BlockCache:
+    """
+    Read cache keyed on the head block number, entries fetched in a previous
+    block are refetched.
+    """
+
+    # chain_id -> BlockCache
+    _block_caches: Dict[ChainID, 'BlockCache'] = {}
+    _block_caches_lock = threading.Lock()
+
+    def __init__(self, head_tracker):
+        self.head_tracker = head_tracker
+        self._lock = threading.Lock()
+        # key -> (block_number, value)
+        self._entries = {}
+        head_tracker.bind(self.on_block)
+
+    @classmethod
+    def get_or_create(cls, pyetheroll):
+        chain_id = pyetheroll.chain_id
+        with cls._block_caches_lock:
+            block_cache = cls._block_caches.get(chain_id)
+            if block_cache is None:
+                block_cache = cls(HeadTracker.get_or_create(pyetheroll))
+                cls._block_caches[chain_id] = block_cache
+        return block_cache
+
+    def on_block(self, block_number):
+        """Drops entries from previous blocks."""
+        with self._lock:
+            self._entries = {
+                key: entry for key, entry in self._entries.items()
+                if entry[0] == block_number}
+
+    def get(self, key, fetch):
+        """
+        Returns the value cached for the current block or fetches it with
+        `fetch()` and caches it.
+        """
+        try:
+            block_number = self.head_tracker.block_number
+        except Exception:
+            # only an optimization, the read itself may still go through
+            logger.warning('Error getting head block, %s not cached', key)
+            return fetch()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == block_number:
+            return entry[1]
+        value = fetch()
+        with self._lock:
+            self._entries[key] = (block_number, value)
+        return value
+
+    def get_many(self, keys, fetch_many):
+        """
+        Like `get()` for several keys, the ones not cached for the current
+        block are fetched together with `fetch_many(missing_keys)`.
+        Failed fetches, returned as exceptions, aren't cached.
+        """
+        try:
+            block_number = self.head_tracker.block_number
+        except Exception:
+            logger.warning('Error getting head block, %s not cached', keys)
+            return fetch_many(keys)
+        with self._lock:
+            values = {
+                key: entry[1] for key, entry in (
+                    (key, self._entries.get(key)) for key in keys)
+                if entry is not None and entry[0] == block_number
+            }
+        missing = [key for key in keys if key not in values]
+        if missing:
+            fetched = fetch_many(missing)
+            with self._lock:
+                for key, value in zip(missing, fetched):
+                    if not isinstance(value, Exception):
+                        self._entries[key] = (block_number, value)
+            values.update(zip(missing, fetched))
+        return [values[key] for key in keys]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+def get_balance(pyetheroll, address):
+    """Account balance in ether, cached per block."""
+    block_cache = BlockCache.get_or_create(pyetheroll)
+    balance_wei = block_cache.get(
+        ('balance', address.lower()),
+        lambda: rpc.get_balance(pyetheroll, address))
+    return round(balance_wei / 1e18, ROUND_DIGITS)
+
+
+def get_balances(pyetheroll, addresses):
+    """
+    Accounts balances in ether, `None` for the failed ones, cached per block.
+    Balances not cached are fetched with a single batch request.
+    """
+    block_cache = BlockCache.get_or_create(pyetheroll)
+    keys = [('balance', address.lower()) for address in addresses]
+    balances_wei = block_cache.get_many(
+        keys, lambda missing: rpc.get_balances(
+            pyetheroll, [address for _, address in missing]))
+    return [
+        None if isinstance(balance_wei, Exception)
+        else round(balance_wei / 1e18, ROUND_DIGITS)
+        for balance_wei in balances_wei]
+
+
+def get_min_bet(pyetheroll):
+    """Contract `minBet()` in wei, cached per block."""
+    block_cache = BlockCache.get_or_create(pyetheroll)
+    return block_cache.get(
+        ('minBet',), lambda: rpc.call_uint(pyetheroll, 'minBet'))
+
+
+def get_rolls(pyetheroll, address, on_page=None):
+    """
+    Account rolls, cached per block.
+    Each page of new rolls gets passed to `on_page(rolls)` unless cached.
+    """
+    block_cache = BlockCache.get_or_create(pyetheroll)
+    return block_cache.get(
+        ('rolls', address.lower()),
+        lambda: history.get_rolls(pyetheroll, address, on_page))
@@ -0,0 +1,190 @@
+"""
+Per endpoint circuit breakers and app wide offline state.
+After a few consecutive network failures the endpoint circuit opens and
+calls fail right away, until a single half-open probe is let through after
+an exponential and jittered backoff.
+The app is considered offline while all the endpoint circuits are open.
+"""
+import logging
+import random
+import threading
+from enum import Enum
+from time import monotonic
+from typing import Callable, Dict, List
+
+from requests.exceptions import ConnectionError, RequestException
+
+logger = logging.getLogger(__name__)
+
+# consecutive failures opening the circuit
+FAILURE_THRESHOLD = 3
+BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 5 * 60
+# backoff randomization, so endpoints aren't all probed at once
+BACKOFF_JITTER = 0.2
+
+
+def get_network_errors():
+    """Exceptions meaning the endpoint couldn't be reached."""
+    # lazy loading
+    from etherscan.client import ConnectionRefused
+    return (RequestException, OSError, ConnectionRefused)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised without calling the endpoint while its circuit is open."""
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Endpoint circuit breaker, shared by the whole process.
+    Only network errors count as failures, the endpoint returning an error
+    still means it's reachable.
+    """
+
+    # name -> CircuitBreaker
+    _breakers: Dict[str, 'CircuitBreaker'] = {}
+    _breakers_lock = threading.Lock()
+    _offline = False
+    _offline_listeners: List[Callable[[bool], None]] = []
+
+    def __init__(
+            self, name, failure_threshold=FAILURE_THRESHOLD,
+            backoff_seconds=BACKOFF_SECONDS,
+            max_backoff_seconds=MAX_BACKOFF_SECONDS, clock=monotonic,
+            rand=random.random):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._clock = clock
+        self._random = rand
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self.failures = 0
+        # consecutive times the circuit opened, for the backoff
+        self.opened = 0
+        self.retry_at = None
+        self._probing = False
+
+    def __repr__(self):
+        return f'<CircuitBreaker {self.name} {self.state.value}>'
+
+    @classmethod
+    def get_or_create(cls, name):
+        with cls._breakers_lock:
+            breaker = cls._breakers.get(name)
+            if breaker is None:
+                breaker = cls(name)
+                cls._breakers[name] = breaker
+        return breaker
+
+    @classmethod
+    def bind_offline(cls, listener):
+        """`listener(offline)` gets called when the offline state flips."""
+        cls._offline_listeners.append(listener)
+
+    @classmethod
+    def unbind_offline(cls, listener):
+        cls._offline_listeners.remove(listener)
+
+    @classmethod
+    def is_offline(cls):
+        """Whether none of the endpoints can be reached."""
+        with cls._breakers_lock:
+            breakers = list(cls._breakers.values())
+        return bool(breakers) and all(
+            breaker.state is not CircuitState.CLOSED for breaker in breakers)
+
+    @classmethod
+    def _update_offline(cls):
+        offline = cls.is_offline()
+        with cls._breakers_lock:
+            flipped = offline != cls._offline
+            cls._offline = offline
+        if not flipped:
+            return
+        logger.warning('Offline' if offline else 'Back online')
+        for listener in list(cls._offline_listeners):
+            try:
+                listener(offline)
+            except Exception:
+                logger.exception('Error notifying offline state')
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state is CircuitState.OPEN and \
+                    self._clock() >= self.retry_at:
+                self._state = CircuitState.HALF_OPEN
+            return self._state
+
+    @property
+    def available(self):
+        """Whether a call would go through, without reserving the probe."""
+        state = self.state
+        return state is CircuitState.CLOSED or (
+            state is CircuitState.HALF_OPEN and not self._probing)
+
+    def allow(self):
+        """Whether the call can go through, only one half-open probe can."""
+        state = self.state
+        with self._lock:
+            if state is CircuitState.CLOSED:
+                return True
+            if state is CircuitState.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self.failures = 0
+            self.opened = 0
+            self._probing = False
+        self._update_offline()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                backoff = min(
+                    self.backoff_seconds * 2 ** self.opened,
+                    self.max_backoff_seconds)
+                jitter = 1 + BACKOFF_JITTER * (2 * self._random() - 1)
+                self.retry_at = self._clock() + backoff * jitter
+                self.opened += 1
+                self._state = CircuitState.OPEN
+                self._probing = False
+        self._update_offline()
+
+    def call(self, function, *args, **kwargs):
+        """
+        Returns `function(*args, **kwargs)`, recording network errors.
+        Raises `CircuitOpenError` without calling it if the circuit is open.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f'{self.name} unreachable')
+        try:
+            result = function(*args, **kwargs)
+        except get_network_errors():
+            self.record_failure()
+            raise
+        except Exception:
+            # reachable, but the probe is over
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+def get_etherscan_breaker(pyetheroll):
+    """Circuit breaker of the chain Etherscan API."""
+    return CircuitBreaker.get_or_create(f'etherscan:{pyetheroll.chain_id}')
@@ -4,32 +4,48 @@ from eth_utils import to_checksum_address
 from kivy.app import App
 from kivy.clock import Clock, mainthread
 from kivy.logger import Logger
-from kivy.properties import ObjectProperty, StringProperty
+from kivy.properties import BooleanProperty, ObjectProperty, StringProperty
 from kivy.uix.floatlayout import FloatLayout
 from kivy.utils import platform
 from kivymd.bottomsheet import MDListBottomSheet
 from kivymd.theming import ThemeManager
 from raven import Client
-from requests.exceptions import ConnectionError
 
+from etherollapp.etheroll import (notifications, receipts, simulation,
+                                  transactions)
+from etherollapp.etheroll.bet_results import PendingBetWatcher
+from etherollapp.etheroll.chain_cache import (BLOCK_INTERVAL_SECONDS,
+                                              HeadTracker)
+from etherollapp.etheroll.circuit_breaker import (CircuitBreaker,
+                                                  CircuitOpenError)
 from etherollapp.etheroll.constants import ENV_PATH
+from etherollapp.etheroll.crypto_worker import CryptoWorker
 from etherollapp.etheroll.flashqrcode import FlashQrCodeScreen
+from etherollapp.etheroll.rolls import RollRecord
 from etherollapp.etheroll.settings import Settings
 from etherollapp.etheroll.settings_screen import SettingsScreen
+from etherollapp.etheroll.signer import Signer, SignerCache
+from etherollapp.etheroll.submission import (Submission, SubmissionPipeline,
+                                             SubmissionStatus)
 from etherollapp.etheroll.switchaccount import SwitchAccountScreen
 from etherollapp.etheroll.ui_utils import Dialog, load_kv_from_py
-from etherollapp.etheroll.utils import run_in_thread
+from etherollapp.etheroll.utils import SupersedingWorker
 from etherollapp.osc.osc_app_server import OscAppServer
 from etherollapp.sentry_utils import configure_sentry
 from etherollapp.service.utils import start_roll_polling_service
 
 load_kv_from_py(__file__)
+# how often idle unlocked signers are looked for and zeroised
+SIGNER_CACHE_PURGE_SECONDS = 10
+# most bets sent at once in batch roll mode
+MAX_BATCH_ROLLS = 20
 
 
 class Controller(FloatLayout):
 
     current_account = ObjectProperty(allownone=True)
     current_account_string = StringProperty(allownone=True)
+    offline = BooleanProperty(False)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -39,6 +55,17 @@ class Controller(FloatLayout):
         self.disabled = True
         Clock.schedule_once(self._after_init)
         self._account_passwords = {}
+        self._signer_cache = SignerCache()
+        self.submission_pipeline = SubmissionPipeline(
+            lambda: self.pyetheroll, self.get_signer,
+            get_broadcast_all=Settings.is_broadcast_all_endpoints)
+        self.submission_pipeline.bind(self.on_submission_status)
+        self.submission_pipeline.bind(self.notify_submission)
+        self.bet_watcher = PendingBetWatcher(self.on_bet_result)
+        self._head_worker = SupersedingWorker()
+        self._head_block_number = None
+        # batches already reported to the user
+        self._reported_batches = set()
 
     def _after_init(self, dt):
         """Inits pyethapp and binds events."""
@@ -51,6 +78,12 @@ class Controller(FloatLayout):
         self.bind_screen_manager_on_current_screen()
         self.bind_keyboard()
         self.register_screens()
+        Clock.schedule_interval(
+            lambda dt: self._signer_cache.purge_expired(),
+            SIGNER_CACHE_PURGE_SECONDS)
+        Clock.schedule_interval(
+            lambda dt: self.poll_head(), BLOCK_INTERVAL_SECONDS)
+        CircuitBreaker.bind_offline(self.set_offline)
 
     def on_keyboard(self, window, key, *args):
         """
@@ -84,6 +117,11 @@ class Controller(FloatLayout):
         chain_id = Settings.get_stored_network()
         return Etheroll.get_or_create(chain_id)
 
+    @property
+    def crypto_worker(self):
+        """Process running the keystore decryption, encryption and signing."""
+        return CryptoWorker.get_or_create()
+
     @property
     def account_utils(self):
         """Gets or creates the AccountUtils object so it loads lazily."""
@@ -91,6 +129,49 @@ class Controller(FloatLayout):
         keystore_dir = Settings.get_keystore_path()
         return AccountUtils.get_or_create(keystore_dir)
 
+    @property
+    def head_tracker(self):
+        """Tracks the current chain head block."""
+        return HeadTracker.get_or_create(self.pyetheroll)
+
+    def poll_head(self):
+        """
+        Polls (async) the chain head once per block interval, chain reads
+        depending on it get refreshed when it moves.
+        """
+        self._head_worker.submit(self._poll_head)
+
+    def _poll_head(self, token):
+        try:
+            block_number = self.head_tracker.poll()
+        except CircuitOpenError:
+            # offline, the breaker lets a probe through from time to time
+            return
+        if block_number != self._head_block_number:
+            self._head_block_number = block_number
+            self.on_block(block_number)
+
+    @mainthread
+    def on_block(self, block_number):
+        """Refreshes what's displayed and may have changed."""
+        if self.screen_manager.current == 'roll_screen':
+            self.roll_screen.fetch_update_balance()
+
+    @mainthread
+    def set_offline(self, offline):
+        self.offline = offline
+
+    def on_offline(self, instance, offline):
+        """
+        Single network error indicator, rather than a dialog per failed
+        fetch, refreshes what's displayed once back online.
+        """
+        toolbar = self.ids.toolbar_id
+        toolbar.title = 'Etheroll (offline)' if offline else 'Etheroll'
+        Dialog.snackbar_message('No network' if offline else 'Back online')
+        if not offline:
+            self.poll_head()
+
     def preload_account_utils(self, dt):
         """Preloads `AccountUtils`, since it takes few seconds on Android."""
         account_utils = self.account_utils
@@ -178,16 +259,12 @@ class Controller(FloatLayout):
             self.screen_manager.register_screen(screen_type, screen_name)
 
     def update_profit_property(self):
-        house_edge = 1.0 / 100
         bet_size = self.roll_screen.ids.bet_size_id.value
         chances_win = self.roll_screen.ids.chance_of_winning_id.value
-        chances_loss = 100 - chances_win
         roll_under_recap = self.roll_screen.ids.roll_under_recap_id
-        roll_under_recap.profit_property = 0
-        if chances_win != 0 and chances_loss != 0:
-            payout = ((chances_loss / chances_win) * bet_size) + bet_size
-            payout *= (1 - house_edge)
-            roll_under_recap.profit_property = payout - bet_size
+        roll_under_recap.profit_property = \
+            simulation.get_profit(bet_size, chances_win) or 0
+        self.roll_screen.simulate_bankroll()
 
     @property
     def navigation(self):
@@ -241,6 +318,43 @@ class Controller(FloatLayout):
         except KeyError:
             self.prompt_password_dialog(account, on_password_callback)
 
+    def get_signer(self, account, password):
+        """
+        Returns the cached unlocked signer or unlocks the account keystore.
+        Unlocking runs the keystore KDF in the crypto process, the call blocks
+        until it's done, hence should not be made from the main thread.
+        """
+        address = account.address.hex()
+        signer = self._signer_cache.get(address)
+        if signer is None:
+            # the signer may have expired since the password was looked up
+            password = password or self._account_passwords.get(address)
+            if password is None:
+                raise ValueError('Account is locked')
+            signer = Signer.unlock(account.path, password, self.crypto_worker)
+            self._signer_cache.put(address, signer)
+        return signer
+
+    def get_signer_or_password(self, account, on_password_callback):
+        """
+        Returns a `(signer, password)` tuple, either the cached signer or the
+        account password. Prompts the password dialog if none is available,
+        in which case `(None, None)` is returned.
+        """
+        address = account.address.hex()
+        self._signer_cache.timeout = Settings.get_stored_signer_cache_timeout()
+        signer = self._signer_cache.get(address)
+        if signer is not None:
+            return signer, None
+        password = self.get_account_password(account, on_password_callback)
+        return None, password
+
+    def lock_accounts(self):
+        """Zeroises unlocked signers and forgets cached passwords."""
+        self._signer_cache.lock()
+        self._account_passwords = {}
+        Dialog.snackbar_message("Accounts locked")
+
     @staticmethod
     def on_account_none():
         """Error dialog on no account selected."""
@@ -249,6 +363,16 @@ class Controller(FloatLayout):
         dialog = Dialog.create_dialog(title, body)
         dialog.open()
 
+    @staticmethod
+    def on_too_many_rolls(count):
+        """Error dialog on more bets than sent at once in batch mode."""
+        title = "Too many bets"
+        body = (
+            f"Can't place {count} bets at once, "
+            f"please roll {MAX_BATCH_ROLLS} or less")
+        dialog = Dialog.create_dialog(title, body)
+        dialog.open()
+
     @staticmethod
     @mainthread
     def dialog_roll_success(tx_hash):
@@ -266,46 +390,159 @@ class Controller(FloatLayout):
         dialog.open()
 
     @mainthread
-    def dialog_roll_error(self, exception):
+    def dialog_submission_error(self, submission):
         """
         Shows different error message depending on the exception.
         On "MAC mismatch" (wrong password), void the cached password so the
         user can try again refs:
         https://github.com/AndreMiras/EtherollApp/issues/9
         """
-        title = "Error rolling"
-        body = str(exception)
+        title = "Error rolling" if submission.kind == 'roll' else \
+            "Error sending"
+        body = str(submission.error)
         if body == 'MAC mismatch':
             title = "Wrong password"
             body = "Can't unlock wallet, wrong password."
-            account = self.current_account
-            self._account_passwords.pop(account.address.hex())
+            address = submission.account.address.hex()
+            self._account_passwords.pop(address, None)
+            self._signer_cache.lock(address)
         dialog = Dialog.create_dialog(title, body)
         dialog.open()
 
-    @run_in_thread
+    @mainthread
+    def on_submission_status(self, submission):
+        """Reports submissions progress, called on every status change."""
+        self.roll_screen.pending_transactions_property = len(
+            self.submission_pipeline.pending)
+        if submission.kind == 'roll':
+            self.update_roll_results(submission)
+        if submission.status == SubmissionStatus.MINED:
+            # the cached balance is from an older block
+            self.head_tracker.observe(submission.receipt['blockNumber'])
+            self.roll_screen.fetch_update_balance()
+            if submission.event is not None:
+                self.bet_watcher.watch(self.pyetheroll, submission.event)
+        if submission.batch is not None:
+            self.report_batch_status(submission)
+            return
+        status = submission.status
+        is_roll = submission.kind == 'roll'
+        if status == SubmissionStatus.QUEUED:
+            Dialog.snackbar_message(
+                "Sending bet..." if is_roll else "Sending transaction...")
+        elif status == SubmissionStatus.BROADCAST:
+            if is_roll:
+                self.dialog_roll_success(submission.tx_hash)
+            else:
+                self.dialog_transaction_success(submission.tx_hash)
+        elif status == SubmissionStatus.MINED:
+            Dialog.snackbar_message(
+                "Bet confirmed on chain" if is_roll else
+                "Transaction confirmed on chain")
+        elif status == SubmissionStatus.FAILED:
+            self.dialog_submission_error(submission)
+        elif status == SubmissionStatus.EXPIRED:
+            Dialog.snackbar_message(
+                ("Bet" if is_roll else "Transaction") +
+                " still not confirmed, no longer tracked")
+
+    @staticmethod
+    def notify_submission(submission):
+        """
+        Notifies bets once placed, from the pipeline thread since the
+        notifications store is shared with the service.
+        """
+        if submission.status == SubmissionStatus.MINED and \
+                submission.event is not None:
+            notifications.notify_bet_placed(
+                RollRecord.from_logs(submission.event))
+
+    def on_bet_result(self, bet_log, bet_result):
+        """
+        Reports bets resolved by the oracle as soon as found, notified from
+        the watcher thread.
+        """
+        roll = RollRecord.from_logs(bet_log, bet_result)
+        notifications.notify_bet_result(roll)
+        self.show_bet_result(roll)
+
+    @mainthread
+    def show_bet_result(self, roll):
+        title, message = notifications.bet_result_message(roll)
+        Dialog.snackbar_message(f'{title}: {message}')
+        self.roll_screen.fetch_update_balance()
+        if self.screen_manager.current == 'roll_results_screen':
+            self.roll_results_screen.update_roll_list()
+
+    def report_batch_status(self, submission):
+        """
+        Reports a batch once as a whole rather than with a dialog per bet,
+        that is once none of its bets is left to sign or broadcast.
+        """
+        batch = submission.batch
+        status = submission.status
+        if status == SubmissionStatus.QUEUED and submission is batch[0]:
+            Dialog.snackbar_message(f"Sending {len(batch)} bets...")
+        if status == SubmissionStatus.FAILED and submission.receipt:
+            Dialog.snackbar_message("Bet reverted")
+        unsettled = (SubmissionStatus.QUEUED, SubmissionStatus.SIGNED)
+        if any(item.status in unsettled for item in batch) or \
+                batch[0].id in self._reported_batches:
+            return
+        self._reported_batches.add(batch[0].id)
+        failed = [
+            item for item in batch if item.status == SubmissionStatus.FAILED]
+        if failed:
+            self.dialog_submission_error(failed[0])
+        Dialog.snackbar_message(
+            f"{len(batch) - len(failed)}/{len(batch)} bets sent")
+
+    def update_roll_results(self, submission):
+        """Keeps the roll history in sync with the bets in flight."""
+        if self.screen_manager.current != 'roll_results_screen':
+            return
+        roll_results_screen = self.roll_results_screen
+        if submission.status == SubmissionStatus.MINED:
+            roll_results_screen.get_last_results()
+        else:
+            roll_results_screen.update_roll_list()
+
+    def roll_submission(
+            self, bet_size_eth, chances, account, password, gas_price_gwei):
+        """Returns the bet `Submission` for the submission pipeline."""
+        bet_size_wei = int(bet_size_eth * 1e18)
+        gas_price_wei = int(gas_price_gwei * 1e9)
+
+        def build_transaction(pyetheroll, nonce):
+            return transactions.build_roll_transaction(
+                pyetheroll, bet_size_wei, chances, gas_price_wei, nonce)
+        details = {'bet_value_ether': bet_size_eth, 'roll_under': chances}
+        return Submission(
+            'roll', account, password, build_transaction, details,
+            receipts.decode_bet_log)
+
     def player_roll_dice(
-            self, bet_size_eth, chances, wallet_path, password,
+            self, bet_size_eth, chances, account, password, gas_price_gwei):
+        """
+        Queues the bet in the submission pipeline, which unlocks the account
+        (or reuses the cached signer), signs and broadcasts the transaction
+        off the main thread.
+        """
+        return self.submission_pipeline.submit(self.roll_submission(
+            bet_size_eth, chances, account, password, gas_price_gwei))
+
+    def player_roll_dice_batch(
+            self, count, bet_size_eth, chances, account, password,
             gas_price_gwei):
         """
-        Sending the bet to the smart contract requires signing a transaction
-        which requires CPU computation to unlock the account, hence this
-        is ran in a thread.
+        Queues `count` identical bets, signed all at once with consecutive
+        nonces then broadcast concurrently.
         """
-        roll_screen = self.roll_screen
-        try:
-            Dialog.snackbar_message("Sending bet...")
-            roll_screen.toggle_widgets(False)
-            bet_size_wei = int(bet_size_eth * 1e18)
-            gas_price_wei = int(gas_price_gwei * 1e9)
-            tx_hash = self.pyetheroll.player_roll_dice(
-                bet_size_wei, chances, wallet_path, password, gas_price_wei)
-        except (ValueError, ConnectionError) as exception:
-            roll_screen.toggle_widgets(True)
-            self.dialog_roll_error(exception)
-            return
-        roll_screen.toggle_widgets(True)
-        self.dialog_roll_success(tx_hash)
+        return self.submission_pipeline.submit_batch([
+            self.roll_submission(
+                bet_size_eth, chances, account, password, gas_price_gwei)
+            for _ in range(count)
+        ])
 
     @staticmethod
     def start_services():
@@ -333,29 +570,42 @@ class Controller(FloatLayout):
         roll_input = roll_screen.get_roll_input()
         bet_size_eth = roll_input['bet_size']
         chances = roll_input['chances']
+        count = roll_input['count']
+        if count > MAX_BATCH_ROLLS:
+            self.on_too_many_rolls(count)
+            return
         gas_price_gwei = Settings.get_stored_gas_price()
         account = self.current_account
         if account is None:
             self.on_account_none()
             return
-        wallet_path = account.path
-        password = self.get_account_password(account, self.roll)
-        if password is not None:
-            self.player_roll_dice(
-                bet_size_eth, chances, wallet_path, password, gas_price_gwei)
+        signer, password = self.get_signer_or_password(account, self.roll)
+        if signer is not None or password is not None:
+            if count > 1:
+                self.player_roll_dice_batch(
+                    count, bet_size_eth, chances, account, password,
+                    gas_price_gwei)
+            else:
+                self.player_roll_dice(
+                    bet_size_eth, chances, account, password, gas_price_gwei)
             # restarts roll polling service to reset the roll activity period
             self.start_services()
 
     def transaction(
-            self, to, amount_eth, wallet_path, password, gas_price_gwei):
-        """Converts input parameters for the underlying library."""
+            self, to, amount_eth, account, password, gas_price_gwei):
+        """
+        Converts input parameters for the underlying library and queues the
+        transaction in the submission pipeline.
+        """
         value = int(amount_eth * 1e18)
         gas_price_wei = int(gas_price_gwei * 1e9)
         to = to_checksum_address(to)
-        Dialog.snackbar_message("Sending transaction...")
-        tx_hash = self.pyetheroll.transaction(
-            to, value, wallet_path, password, gas_price_wei)
-        self.dialog_transaction_success(tx_hash)
+
+        def build_transaction(pyetheroll, nonce):
+            return transactions.build_transfer_transaction(
+                to, value, gas_price_wei, nonce, pyetheroll.chain_id)
+        return self.submission_pipeline.submit(
+            Submission('send', account, password, build_transaction))
 
     def send(self, address, amount_eth):
         """Retrieves fields to complete the `transaction()` call."""
@@ -364,12 +614,11 @@ class Controller(FloatLayout):
         if account is None:
             self.on_account_none()
             return
-        wallet_path = account.path
-        password = self.get_account_password(
+        signer, password = self.get_signer_or_password(
             account, lambda: self.send(address, amount_eth))
-        if password is not None:
+        if signer is not None or password is not None:
             self.transaction(
-                address, amount_eth, wallet_path, password, gas_price_gwei)
+                address, amount_eth, account, password, gas_price_gwei)
 
     def on_send(self, instance, address, amount_eth):
         self.send(address, amount_eth)
@@ -436,6 +685,9 @@ class Controller(FloatLayout):
         bottom_sheet.add_item(
             'Copy address',
             lambda x: self.copy_address_clipboard(), icon='content-copy')
+        bottom_sheet.add_item(
+            'Lock accounts',
+            lambda x: self.lock_accounts(), icon='lock')
         bottom_sheet.open()
 
     @staticmethod
@@ -454,6 +706,8 @@ class EtherollApp(App):
         self.icon = "docs/images/icon.png"
         self.theme_cls.theme_style = 'Dark'
         self.theme_cls.primary_palette = 'Indigo'
+        # forks/spawns before the app starts most of its threads
+        CryptoWorker.get_or_create().start()
         Controller.start_services()
         return Controller()
 
@@ -1,3 +1,5 @@
+import os
+
 from kivy.app import App
 from kivy.clock import mainthread
 from kivy.properties import StringProperty
@@ -76,6 +78,23 @@ class CreateNewAccount(BoxLayout):
         screen_manager.transition.direction = 'right'
         screen_manager.current = 'roll_screen'
 
+    @staticmethod
+    def new_account(password):
+        """
+        Creates the account keyfile in the crypto process and stores it.
+        Same as `AccountUtils.new_account()` without running the KDF in the
+        app process.
+        """
+        # lazy loading
+        from eth_accounts.account import Account
+        controller = App.get_running_app().root
+        keyfile = controller.crypto_worker.create_keyfile(password)
+        account = Account(keyfile)
+        account_utils = controller.account_utils
+        account.path = os.path.join(
+            account_utils.keystore_dir, account.address.hex())
+        return account_utils.add_account(account)
+
     @run_in_thread
     def create_account(self):
         """
@@ -91,8 +110,7 @@ class CreateNewAccount(BoxLayout):
             return
         password = self.new_password1
         Dialog.snackbar_message("Creating account...")
-        controller = App.get_running_app().root
-        account = controller.account_utils.new_account(password=password)
+        account = self.new_account(password)
         Dialog.snackbar_message("Created!")
         self.toggle_widgets(True)
         self.on_account_created(account)
@@ -0,0 +1,275 @@
+"""
+Dedicated process for the CPU bound keystore operations.
+Running the KDF in a thread of the Kivy process competes with rendering for
+the GIL, making animations stutter for seconds.
+Unlocked private keys can be kept in the crypto process, transactions are
+then signed by key handle so the key never goes through the pipe again.
+CryptoWorker (app process) -> worker_main() (crypto process)
+"""
+import logging
+import multiprocessing
+import secrets
+import threading
+from collections import namedtuple
+from time import perf_counter
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+SignedTransaction = namedtuple(
+    'SignedTransaction', ('rawTransaction', 'hash'))
+# key handle -> private key, of the keys unlocked in this process
+_keys: Dict[str, bytearray] = {}
+
+
+class UnknownKeyError(ValueError):
+    """The key handle is unknown, e.g. forgotten or the process restarted."""
+
+
+def unlock(keyfile, password):
+    """Decrypts the keyfile dictionary and returns the private key bytes."""
+    from eth_account import Account
+    return bytes(Account.decrypt(keyfile, password))
+
+
+def sign_tx(transaction, private_key):
+    """Signs the transaction dictionary, returns raw transaction and hash."""
+    from eth_account import Account
+    signed_tx = Account.sign_transaction(transaction, private_key)
+    return SignedTransaction(
+        bytes(signed_tx.rawTransaction), bytes(signed_tx.hash))
+
+
+def unlock_key(keyfile, password):
+    """
+    Decrypts the keyfile dictionary and keeps the private key, returns its
+    handle.
+    Handles are random so they can't match a key of a restarted process.
+    """
+    private_key = bytearray(unlock(keyfile, password))
+    key_handle = secrets.token_hex(16)
+    _keys[key_handle] = private_key
+    return key_handle
+
+
+def sign_tx_with_key(transaction, key_handle):
+    """Signs the transaction dictionary with a key kept by `unlock_key()`."""
+    try:
+        private_key = _keys[key_handle]
+    except KeyError:
+        raise UnknownKeyError('Signer is locked')
+    return sign_tx(transaction, private_key)
+
+
+def forget_key(key_handle):
+    """Overwrites the key kept by `unlock_key()` and drops it."""
+    private_key = _keys.pop(key_handle, bytearray())
+    for i in range(len(private_key)):
+        private_key[i] = 0
+
+
+def create_keyfile(password, iterations=None):
+    """Creates a new private key and returns its encrypted keyfile."""
+    from eth_account import Account
+    from eth_keyfile import create_keyfile_json
+    if isinstance(password, str):
+        password = password.encode('utf-8')
+    private_key = Account.create().key
+    return create_keyfile_json(private_key, password, iterations=iterations)
+
+
+OPERATIONS = {
+    'unlock': unlock,
+    'sign_tx': sign_tx,
+    'unlock_key': unlock_key,
+    'sign_tx_with_key': sign_tx_with_key,
+    'forget_key': forget_key,
+    'create_keyfile': create_keyfile,
+}
+
+
+def run_operation(operation, args):
+    """
+    Runs the operation and returns a `(succeeded, result, elapsed)` tuple,
+    with the exception as result on failure.
+    """
+    start = perf_counter()
+    try:
+        result = OPERATIONS[operation](*args)
+        succeeded = True
+    except Exception as exception:
+        result = exception
+        succeeded = False
+    return succeeded, result, perf_counter() - start
+
+
+def worker_main(connection):
+    """Crypto process loop, serves requests until the pipe gets closed."""
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        operation, args = request
+        connection.send(run_operation(operation, args))
+
+
+class OperationMetrics:
+    """Timing of one operation type, as measured in the crypto process."""
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed, succeeded):
+        self.count += 1
+        self.failures += 0 if succeeded else 1
+        self.total += elapsed
+        self.last = elapsed
+        self.max = max(self.max, elapsed)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class CryptoWorker:
+    """
+    Client of the crypto process, exposing a small request/response API.
+    Requests are blocking and served one at a time, hence should be made from
+    a background thread.
+    Falls back to running operations in process if the crypto process can't
+    be started.
+    """
+
+    _crypto_worker = None
+
+    def __init__(self, start_method=None):
+        self.start_method = start_method
+        self.metrics = {
+            operation: OperationMetrics() for operation in OPERATIONS}
+        self._lock = threading.Lock()
+        self._process = None
+        self._connection = None
+        self._in_process = False
+
+    @classmethod
+    def get_or_create(cls):
+        if cls._crypto_worker is None:
+            cls._crypto_worker = cls()
+        return cls._crypto_worker
+
+    @staticmethod
+    def get_default_start_method():
+        """
+        The app doesn't ship a standalone Python interpreter on Android,
+        so the process needs to be forked there.
+        """
+        from kivy.utils import platform
+        return 'fork' if platform == 'android' else 'spawn'
+
+    def start(self):
+        """
+        Starts the crypto process.
+        Better called early, before the app starts other threads.
+        """
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self._process is not None or self._in_process:
+            return
+        start_method = self.start_method or self.get_default_start_method()
+        try:
+            context = multiprocessing.get_context(start_method)
+            connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=worker_main, args=(child_connection,), daemon=True)
+            process.start()
+        except (OSError, ValueError, ImportError):
+            logger.exception('Crypto process unavailable, running in process')
+            self._in_process = True
+            return
+        child_connection.close()
+        self._process = process
+        self._connection = connection
+
+    def stop(self):
+        with self._lock:
+            if self._process is None:
+                return
+            try:
+                self._connection.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout=1)
+            self._connection.close()
+            self._process = None
+            self._connection = None
+
+    def _request(self, operation, args):
+        with self._lock:
+            self._start()
+            if self._in_process:
+                return run_operation(operation, args)
+            try:
+                self._connection.send((operation, args))
+                return self._connection.recv()
+            except (EOFError, OSError):
+                # the process died, e.g. killed by the system
+                self._process = None
+                self._connection = None
+                raise
+
+    def call(self, operation, *args):
+        """Runs the operation in the crypto process and returns its result."""
+        start = perf_counter()
+        succeeded, result, elapsed = self._request(operation, args)
+        self.metrics[operation].add(elapsed, succeeded)
+        logger.debug(
+            '%s: %.3fs (%.3fs round trip)',
+            operation, elapsed, perf_counter() - start)
+        if not succeeded:
+            raise result
+        return result
+
+    def unlock(self, keyfile, password):
+        """Returns the private key of the keyfile dictionary."""
+        return self.call('unlock', keyfile, password)
+
+    def sign_tx(self, transaction, private_key):
+        """Returns the `SignedTransaction` of the transaction dictionary."""
+        return self.call('sign_tx', transaction, private_key)
+
+    def unlock_key(self, keyfile, password):
+        """
+        Unlocks the keyfile dictionary in the crypto process, returns the
+        handle of its private key.
+        """
+        return self.call('unlock_key', keyfile, password)
+
+    def sign_tx_with_key(self, transaction, key_handle):
+        """Returns the `SignedTransaction` signed with the key handle."""
+        return self.call('sign_tx_with_key', transaction, key_handle)
+
+    def forget_key(self, key_handle):
+        """
+        Drops the key from the crypto process, without waiting on it since
+        it may be busy, e.g. unlocking another keyfile.
+        """
+        def forget():
+            try:
+                self.call('forget_key', key_handle)
+            except Exception:
+                # e.g. the process died, and the key with it
+                logger.exception('Error forgetting key')
+        threading.Thread(target=forget, daemon=True).start()
+
+    def create_keyfile(self, password, iterations=None):
+        """Returns a newly created encrypted keyfile dictionary."""
+        return self.call('create_keyfile', password, iterations)
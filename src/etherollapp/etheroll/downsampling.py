@@ -0,0 +1,145 @@
+"""
+Largest-triangle-three-buckets (LTTB) downsampling for charts.
+Series are kept in a pyramid of levels, each one a fixed bucket LTTB of the
+previous, so zoomed out views get downsampled from a coarser level, and
+appending points only recomputes the levels tail.
+"""
+import threading
+
+import numpy as np
+
+# points per bucket from one level to the next
+LEVEL_FACTOR = 4
+# levels stop getting coarser below that many points
+MIN_LEVEL_POINTS = 256
+
+
+def triangle_areas(a_x, a_y, b_x, b_y, c_x, c_y):
+    """Doubled areas of the `(a, b, c)` triangles."""
+    return np.abs((a_x - c_x) * (b_y - a_y) - (a_x - b_x) * (c_y - a_y))
+
+
+def lttb(x, y, threshold):
+    """
+    Returns the indexes of the `threshold` points best preserving the
+    series shape, first and last points included.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    # buckets between the first and last points
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+    indexes = np.empty(threshold, dtype=np.int64)
+    indexes[0] = 0
+    indexes[-1] = length - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # the last point makes the last next bucket
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = triangle_areas(
+            x[selected], y[selected], x[start:end], y[start:end],
+            next_x, next_y)
+        selected = start + int(areas.argmax())
+        indexes[bucket + 1] = selected
+    return indexes
+
+
+def lttb_fixed(x, y, bucket_size, previous=None):
+    """
+    LTTB with fixed size buckets, so the buckets don't move as points get
+    appended. Returns the selected index of each complete bucket but the last
+    one, which depends on the next bucket, hence they won't change either.
+    `previous` is the `(x, y)` point selected before the first bucket.
+    """
+    buckets = len(x) // bucket_size
+    if buckets < 2:
+        return np.zeros(0, dtype=np.int64)
+    bucket_x = x[:buckets * bucket_size].reshape(buckets, bucket_size)
+    bucket_y = y[:buckets * bucket_size].reshape(buckets, bucket_size)
+    mean_x = bucket_x.mean(axis=1).tolist()
+    mean_y = bucket_y.mean(axis=1).tolist()
+    # small buckets are faster with plain floats than per bucket arrays
+    bucket_x, bucket_y = bucket_x.tolist(), bucket_y.tolist()
+    indexes = []
+    previous_x, previous_y = previous or (bucket_x[0][0], bucket_y[0][0])
+    for bucket in range(buckets - 1):
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        areas = [
+            abs((previous_x - next_x) * (point_y - previous_y) -
+                (previous_x - point_x) * (next_y - previous_y))
+            for point_x, point_y in zip(bucket_x[bucket], bucket_y[bucket])
+        ]
+        selected = areas.index(max(areas))
+        indexes.append(bucket * bucket_size + selected)
+        previous_x = bucket_x[bucket][selected]
+        previous_y = bucket_y[bucket][selected]
+    return np.array(indexes, dtype=np.int64)
+
+
+class SeriesPyramid:
+    """
+    Multi-resolution levels of a growing `(x, y)` series, `x` increasing.
+    Level 0 is the series itself, each next level keeps one point per
+    `LEVEL_FACTOR` points of the previous one.
+    """
+
+    def __init__(self, factor=LEVEL_FACTOR, min_points=MIN_LEVEL_POINTS):
+        self.factor = factor
+        self.min_points = min_points
+        self._lock = threading.Lock()
+        self.levels = [(np.zeros(0), np.zeros(0))]
+
+    def __len__(self):
+        return len(self.levels[0][0])
+
+    def clear(self):
+        with self._lock:
+            self.levels = [(np.zeros(0), np.zeros(0))]
+
+    def extend(self, x, y):
+        """Appends points, only the levels tails get recomputed."""
+        with self._lock:
+            level_x, level_y = self.levels[0]
+            self.levels[0] = (
+                np.concatenate((level_x, x)), np.concatenate((level_y, y)))
+            level = 1
+            while len(self.levels[level - 1][0]) >= \
+                    self.min_points * self.factor:
+                if level == len(self.levels):
+                    self.levels.append((np.zeros(0), np.zeros(0)))
+                source_x, source_y = self.levels[level - 1]
+                self.levels[level] = self._extend_level(
+                    self.levels[level], source_x, source_y)
+                level += 1
+
+    def _extend_level(self, level, source_x, source_y):
+        """Selects the points of the source buckets after the selected ones."""
+        level_x, level_y = level
+        start = len(level_x) * self.factor
+        previous = (level_x[-1], level_y[-1]) if len(level_x) else None
+        indexes = start + lttb_fixed(
+            source_x[start:], source_y[start:], self.factor, previous)
+        return (
+            np.concatenate((level_x, source_x[indexes])),
+            np.concatenate((level_y, source_y[indexes])),
+        )
+
+    def downsample(self, threshold, x_min=None, x_max=None):
+        """
+        Returns at most `threshold` `(x, y)` points of the `[x_min, x_max]`
+        range, from the coarsest level still having enough points in range.
+        """
+        with self._lock:
+            levels = list(self.levels)
+        for level_x, level_y in reversed(levels):
+            start = 0 if x_min is None else np.searchsorted(level_x, x_min)
+            end = len(level_x) if x_max is None else np.searchsorted(
+                level_x, x_max, side='right')
+            if end - start >= threshold:
+                break
+        level_x, level_y = level_x[start:end], level_y[start:end]
+        indexes = lttb(level_x, level_y, threshold)
+        return level_x[indexes], level_y[indexes]
@@ -0,0 +1,207 @@
+"""
+JSON-RPC endpoints pool.
+Several nodes can be configured per chain, reads go to the fastest one
+with its circuit closed, ranked on latency and error rate moving averages,
+and are hedged to the next ones when slower than usual.
+Only network errors count against an endpoint, errors returned by the node
+are raised right away since the next ones would most likely return the
+same.
+Writes go to a single endpoint at a time and are only sent to the next one
+if the endpoint couldn't be reached.
+Extra nodes are configured with a comma separated `RPC_ENDPOINTS_<CHAIN>`
+environment variable, e.g. `RPC_ENDPOINTS_MAINNET`.
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
+from typing import Dict, Tuple
+
+from pyetheroll.constants import ChainID
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from etherollapp.etheroll.circuit_breaker import (CircuitBreaker,
+                                                  CircuitOpenError,
+                                                  get_network_errors)
+
+ENDPOINTS_ENV_PREFIX = 'RPC_ENDPOINTS_'
+# weight of the latest sample in the moving averages
+EWMA_ALPHA = 0.2
+# latency samples kept for the hedging percentile
+LATENCY_SAMPLES = 50
+# hedging delay until enough samples were collected
+DEFAULT_HEDGE_SECONDS = 2
+MIN_HEDGE_SECONDS = 0.2
+# errors meaning the request never made it to the endpoint
+CONNECTION_ERRORS = (ConnectionError, RequestsConnectionError)
+
+
+def get_endpoint_uris(pyetheroll):
+    """
+    Returns the chain endpoints, the pyetheroll provider one first, followed
+    by the ones configured from the environment.
+    """
+    uris = [pyetheroll.web3.provider.endpoint_uri]
+    chain_id = pyetheroll.chain_id
+    if isinstance(chain_id, ChainID):
+        configured = os.environ.get(ENDPOINTS_ENV_PREFIX + chain_id.name, '')
+        uris += [uri.strip() for uri in configured.split(',') if uri.strip()]
+    # deduplicates, preserving order
+    return list(dict.fromkeys(uris))
+
+
+class Endpoint:
+    """Endpoint health, updated after every request."""
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.latency = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.breaker = CircuitBreaker.get_or_create(uri)
+
+    def __repr__(self):
+        return f'<Endpoint {self.uri} latency={self.latency}>'
+
+    @property
+    def score(self):
+        """
+        Expected cost of a request, lower is better, endpoints never tried
+        come first so they get measured.
+        """
+        if self.latency is None:
+            return 0
+        return self.latency / max(1 - self.error_rate, 0.01)
+
+    @property
+    def p95(self):
+        if len(self.latencies) < 10:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def record_success(self, latency):
+        self.latency = latency if self.latency is None else \
+            EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate
+        self.latencies.append(latency)
+
+    def record_failure(self):
+        self.error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_rate
+
+
+class EndpointPool:
+    """
+    Sends requests to the best ranked endpoint and hedges them to the next
+    ones past the endpoint p95 latency, first success wins.
+    Unreachable endpoints are skipped while their circuit is open.
+    One pool per set of endpoints, shared by the whole process.
+    """
+
+    # endpoint uris -> EndpointPool
+    _pools: Dict[Tuple[str, ...], 'EndpointPool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, uris, clock=monotonic):
+        self.endpoints = [Endpoint(uri) for uri in uris]
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_or_create(cls, pyetheroll):
+        uris = tuple(get_endpoint_uris(pyetheroll))
+        with cls._pools_lock:
+            pool = cls._pools.get(uris)
+            if pool is None:
+                pool = cls(uris)
+                cls._pools[uris] = pool
+        return pool
+
+    def ranked(self):
+        """
+        Endpoints available, best first.
+        Raises `CircuitOpenError` if none can be reached.
+        """
+        with self._lock:
+            available = [
+                endpoint for endpoint in self.endpoints
+                if endpoint.breaker.available]
+            if not available:
+                raise CircuitOpenError('No endpoint reachable')
+            return sorted(available, key=lambda e: e.score)
+
+    def hedge_seconds(self, endpoint):
+        p95 = endpoint.p95
+        if p95 is None:
+            return DEFAULT_HEDGE_SECONDS
+        return max(p95, MIN_HEDGE_SECONDS)
+
+    def attempt(self, endpoint, fetch):
+        """
+        Calls `fetch(uri)` and records the endpoint health, only network
+        errors count as failures.
+        """
+        start = self._clock()
+        try:
+            result = endpoint.breaker.call(fetch, endpoint.uri)
+        except CircuitOpenError:
+            # the probe was taken by a concurrent request
+            raise
+        except get_network_errors():
+            with self._lock:
+                endpoint.record_failure()
+            raise
+        with self._lock:
+            endpoint.record_success(self._clock() - start)
+        return result
+
+    def request(self, fetch):
+        """
+        Returns `fetch(uri)` from the first endpoint to succeed.
+        The request is hedged to the next endpoint when slow and fails over
+        to the next endpoints on network errors, the last one is raised if
+        they all failed. Node errors, e.g. `RPCError`, are raised right away.
+        """
+        ranked = self.ranked()
+        if len(ranked) == 1:
+            return self.attempt(ranked[0], fetch)
+        backups = iter(ranked[1:])
+        executor = ThreadPoolExecutor(max_workers=len(ranked))
+        try:
+            pending = {executor.submit(self.attempt, ranked[0], fetch)}
+            hedge_seconds = self.hedge_seconds(ranked[0])
+            error = None
+            while pending:
+                done, pending = wait(
+                    pending, timeout=hedge_seconds,
+                    return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        return future.result()
+                    except get_network_errors() as exception:
+                        error = exception
+                # slow or failed, either way the next endpoint is given a go
+                backup = next(backups, None)
+                if backup is not None:
+                    pending.add(executor.submit(self.attempt, backup, fetch))
+                hedge_seconds = None if backup is None else hedge_seconds
+            raise error
+        finally:
+            # the slower requests still complete in the background so
+            # their latency gets recorded
+            executor.shutdown(wait=False)
+
+    def send(self, fetch):
+        """
+        Returns `fetch(uri)` from the best ranked endpoint, for writes.
+        Never hedged, so the write isn't sent twice, and only sent to the
+        next endpoint if the endpoint couldn't be connected to.
+        """
+        error = None
+        for endpoint in self.ranked():
+            try:
+                return self.attempt(endpoint, fetch)
+            except CONNECTION_ERRORS as exception:
+                error = exception
+        raise error
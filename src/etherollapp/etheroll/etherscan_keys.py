@@ -0,0 +1,176 @@
+"""
+Etherscan API keys pool.
+Several keys can be configured with a comma separated `ETHERSCAN_API_KEYS`
+environment variable, e.g. from `env.env`, falling back to the single
+`ETHERSCAN_API_KEY` one.
+Calls go to the key with the most quota left, per key token buckets mirror
+Etherscan rate limits, and throttled keys are left aside for a while.
+"""
+import copy
+import logging
+import os
+import threading
+from time import monotonic, sleep
+from typing import Dict, Tuple
+
+from pyetheroll.utils import get_etherscan_api_key
+
+logger = logging.getLogger(__name__)
+
+ETHERSCAN_API_KEYS_ENV = 'ETHERSCAN_API_KEYS'
+# Etherscan free plan rate limit
+CALLS_PER_SECOND = 5
+# how long a throttled key is left out of rotation
+THROTTLED_SECONDS = 30
+# Etherscan error messages meaning the key got throttled, a bare `NOTOK`
+# status also comes with invalid queries or keys
+THROTTLED_ERRORS = (
+    'max rate limit reached',
+)
+
+
+class EtherscanError(Exception):
+    """Error message returned by the Etherscan API as result."""
+
+
+def get_api_keys():
+    configured = os.environ.get(ETHERSCAN_API_KEYS_ENV, '')
+    keys = [key.strip() for key in configured.split(',') if key.strip()]
+    # deduplicates, preserving order
+    return list(dict.fromkeys(keys)) or [get_etherscan_api_key()]
+
+
+def is_throttled_error(exception):
+    message = str(exception).lower()
+    return any(error in message for error in THROTTLED_ERRORS)
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate, capacity=None, clock=monotonic):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+
+    @property
+    def tokens(self):
+        now = self._clock()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        return self._tokens
+
+    def take(self):
+        """Takes a token if there's one left, returns whether it did."""
+        if self.tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def wait_seconds(self):
+        """Time until a token is available."""
+        return max(0, (1 - self.tokens) / self.rate)
+
+
+class EtherscanKey:
+    """API key quota and usage accounting."""
+
+    def __init__(self, key, rate=CALLS_PER_SECOND, clock=monotonic):
+        self.key = key
+        self.bucket = TokenBucket(rate, clock=clock)
+        self.calls = 0
+        self.throttled = 0
+        self.throttled_until = None
+
+    def __repr__(self):
+        return f'<EtherscanKey {self.masked} calls={self.calls}>'
+
+    @property
+    def masked(self):
+        """Key prefix, safe to log."""
+        return self.key[:4] + '...'
+
+    def is_throttled(self, now):
+        return self.throttled_until is not None and now < self.throttled_until
+
+
+class EtherscanKeyPool:
+    """
+    Hands out the key with the most quota left, waiting for one to refill
+    if they're all used up.
+    One pool per set of keys, shared by the whole process.
+    """
+
+    # keys -> EtherscanKeyPool
+    _pools: Dict[Tuple[str, ...], 'EtherscanKeyPool'] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(
+            self, keys, rate=CALLS_PER_SECOND, clock=monotonic, sleep=sleep):
+        self.keys = [EtherscanKey(key, rate, clock) for key in keys]
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_or_create(cls):
+        keys = tuple(get_api_keys())
+        with cls._pools_lock:
+            pool = cls._pools.get(keys)
+            if pool is None:
+                pool = cls(keys)
+                cls._pools[keys] = pool
+        return pool
+
+    def acquire(self):
+        """
+        Returns the key with the most quota left, its quota is used.
+        Throttled keys are skipped unless all of them are.
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                available = [
+                    key for key in self.keys if not key.is_throttled(now)]
+                key = max(
+                    available or self.keys, key=lambda k: k.bucket.tokens)
+                if key.bucket.take():
+                    key.calls += 1
+                    return key
+                wait_seconds = key.bucket.wait_seconds()
+            self._sleep(wait_seconds)
+
+    def report_throttled(self, key):
+        with self._lock:
+            key.throttled += 1
+            key.throttled_until = self._clock() + THROTTLED_SECONDS
+        logger.warning('Etherscan key %s throttled', key.masked)
+
+    def usage(self):
+        """Per masked key calls and throttled counts."""
+        with self._lock:
+            return {
+                key.masked: {'calls': key.calls, 'throttled': key.throttled}
+                for key in self.keys}
+
+    def call(self, pyetheroll, function):
+        """
+        Returns `function(pyetheroll)` with a pyetheroll copy using the best
+        key, retried with another key if throttled.
+        """
+        for attempt in range(len(self.keys)):
+            key = self.acquire()
+            keyed_pyetheroll = copy.copy(pyetheroll)
+            keyed_pyetheroll.etherscan_api_key = key.key
+            try:
+                return function(keyed_pyetheroll)
+            except Exception as exception:
+                if not is_throttled_error(exception):
+                    raise
+                self.report_throttled(key)
+                if attempt == len(self.keys) - 1:
+                    raise
@@ -0,0 +1,238 @@
+"""
+Fairness audit of the dice results of the `RollStore` histories.
+Dice results should be uniformly drawn from 1 to 100 and independent from
+one roll to the next, which gets checked with a chi-square test of the
+faces counts and a Wald-Wolfowitz runs test above/below the median.
+Observed win rates are also compared with the expected ones per `roll_under`
+bucket.
+Counts are updated incrementally, only the rows settled since the last
+update get processed, and can be summed over accounts. Like the roll
+statistics they start over if bets taken as void get a result after all.
+"""
+import math
+import threading
+from typing import Dict
+
+import numpy as np
+
+from etherollapp.etheroll.roll_stats import (BUCKET_SIZE, BUCKETS,
+                                             PENDING_SECONDS, any_resolved,
+                                             get_settled_length)
+from etherollapp.etheroll.roll_store import UNKNOWN
+
+DICE_FACES = 100
+# dice results above that count as high ones in the runs test
+MEDIAN = DICE_FACES // 2
+# incomplete gamma function convergence
+GAMMA_EPSILON = 1e-12
+GAMMA_MAX_ITERATIONS = 1000
+
+
+def gamma_q(a, x):
+    """
+    Regularized upper incomplete gamma function `Q(a, x)`, using the series
+    below `a + 1` and the continued fraction above, see Numerical Recipes.
+    """
+    if x <= 0:
+        return 1.0
+    log_prefactor = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1 / a
+        for n in range(1, GAMMA_MAX_ITERATIONS):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * GAMMA_EPSILON:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefactor))
+    # modified Lentz's method
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for n in range(1, GAMMA_MAX_ITERATIONS):
+        an = -n * (n - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < GAMMA_EPSILON:
+            break
+    return math.exp(log_prefactor) * h
+
+
+def chi_square_p_value(statistic, dof):
+    """Probability of a chi-square statistic at least that large."""
+    return gamma_q(dof / 2, statistic / 2)
+
+
+def normal_p_value(z):
+    """Two-sided probability of a standard normal at least that extreme."""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def get_runs_moments(highs, lows):
+    """
+    Returns the expected number of runs and its variance of a random
+    sequence of `highs` and `lows`.
+    """
+    n = highs + lows
+    if n < 2:
+        return float(n), 0.0
+    product = 2 * highs * lows
+    return product / n + 1, product * (product - n) / (n ** 2 * (n - 1))
+
+
+class FairnessAudit:
+    """
+    Incremental fairness counts of a `RollStore`.
+    One per store, shared by the whole process.
+    """
+
+    # store path -> FairnessAudit
+    _audits: Dict[str, 'FairnessAudit'] = {}
+    _audits_lock = threading.Lock()
+
+    def __init__(self, store, pending_seconds=PENDING_SECONDS):
+        self.store = store
+        self.pending_seconds = pending_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # rows processed so far, and those processed as void
+        self.length = 0
+        self.void_rows = np.zeros(0, dtype=np.int64)
+        # resolved rolls per dice face, from 1 to `DICE_FACES`
+        self.dice_counts = np.zeros(DICE_FACES, dtype=np.int64)
+        # runs of dice results above/below the median
+        self.highs = self.lows = self.runs = 0
+        self.last_high = None
+        # observed and expected wins per `roll_under` bucket
+        self.bucket_rolls = np.zeros(BUCKETS, dtype=np.int64)
+        self.bucket_wins = np.zeros(BUCKETS, dtype=np.int64)
+        self.bucket_expected_wins = np.zeros(BUCKETS)
+        self.bucket_variance = np.zeros(BUCKETS)
+
+    @classmethod
+    def get_or_create(cls, store):
+        with cls._audits_lock:
+            audit = cls._audits.get(store.path)
+            if audit is None:
+                audit = cls(store)
+                cls._audits[store.path] = audit
+        return audit
+
+    def update(self):
+        """
+        Processes the rows settled since the last update, returns how many.
+        """
+        with self._lock:
+            columns = self.store.columns()
+            if any_resolved(columns['dice_result'], self.void_rows):
+                self.reset()
+            length = get_settled_length(
+                columns['dice_result'], columns['timestamp'],
+                self.pending_seconds)
+            if length <= self.length:
+                return 0
+            dice_result = columns['dice_result'][self.length:length]
+            roll_under = columns['roll_under'][self.length:length]
+            resolved = dice_result != UNKNOWN
+            self._update(dice_result[resolved], roll_under[resolved])
+            self.void_rows = np.concatenate((
+                self.void_rows, self.length + np.flatnonzero(~resolved)))
+            processed = length - self.length
+            self.length = length
+            return processed
+
+    def _update(self, dice_result, roll_under):
+        if not len(dice_result):
+            return
+        # faces counts, out of range results show as an unfair distribution
+        faces = np.clip(dice_result, 1, DICE_FACES) - 1
+        self.dice_counts += np.bincount(faces, minlength=DICE_FACES)
+        # runs, the first new one continues the last one if on the same side
+        high = dice_result > MEDIAN
+        highs = int(high.sum())
+        self.highs += highs
+        self.lows += len(high) - highs
+        self.runs += 1 + int(np.count_nonzero(high[1:] != high[:-1]))
+        if self.last_high is not None and self.last_high == high[0]:
+            self.runs -= 1
+        self.last_high = bool(high[-1])
+        # observed vs expected wins per bucket
+        won = dice_result < roll_under
+        probability = np.clip(roll_under - 1, 0, DICE_FACES) / DICE_FACES
+        buckets = np.clip((roll_under - 1) // BUCKET_SIZE, 0, BUCKETS - 1)
+        self.bucket_rolls += np.bincount(buckets, minlength=BUCKETS)
+        self.bucket_wins += np.bincount(buckets[won], minlength=BUCKETS)
+        self.bucket_expected_wins += np.bincount(
+            buckets, weights=probability, minlength=BUCKETS)
+        self.bucket_variance += np.bincount(
+            buckets, weights=probability * (1 - probability),
+            minlength=BUCKETS)
+
+    def report(self):
+        """Tests results of the account history, see `get_report()`."""
+        return get_report([self])
+
+
+def get_report(audits):
+    """
+    Returns the tests results of the `FairnessAudit` histories summed up,
+    e.g. of all the accounts.
+    P-values are `None` until there's enough rolls.
+    """
+    dice_counts = np.zeros(DICE_FACES, dtype=np.int64)
+    bucket_rolls = np.zeros(BUCKETS, dtype=np.int64)
+    bucket_wins = np.zeros(BUCKETS, dtype=np.int64)
+    bucket_expected_wins = np.zeros(BUCKETS)
+    bucket_variance = np.zeros(BUCKETS)
+    runs = expected_runs = runs_variance = 0
+    for audit in audits:
+        with audit._lock:
+            dice_counts += audit.dice_counts
+            bucket_rolls += audit.bucket_rolls
+            bucket_wins += audit.bucket_wins
+            bucket_expected_wins += audit.bucket_expected_wins
+            bucket_variance += audit.bucket_variance
+            # accounts histories are independent sequences
+            runs += audit.runs
+            expected, variance = get_runs_moments(audit.highs, audit.lows)
+        expected_runs += expected
+        runs_variance += variance
+    rolls = int(dice_counts.sum())
+    expected_count = rolls / DICE_FACES
+    chi_square = p_value = None
+    if rolls:
+        chi_square = float(
+            ((dice_counts - expected_count) ** 2).sum() / expected_count)
+        p_value = chi_square_p_value(chi_square, DICE_FACES - 1)
+    runs_z = runs_p_value = None
+    if runs_variance > 0:
+        runs_z = (runs - expected_runs) / math.sqrt(runs_variance)
+        runs_p_value = normal_p_value(runs_z)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bucket_win_rates = bucket_wins / bucket_rolls
+        bucket_expected_win_rates = bucket_expected_wins / bucket_rolls
+        bucket_z = (bucket_wins - bucket_expected_wins) / np.sqrt(
+            bucket_variance)
+    return {
+        'rolls': rolls,
+        'dice_counts': dice_counts.tolist(),
+        'chi_square': chi_square,
+        'chi_square_p_value': p_value,
+        'runs': runs,
+        'expected_runs': expected_runs,
+        'runs_z': runs_z,
+        'runs_p_value': runs_p_value,
+        'bucket_rolls': bucket_rolls.tolist(),
+        'bucket_win_rates': bucket_win_rates.tolist(),
+        'bucket_expected_win_rates': bucket_expected_win_rates.tolist(),
+        'bucket_z': bucket_z.tolist(),
+    }
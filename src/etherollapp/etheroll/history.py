@@ -0,0 +1,463 @@
+"""
+Roll history backends.
+The Etherscan one goes through its log API, the node one queries
+`eth_getLogs` on the chain JSON-RPC endpoints directly.
+Both fetch the bets and results events in block range pages, the next ones
+in parallel, decode them locally with the contract ABI and stream the
+rolls in block order, only keeping the prefetched pages and the bets
+awaiting their result in memory.
+Etherscan caps its results rather than rejecting large ranges, so its
+events are fetched over the whole range at once and only split when a
+page comes back full.
+The backend is picked with the `HISTORY_BACKEND` environment variable,
+`etherscan` (default) or `node`.
+"""
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Dict
+
+from eth_utils import to_int
+from hexbytes import HexBytes
+from pyetheroll.constants import ROUND_DIGITS
+
+from etherollapp.etheroll import rpc
+from etherollapp.etheroll.bet_results import get_topic_position
+from etherollapp.etheroll.circuit_breaker import get_etherscan_breaker
+from etherollapp.etheroll.etherscan_keys import (EtherscanError,
+                                                 EtherscanKeyPool)
+from etherollapp.etheroll.rolls import RollRecord
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BACKEND_ENV = 'HISTORY_BACKEND'
+# blocks looked back by the node backend, about a month
+HISTORY_BLOCKS = 200000
+# `eth_getLogs` block range, adapted to what the node accepts
+CHUNK_BLOCKS = 20000
+MIN_CHUNK_BLOCKS = 100
+MAX_CHUNK_BLOCKS = 100000
+# concurrent `eth_getLogs` requests, also the number of prefetched pages
+FETCH_WORKERS = 4
+# most logs returned by an Etherscan `getLogs` call, both events of a page
+# are fetched concurrently
+ETHERSCAN_MAX_RESULTS = 1000
+ETHERSCAN_FETCH_WORKERS = 2
+# bets still unresolved that many blocks later are streamed without result
+PENDING_BLOCKS = 1000
+# node errors meaning the block range should be narrowed
+RANGE_ERRORS = (
+    'more than',
+    'too many',
+    'range',
+    'limit',
+    'timeout',
+)
+
+
+def is_range_error(exception):
+    message = str(exception).lower()
+    return any(error in message for error in RANGE_ERRORS)
+
+
+def get_transaction_debugger(pyetheroll):
+    # lazy loading
+    from pyetheroll.transaction_debugger import TransactionDebugger
+    return TransactionDebugger(pyetheroll.contract_abi)
+
+
+def split_range(from_block, to_block, chunk_blocks):
+    """Splits the inclusive block range in `(from, to)` chunks."""
+    return [
+        (start, min(start + chunk_blocks - 1, to_block))
+        for start in range(from_block, to_block + 1, chunk_blocks)
+    ]
+
+
+def build_player_filter(pyetheroll, event_name, address, from_block, to_block):
+    """Returns the `eth_getLogs` filter matching the player events."""
+    position = get_topic_position(
+        pyetheroll.contract_abi, event_name, 'PlayerAddress')
+    topics = [None] * (position + 1)
+    topics[0] = pyetheroll.events_signatures[event_name].hex()
+    # adds zero padding to match topic format (32 bytes)
+    topics[position] = '0x' + address[2:].lower().zfill(2 * 32)
+    return {
+        'address': pyetheroll.contract_address,
+        'fromBlock': hex(from_block),
+        'toBlock': hex(to_block),
+        'topics': topics,
+    }
+
+
+def decode_bet_event(transaction_debugger, log):
+    """
+    Decodes the `LogBet` log, returns a bet log dictionary like
+    `Etheroll.get_bets_logs()` ones.
+    """
+    # lazy loading
+    from pyetheroll.utils import timestamp2datetime
+    topics = [HexBytes(topic) for topic in log['topics']]
+    call = transaction_debugger.decode_method(topics, log['data'])['call']
+    return {
+        'bet_id': call['BetID'].hex(),
+        'reward_value_ether': round(call['RewardValue'] / 1e18, ROUND_DIGITS),
+        'profit_value_ether': round(call['ProfitValue'] / 1e18, ROUND_DIGITS),
+        'bet_value_ether': round(call['BetValue'] / 1e18, ROUND_DIGITS),
+        'roll_under': call['PlayerNumber'],
+        'block_number': to_int(hexstr=log['blockNumber']),
+        'timestamp': log['timeStamp'],
+        'datetime': timestamp2datetime(log['timeStamp']),
+        'transaction_hash': log['transactionHash'],
+    }
+
+
+def decode_result_event(transaction_debugger, log):
+    """
+    Decodes the `LogResult` log, returns a bet result dictionary like
+    `Etheroll.get_bet_results_logs()` ones.
+    """
+    # lazy loading
+    from pyetheroll.utils import timestamp2datetime
+    topics = [HexBytes(topic) for topic in log['topics']]
+    call = transaction_debugger.decode_method(topics, log['data'])['call']
+    return {
+        'bet_id': call['BetID'].hex(),
+        'roll_under': call['PlayerNumber'],
+        'dice_result': call['DiceResult'],
+        'bet_value_ether': round(call['Value'] / 1e18, ROUND_DIGITS),
+        'timestamp': log['timeStamp'],
+        'datetime': timestamp2datetime(log['timeStamp']),
+        'transaction_hash': log['transactionHash'],
+    }
+
+
+def get_blocks_timestamps(pyetheroll, block_numbers):
+    """Returns the `block_number -> hex timestamp` of the blocks."""
+    block_numbers = sorted(set(block_numbers))
+    timestamps = {}
+    for start in range(0, len(block_numbers), rpc.MAX_BATCH_SIZE):
+        chunk = block_numbers[start:start + rpc.MAX_BATCH_SIZE]
+        blocks = rpc.batch_request(pyetheroll, [
+            ('eth_getBlockByNumber', [hex(block_number), False])
+            for block_number in chunk])
+        for block_number, block in zip(chunk, blocks):
+            if isinstance(block, rpc.RPCError):
+                raise block
+            timestamps[block_number] = block['timestamp']
+    return timestamps
+
+
+def iter_merged_pages(events_pages, pending_blocks=PENDING_BLOCKS):
+    """
+    Merges the `(event_name, to_block, logs)` pages in block order, yields
+    lists of merged logs, least recent first.
+    Bets are held until their result shows up, or for `pending_blocks`
+    blocks, so only those are kept in memory.
+    """
+    # bet_id -> merged log, in bet order
+    pending = OrderedDict()
+    for event_name, to_block, logs in events_pages:
+        if event_name == 'LogBet':
+            for bet_log in logs:
+                pending[bet_log['bet_id']] = {
+                    'bet_log': bet_log, 'bet_result': None}
+            continue
+        for bet_result in logs:
+            # results of bets older than the history are dropped
+            merged_log = pending.get(bet_result['bet_id'])
+            if merged_log is not None:
+                merged_log['bet_result'] = bet_result
+        page = []
+        while pending:
+            merged_log = next(iter(pending.values()))
+            if merged_log['bet_result'] is None and \
+                    to_block - merged_log['bet_log']['block_number'] < \
+                    pending_blocks:
+                break
+            pending.popitem(last=False)
+            page.append(merged_log)
+        yield page
+    yield list(pending.values())
+
+
+class PagedHistory(ABC):
+    """
+    Rolls from the player `LogBet` and `LogResult` events, fetched in
+    `chunk_blocks` pages, the next `workers` ones concurrently, or in a
+    single page if `None`.
+    Subclasses provide the block range and the decoded events pages.
+    """
+
+    EVENTS = ('LogBet', 'LogResult')
+    DECODERS = {
+        'LogBet': decode_bet_event,
+        'LogResult': decode_result_event,
+    }
+
+    def __init__(self, chunk_blocks, workers):
+        self.chunk_blocks = chunk_blocks
+        self.workers = workers
+
+    @abstractmethod
+    def get_block_range(self, pyetheroll, address):
+        """Returns the `(from_block, to_block)` range, `None` if no rolls."""
+
+    @abstractmethod
+    def get_page(self, pyetheroll, address, event_name, from_block, to_block):
+        """Decoded events of the range."""
+
+    def on_synced(self, chunk_blocks):
+        """All the pages of the range got fetched with `chunk_blocks`."""
+
+    def decode_logs(self, pyetheroll, event_name, logs):
+        """Decodes the raw logs, which must have their block `timeStamp`."""
+        if not logs:
+            return []
+        transaction_debugger = get_transaction_debugger(pyetheroll)
+        decode = self.DECODERS[event_name]
+        return [decode(transaction_debugger, log) for log in logs]
+
+    def iter_events_pages(self, pyetheroll, address, from_block, to_block):
+        """
+        Yields the player `(event_name, to_block, logs)` pages in block
+        order, the next `workers` pages being fetched concurrently.
+        """
+        chunk_blocks = self.chunk_blocks
+        ranges = [(from_block, to_block)] if chunk_blocks is None else \
+            split_range(from_block, to_block, chunk_blocks)
+        pages = (
+            (event_name, start, end)
+            for start, end in ranges
+            for event_name in self.EVENTS
+        )
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = deque()
+        try:
+            for page in pages:
+                futures.append((page, executor.submit(
+                    self.get_page, pyetheroll, address, *page)))
+                if len(futures) > self.workers:
+                    (event_name, _, end), future = futures.popleft()
+                    yield event_name, end, future.result()
+            while futures:
+                (event_name, _, end), future = futures.popleft()
+                yield event_name, end, future.result()
+        finally:
+            for _, future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+        self.on_synced(chunk_blocks)
+
+    def iter_merged_pages(self, pyetheroll, address):
+        block_range = self.get_block_range(pyetheroll, address)
+        if block_range is None:
+            return iter(())
+        return iter_merged_pages(self.iter_events_pages(
+            pyetheroll, address, *block_range))
+
+    def iter_merged_logs(self, pyetheroll, address):
+        return chain.from_iterable(
+            self.iter_merged_pages(pyetheroll, address))
+
+    def get_rolls(self, pyetheroll, address, on_page=None):
+        """
+        Returns the `RollRecord`, least recent first.
+        Each page of new rolls also gets passed to `on_page(rolls)`, only
+        the records are kept, not the merged logs.
+        """
+        rolls = []
+        for page in self.iter_merged_pages(pyetheroll, address):
+            page = to_rolls(page)
+            rolls.extend(page)
+            if page and on_page is not None:
+                on_page(page)
+        return tuple(rolls)
+
+
+class EtherscanHistory(PagedHistory):
+    """
+    Rolls of the last bets transactions, from the Etherscan log API.
+    Each event is fetched over the whole range, both concurrently, ranges
+    with `max_results` logs are split in halves since results got capped.
+    """
+
+    # event name -> `Etheroll` raw logs getter
+    LOGS_GETTERS = {
+        'LogBet': 'get_log_bet_events',
+        'LogResult': 'get_log_result_events',
+    }
+
+    def __init__(
+            self, max_results=ETHERSCAN_MAX_RESULTS,
+            workers=ETHERSCAN_FETCH_WORKERS):
+        super().__init__(None, workers)
+        self.max_results = max_results
+
+    def call(self, pyetheroll, function):
+        """
+        Returns `function(keyed_pyetheroll)` with the best API key, see
+        `EtherscanKeyPool.call()`.
+        """
+        breaker = get_etherscan_breaker(pyetheroll)
+        pool = EtherscanKeyPool.get_or_create()
+        return breaker.call(pool.call, pyetheroll, function)
+
+    def get_block_range(self, pyetheroll, address):
+        last_bets_blocks = self.call(
+            pyetheroll, lambda keyed: keyed.get_last_bets_blocks(address))
+        if last_bets_blocks is None:
+            return None
+        return last_bets_blocks['from_block'], last_bets_blocks['to_block']
+
+    def get_logs(self, pyetheroll, address, event_name, from_block, to_block):
+        def get_logs(keyed):
+            getter = getattr(keyed, self.LOGS_GETTERS[event_name])
+            logs = getter(address, from_block, to_block)
+            # errors come as the result message
+            if isinstance(logs, str):
+                raise EtherscanError(logs)
+            return logs
+        return self.call(pyetheroll, get_logs)
+
+    def get_range_logs(
+            self, pyetheroll, address, event_name, from_block, to_block):
+        """Raw logs of the range, split in halves while the page is full."""
+        logs = self.get_logs(
+            pyetheroll, address, event_name, from_block, to_block)
+        blocks = to_block - from_block + 1
+        if len(logs) < self.max_results or blocks == 1:
+            return logs
+        logger.info('Splitting %s blocks range: %s logs', blocks, len(logs))
+        middle = from_block + blocks // 2
+        return (
+            self.get_range_logs(
+                pyetheroll, address, event_name, from_block, middle - 1) +
+            self.get_range_logs(
+                pyetheroll, address, event_name, middle, to_block)
+        )
+
+    def get_page(self, pyetheroll, address, event_name, from_block, to_block):
+        logs = self.get_range_logs(
+            pyetheroll, address, event_name, from_block, to_block)
+        return self.decode_logs(pyetheroll, event_name, logs)
+
+
+class NodeHistory(PagedHistory):
+    """
+    Rolls from the `LogBet` and `LogResult` events of the last
+    `history_blocks` blocks, queried from the chain nodes.
+    Block ranges rejected by the node get split in halves and the chunk size
+    shrinks for the next syncs, it grows back after syncs with none rejected.
+    """
+
+    def __init__(
+            self, history_blocks=HISTORY_BLOCKS, chunk_blocks=CHUNK_BLOCKS,
+            workers=FETCH_WORKERS):
+        super().__init__(chunk_blocks, workers)
+        self.history_blocks = history_blocks
+        self._lock = threading.Lock()
+
+    def grow(self):
+        with self._lock:
+            self.chunk_blocks = min(self.chunk_blocks * 2, MAX_CHUNK_BLOCKS)
+
+    def shrink(self, failed_blocks):
+        with self._lock:
+            self.chunk_blocks = max(
+                min(self.chunk_blocks, failed_blocks) // 2, MIN_CHUNK_BLOCKS)
+
+    def on_synced(self, chunk_blocks):
+        if self.chunk_blocks == chunk_blocks:
+            self.grow()
+
+    def get_block_range(self, pyetheroll, address):
+        to_block = to_int(hexstr=rpc.request(
+            pyetheroll, 'eth_blockNumber', []))
+        return max(0, to_block - self.history_blocks), to_block
+
+    def get_chunk(self, pyetheroll, address, event_name, from_block, to_block):
+        log_filter = build_player_filter(
+            pyetheroll, event_name, address, from_block, to_block)
+        return rpc.request(pyetheroll, 'eth_getLogs', [log_filter])
+
+    def get_range_logs(
+            self, pyetheroll, address, event_name, from_block, to_block):
+        """Raw logs of the range, split in halves while the node rejects it."""
+        try:
+            return self.get_chunk(
+                pyetheroll, address, event_name, from_block, to_block)
+        except rpc.RPCError as exception:
+            blocks = to_block - from_block + 1
+            if not is_range_error(exception) or blocks <= MIN_CHUNK_BLOCKS:
+                raise
+            logger.info('Splitting %s blocks range: %s', blocks, exception)
+        self.shrink(blocks)
+        middle = from_block + blocks // 2
+        return (
+            self.get_range_logs(
+                pyetheroll, address, event_name, from_block, middle - 1) +
+            self.get_range_logs(
+                pyetheroll, address, event_name, middle, to_block)
+        )
+
+    def get_page(self, pyetheroll, address, event_name, from_block, to_block):
+        """Decoded events of the range, the raw logs are dropped right away."""
+        logs = self.get_range_logs(
+            pyetheroll, address, event_name, from_block, to_block)
+        if not logs:
+            return []
+        timestamps = get_blocks_timestamps(pyetheroll, [
+            to_int(hexstr=log['blockNumber']) for log in logs])
+        return self.decode_logs(pyetheroll, event_name, [
+            dict(log, timeStamp=timestamps[to_int(hexstr=log['blockNumber'])])
+            for log in logs
+        ])
+
+
+BACKENDS = {
+    'etherscan': EtherscanHistory,
+    'node': NodeHistory,
+}
+# backend name -> backend
+_backends: Dict[str, PagedHistory] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """Returns the configured history backend, shared by the process."""
+    name = os.environ.get(HISTORY_BACKEND_ENV) or 'etherscan'
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            backend = BACKENDS[name]()
+            _backends[name] = backend
+    return backend
+
+
+def to_rolls(merged_logs):
+    return tuple(map(RollRecord.from_merged_log, merged_logs))
+
+
+def get_rolls(pyetheroll, address, on_page=None):
+    """
+    Returns the address `RollRecord` from the configured backend.
+    Least recent first (index 0), most recent last (index -1).
+    Each page of new rolls also gets passed to `on_page(rolls)` while
+    fetching.
+    """
+    return get_backend().get_rolls(pyetheroll, address, on_page)
+
+
+def iter_rolls(pyetheroll, address):
+    """
+    Streams the address `RollRecord` from the configured backend, least
+    recent first.
+    """
+    return map(
+        RollRecord.from_merged_log,
+        get_backend().iter_merged_logs(pyetheroll, address))
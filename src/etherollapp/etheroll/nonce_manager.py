@@ -0,0 +1,118 @@
+"""
+Per account local nonce allocation.
+Relying on the node for every transaction means a `getTransactionCount`
+round trip per bet, and back-to-back bets colliding on the same nonce.
+"""
+import threading
+from typing import Dict, Tuple
+
+from pyetheroll.constants import ChainID
+
+
+class NonceManager:
+    """
+    Hands out nonces for one account, syncing with the chain lazily.
+    Nonces reserved but never broadcast (e.g. signing or network failure)
+    leave gaps, those get handed out again first so later transactions
+    don't get stuck behind them.
+    """
+
+    # (chain_id, address) -> NonceManager
+    _nonce_managers: Dict[Tuple[ChainID, str], 'NonceManager'] = {}
+    _nonce_managers_lock = threading.Lock()
+
+    def __init__(self, get_transaction_count):
+        """
+        `get_transaction_count()` returns the account pending transaction
+        count from the chain.
+        """
+        self.get_transaction_count = get_transaction_count
+        self._lock = threading.Lock()
+        self._next_nonce = None
+        # reserved, not yet broadcast nor released
+        self._reserved = set()
+        self._broadcast = set()
+        self._gaps = set()
+
+    @classmethod
+    def get_or_create(cls, chain_id, address, get_transaction_count):
+        key = (chain_id, address.lower())
+        with cls._nonce_managers_lock:
+            nonce_manager = cls._nonce_managers.get(key)
+            if nonce_manager is None:
+                nonce_manager = cls(get_transaction_count)
+                cls._nonce_managers[key] = nonce_manager
+        return nonce_manager
+
+    def _sync_locked(self):
+        """Resyncs local state with the chain, detecting gaps."""
+        transaction_count = self.get_transaction_count()
+        # mined or pending on the node, no need to track these anymore
+        self._broadcast = {
+            nonce for nonce in self._broadcast if nonce >= transaction_count}
+        in_use = self._broadcast | self._reserved
+        self._next_nonce = max(
+            [transaction_count] + [nonce + 1 for nonce in in_use])
+        # local reservations the chain never heard of
+        self._gaps = set(
+            range(transaction_count, self._next_nonce)) - in_use
+
+    def _reserve_locked(self):
+        if self._next_nonce is None:
+            self._sync_locked()
+        if self._gaps:
+            nonce = min(self._gaps)
+            self._gaps.remove(nonce)
+        else:
+            nonce = self._next_nonce
+            self._next_nonce += 1
+        self._reserved.add(nonce)
+        return nonce
+
+    def resync(self):
+        """Forces a resync, e.g. after a "nonce too low" error."""
+        with self._lock:
+            self._sync_locked()
+
+    def reserve(self):
+        """Atomically reserves and returns the next nonce to use."""
+        with self._lock:
+            return self._reserve_locked()
+
+    def reserve_many(self, count):
+        """
+        Atomically reserves `count` nonces, gaps first then sequential ones.
+        """
+        with self._lock:
+            return [self._reserve_locked() for _ in range(count)]
+
+    def mark_broadcast(self, nonce):
+        """The transaction using that nonce was accepted by the node."""
+        with self._lock:
+            self._reserved.discard(nonce)
+            self._broadcast.add(nonce)
+
+    def release(self, nonce):
+        """
+        The transaction using that nonce will never be broadcast.
+        If it was the last reserved one it's simply given back, otherwise
+        it's a gap to be filled by the next reservation.
+        """
+        with self._lock:
+            self._reserved.discard(nonce)
+            if self._next_nonce is None:
+                return
+            if nonce == self._next_nonce - 1:
+                self._next_nonce -= 1
+                # the gaps right below may now be given back too
+                while self._next_nonce - 1 in self._gaps:
+                    self._next_nonce -= 1
+                    self._gaps.remove(self._next_nonce)
+            elif nonce < self._next_nonce:
+                self._gaps.add(nonce)
+
+    @property
+    def gaps(self):
+        """Reserved nonces that will never be broadcast, lowest first."""
+        with self._lock:
+            return sorted(self._gaps)
@@ -0,0 +1,121 @@
+"""
+Bet notifications shared by the app and the roll polling service.
+Bets placed from the app are notified as soon as their receipt is in, and
+their results as soon as the result log is found, the service then skips
+them when they show up in Etherscan logs.
+What was notified is kept in its own file, read and written under a file
+lock shared by both processes and replaced atomically.
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from tempfile import NamedTemporaryFile
+
+from plyer import notification
+from pyetheroll.constants import ROUND_DIGITS
+
+from etherollapp.etheroll.store import Store
+
+NOTIFIED_FILENAME = 'notified.json'
+NOTIFIED_BETS_KEY = 'notified_bets'
+NOTIFIED_RESULTS_KEY = 'notified_results'
+# only the most recent ones are worth remembering
+MAX_NOTIFIED = 100
+
+
+def bet_placed_message(roll):
+    title = "Bet confirmed on chain"
+    message = (
+        '{bet_value_ether:.{round_digits}f} ETH '
+        'to roll under {roll_under}').format(**{
+            'bet_value_ether': roll.bet_value_ether,
+            'round_digits': ROUND_DIGITS,
+            'roll_under': roll.roll_under})
+    return title, message
+
+
+def bet_result_message(roll):
+    sign = '<' if roll.won else '>'
+    title = 'You '
+    title += 'won' if roll.won else 'lost'
+    message = f'{roll.dice_result} {sign} {roll.roll_under}'
+    return title, message
+
+
+def notify(title, message):
+    ticker = "Ticker"
+    notification.notify(title=title, message=message, ticker=ticker)
+
+
+def get_notified_path():
+    """Next to the user store, shared by the app and the service."""
+    return os.path.join(
+        os.path.dirname(Store.get_store_path()), NOTIFIED_FILENAME)
+
+
+@contextmanager
+def locked(path):
+    """Holds an exclusive lock on the file, across processes."""
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_notified(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        # losing it only means notifying again
+        return {}
+
+
+def write_notified(path, notified):
+    """Writes to a temporary file first, so readers never see it partial."""
+    with NamedTemporaryFile(
+            'w', dir=os.path.dirname(path), prefix=NOTIFIED_FILENAME,
+            delete=False) as f:
+        json.dump(notified, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, path)
+
+
+def get_notified(key):
+    """Identifiers of what was already notified, e.g. bets placed."""
+    path = get_notified_path()
+    with locked(path):
+        return read_notified(path).get(key, [])
+
+
+def set_notified(key, identifier):
+    """
+    Records the identifier as notified, returns `False` if it already was,
+    e.g. by the other process.
+    """
+    identifier = identifier.lower()
+    path = get_notified_path()
+    with locked(path):
+        notified = read_notified(path)
+        identifiers = notified.get(key, [])
+        if identifier in identifiers:
+            return False
+        notified[key] = (identifiers + [identifier])[-MAX_NOTIFIED:]
+        write_notified(path, notified)
+    return True
+
+
+def notify_bet_placed(roll):
+    """Notifies the bet was placed unless already done."""
+    if set_notified(NOTIFIED_BETS_KEY, roll.transaction_hash):
+        notify(*bet_placed_message(roll))
+
+
+def notify_bet_result(roll):
+    """Notifies the bet result unless already done."""
+    if set_notified(NOTIFIED_RESULTS_KEY, roll.bet_id):
+        notify(*bet_result_message(roll))
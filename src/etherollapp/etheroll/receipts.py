@@ -0,0 +1,92 @@
+"""
+Transaction receipts fetching and decoding.
+Receipts are available as soon as the transaction is mined, whereas
+Etherscan indexed logs lag behind the chain.
+"""
+import logging
+from datetime import datetime
+
+from eth_utils import to_hex, to_int
+from hexbytes import HexBytes
+from pyetheroll.constants import ROUND_DIGITS
+
+from etherollapp.etheroll import rpc
+
+logger = logging.getLogger(__name__)
+
+
+def get_receipt(pyetheroll, tx_hash):
+    """Returns the transaction receipt or `None` if not yet mined."""
+    receipt = rpc.request(
+        pyetheroll, 'eth_getTransactionReceipt', [to_hex(tx_hash)])
+    return receipt and normalize_receipt(receipt)
+
+
+def normalize_receipt(receipt):
+    """
+    Converts the quantities of a raw JSON-RPC receipt to integers so it can
+    be used like the ones returned by web3.
+    """
+    receipt = dict(receipt)
+    for key in ('status', 'blockNumber', 'gasUsed'):
+        if isinstance(receipt.get(key), str):
+            receipt[key] = to_int(hexstr=receipt[key])
+    return receipt
+
+
+def get_receipts(pyetheroll, tx_hashes):
+    """
+    Returns the receipts of the transactions, `None` for the ones not yet
+    mined.
+    Several transactions are looked up with a single batch request.
+    """
+    if len(tx_hashes) == 1:
+        return [get_receipt(pyetheroll, tx_hashes[0])]
+    results = rpc.batch_request(pyetheroll, [
+        ('eth_getTransactionReceipt', [to_hex(tx_hash)])
+        for tx_hash in tx_hashes
+    ])
+    receipts = []
+    for tx_hash, result in zip(tx_hashes, results):
+        if isinstance(result, rpc.RPCError):
+            # will be looked up again on next poll
+            logger.warning('Error getting %s receipt: %s', tx_hash, result)
+            result = None
+        receipts.append(result and normalize_receipt(result))
+    return receipts
+
+
+def decode_bet_log(pyetheroll, receipt):
+    """
+    Decodes the `LogBet` event from the `playerRollDice()` transaction
+    receipt, returns a bet log dictionary like `Etheroll.get_bets_logs()`
+    ones or `None` if the bet wasn't placed.
+    """
+    # lazy loading
+    from pyetheroll.transaction_debugger import TransactionDebugger
+    log_bet_signature = pyetheroll.events_signatures['LogBet']
+    contract_address = pyetheroll.contract_address.lower()
+    for log in receipt.get('logs', []):
+        topics = [HexBytes(topic) for topic in log['topics']]
+        if log['address'].lower() != contract_address or \
+                not topics or topics[0] != log_bet_signature:
+            continue
+        transaction_debugger = TransactionDebugger(pyetheroll.contract_abi)
+        call = transaction_debugger.decode_method(
+            topics, log['data'])['call']
+        return {
+            'bet_id': call['BetID'].hex(),
+            'reward_value_ether': round(
+                call['RewardValue'] / 1e18, ROUND_DIGITS),
+            'profit_value_ether': round(
+                call['ProfitValue'] / 1e18, ROUND_DIGITS),
+            'bet_value_ether': round(call['BetValue'] / 1e18, ROUND_DIGITS),
+            'roll_under': call['PlayerNumber'],
+            'block_number': receipt['blockNumber'],
+            # the receipt doesn't have the block timestamp, but it was mined
+            # within the last block or so
+            'timestamp': None,
+            'datetime': datetime.utcnow(),
+            'transaction_hash': HexBytes(receipt['transactionHash']).hex(),
+        }
+    return None
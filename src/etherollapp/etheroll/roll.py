@@ -1,4 +1,3 @@
-from etherscan.client import ConnectionRefused
 from kivy.app import App
 from kivy.clock import Clock, mainthread
 from kivy.properties import NumericProperty, StringProperty
@@ -8,8 +7,10 @@ from kivy.uix.screenmanager import Screen
 from pyetheroll.constants import ROUND_DIGITS
 from requests.exceptions import ConnectionError
 
-from etherollapp.etheroll.ui_utils import Dialog, load_kv_from_py
-from etherollapp.etheroll.utils import run_in_thread
+from etherollapp.etheroll import chain_cache, simulation
+from etherollapp.etheroll.rpc import RPCError
+from etherollapp.etheroll.ui_utils import load_kv_from_py
+from etherollapp.etheroll.utils import SupersedingWorker, run_in_thread
 
 load_kv_from_py(__file__)
 DEFAULT_MIN_BET = 0.10
@@ -48,9 +49,9 @@ class BetSize(BoxLayout):
         pyetheroll = controller.pyetheroll
         min_bet = DEFAULT_MIN_BET
         try:
-            min_bet_wei = pyetheroll.contract.functions.minBet().call()
+            min_bet_wei = chain_cache.get_min_bet(pyetheroll)
             min_bet = round(min_bet_wei / 1e18, ROUND_DIGITS)
-        except ConnectionError:
+        except (ConnectionError, RPCError):
             pass
         self.set_min_bet(min_bet)
 
@@ -123,6 +124,28 @@ class RollScreen(Screen):
 
     current_account_string = StringProperty(allownone=True)
     balance_property = NumericProperty()
+    # bets and sends not yet mined nor failed
+    pending_transactions_property = NumericProperty()
+    # bankroll simulation of the current bet parameters
+    simulation_text = StringProperty()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._balance_worker = SupersedingWorker()
+        self._simulation_worker = SupersedingWorker()
+
+    def on_current_account_string(self, instance, value):
+        """Drops the previous account balance and its pending fetch."""
+        self._balance_worker.cancel()
+        self.balance_property = 0
+
+    def on_balance_property(self, instance, value):
+        self.simulate_bankroll()
+
+    def on_leave(self):
+        """No need to keep fetching for a screen that's not displayed."""
+        self._balance_worker.cancel()
+        self._simulation_worker.cancel()
 
     def get_roll_input(self):
         """Returns bet size and chance of winning user input values."""
@@ -131,8 +154,17 @@ class RollScreen(Screen):
         return {
             "bet_size": bet_size.value,
             "chances": chance_of_winning.value,
+            "count": self.roll_count,
         }
 
+    @property
+    def roll_count(self):
+        """Returns how many bets to place at once, batch mode if > 1."""
+        try:
+            return max(1, int(self.ids.roll_count_input_id.text))
+        except ValueError:
+            return 1
+
     @mainthread
     def toggle_widgets(self, enabled):
         """Enables/disables widgets (useful during roll)."""
@@ -149,27 +181,72 @@ class RollScreen(Screen):
         return controller.pyetheroll
 
     @mainthread
-    def update_balance(self, balance):
-        """Updates the property from main thread."""
+    def update_balance(self, token, balance):
+        """
+        Updates the property from main thread, unless the request got
+        superseded in the meantime.
+        """
+        if token.cancelled:
+            return
         self.balance_property = balance
 
-    @staticmethod
-    @mainthread
-    def on_connection_refused():
-        title = 'No network'
-        body = 'No network, could not retrieve account balance.'
-        dialog = Dialog.create_dialog(title, body)
-        dialog.open()
-
-    @run_in_thread
     def fetch_update_balance(self):
-        """Retrieves the balance and updates the property."""
+        """
+        Retrieves (async) the balance and updates the property.
+        Supersedes any balance fetch still queued or in flight.
+        The balance is only fetched once per block.
+        """
         address = self.current_account_string
         if not address:
             return
+        return self._balance_worker.submit(self._fetch_update_balance, address)
+
+    def _fetch_update_balance(self, token, address):
         try:
-            balance = self.pyetheroll.get_balance(address)
-        except ConnectionRefused:
-            self.on_connection_refused()
+            balance = chain_cache.get_balance(self.pyetheroll, address)
+        except (ConnectionError, RPCError):
+            # surfaced by the controller offline indicator
+            return
+        self.update_balance(token, balance)
+
+    def simulate_bankroll(self):
+        """
+        Simulates (async) betting the current bet size with the balance as
+        bankroll. Supersedes any simulation still queued or running.
+        """
+        bet_size = self.ids.bet_size_id.value
+        # the chances input is sent as is as the roll under value
+        roll_under = self.ids.chance_of_winning_id.value
+        bankroll = self.balance_property
+        if not bankroll:
+            self._simulation_worker.cancel()
+            self.simulation_text = ''
+            return
+        return self._simulation_worker.submit(
+            self._simulate_bankroll, bankroll, bet_size, roll_under)
+
+    def _simulate_bankroll(self, token, bankroll, bet_size, roll_under):
+        result = simulation.simulate(bankroll, bet_size, roll_under)
+        self.update_simulation(token, result)
+
+    @staticmethod
+    def get_simulation_text(result):
+        if result is None:
+            return ''
+        percentiles = result['percentiles']
+        return (
+            'Over {rolls} rolls: {expected:+.{digits}f} ETH expected, '
+            '{ruin:.1%} risk of ruin\n'
+            '5%/50%/95%: {low:+.{digits}f} / {median:+.{digits}f} / '
+            '{high:+.{digits}f} ETH'
+        ).format(
+            rolls=result['rolls'], expected=result['expected_profit_loss'],
+            ruin=result['risk_of_ruin'], low=percentiles[5],
+            median=percentiles[50], high=percentiles[95],
+            digits=ROUND_DIGITS)
+
+    @mainthread
+    def update_simulation(self, token, result):
+        if token.cancelled:
             return
-        self.update_balance(balance)
+        self.simulation_text = self.get_simulation_text(result)
@@ -0,0 +1,126 @@
+"""
+Cumulative profit/loss chart of the account rolls.
+The series is LTTB downsampled to the widget width, scrolling zooms around
+the touch and double tapping resets the zoom.
+"""
+import threading
+from typing import Dict
+
+from kivy.graphics import Color, Line
+from kivy.properties import ListProperty, ObjectProperty
+from kivy.uix.widget import Widget
+
+from etherollapp.etheroll.downsampling import SeriesPyramid
+from etherollapp.etheroll.roll_store import GWEI
+
+ZOOM_FACTOR = 1.5
+
+
+class ProfitLossSeries(SeriesPyramid):
+    """
+    Cumulative profit/loss in ether over time of a `RollStore`.
+    One per store, shared by the whole process.
+    """
+
+    # store path -> ProfitLossSeries
+    _series: Dict[str, 'ProfitLossSeries'] = {}
+    _series_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # `RollStats.resets` of the synced rows
+        self.resets = 0
+
+    @classmethod
+    def get_or_create(cls, store):
+        with cls._series_lock:
+            series = cls._series.get(store.path)
+            if series is None:
+                series = cls()
+                cls._series[store.path] = series
+        return series
+
+    def sync(self, stats):
+        """
+        Appends the `RollStats` rows processed since the last sync, or all of
+        them again if the statistics started over since.
+        """
+        if stats.resets != self.resets:
+            self.clear()
+            self.resets = stats.resets
+        start = len(self)
+        timestamps = stats.store.column('timestamp')[start:stats.length]
+        self.extend(timestamps, stats.cumulative_gwei[start:] / GWEI)
+
+
+class RollChart(Widget):
+
+    series = ObjectProperty(None, allownone=True)
+    # displayed `(x_min, x_max)` range, `None` for the whole series
+    x_range = ObjectProperty(None, allownone=True)
+    line_color = ListProperty([0, 1, 0, 1])
+    axis_color = ListProperty([0.5, 0.5, 0.5, 1])
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.bind(
+            pos=self.redraw, size=self.redraw, series=self.redraw,
+            x_range=self.redraw)
+
+    def get_points(self):
+        """Returns the downsampled series `(x, y)` arrays to draw."""
+        if self.series is None:
+            return None, None
+        x_min, x_max = self.x_range or (None, None)
+        return self.series.downsample(max(int(self.width), 3), x_min, x_max)
+
+    def redraw(self, *args):
+        self.canvas.clear()
+        x, y = self.get_points()
+        if x is None or len(x) < 2:
+            return
+        x_min, x_max = x[0], x[-1]
+        # the zero profit/loss axis is always in view
+        y_min, y_max = min(y.min(), 0), max(y.max(), 0)
+        x_scale = self.width / ((x_max - x_min) or 1)
+        y_scale = self.height / ((y_max - y_min) or 1)
+        points = []
+        for point_x, point_y in zip(
+                (self.x + (x - x_min) * x_scale).tolist(),
+                (self.y + (y - y_min) * y_scale).tolist()):
+            points += [point_x, point_y]
+        zero_y = self.y - y_min * y_scale
+        with self.canvas:
+            Color(*self.axis_color)
+            Line(points=[self.x, zero_y, self.right, zero_y])
+            Color(*self.line_color)
+            Line(points=points)
+
+    def zoom(self, factor, center_x):
+        """Zooms in (`factor` > 1) or out around the widget `center_x`."""
+        x, _ = self.get_points()
+        if x is None or len(x) < 2:
+            return
+        x_min, x_max = x[0], x[-1]
+        center = x_min + (center_x - self.x) / self.width * (x_max - x_min)
+        x_min = center - (center - x_min) / factor
+        x_max = center + (x_max - center) / factor
+        # zoomed out past the whole series
+        series_x = self.series.levels[0][0]
+        if x_min <= series_x[0] and x_max >= series_x[-1]:
+            self.x_range = None
+        else:
+            self.x_range = (x_min, x_max)
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos):
+            return super().on_touch_down(touch)
+        if touch.is_mouse_scrolling:
+            factor = ZOOM_FACTOR if touch.button == 'scrolldown' else \
+                1 / ZOOM_FACTOR
+            self.zoom(factor, touch.x)
+            return True
+        if touch.is_double_tap:
+            self.x_range = None
+            return True
+        return super().on_touch_down(touch)
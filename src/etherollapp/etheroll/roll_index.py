@@ -0,0 +1,210 @@
+"""
+Filter and search indexes over the `RollStore` columns.
+Range filtered columns are kept sorted along with their rows order, so a
+range is two binary searches, and outcomes are kept as bitmaps.
+Both are grown incrementally, new rows get merged into the sorted ones
+and only the outcomes of rows still pending get recomputed.
+"""
+import calendar
+import re
+import threading
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+
+from etherollapp.etheroll.roll_stats import SECONDS_PER_DAY
+from etherollapp.etheroll.roll_store import GWEI, UNKNOWN
+
+OUTCOMES = ('won', 'lost', 'pending')
+# query field -> column
+QUERY_FIELDS = {
+    'roll': 'roll_under',
+    'bet': 'bet_value_gwei',
+    'date': 'timestamp',
+}
+QUERY_RANGE_REGEX = re.compile(
+    r'^(?P<field>[a-z]+)(?P<operator><=|>=|<|>|=)(?P<value>.+)$')
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class RollFilter:
+    """
+    Rolls matching all the criteria, `ranges` being `column -> (low, high)`
+    inclusive bounds, `None` for open ones.
+    """
+
+    def __init__(self, outcome=None, ranges=None):
+        if outcome is not None and outcome not in OUTCOMES:
+            raise ValueError(f'Unknown outcome {outcome}')
+        self.outcome = outcome
+        self.ranges = dict(ranges or {})
+
+    def __eq__(self, other):
+        if not isinstance(other, RollFilter):
+            return NotImplemented
+        return (self.outcome, self.ranges) == (other.outcome, other.ranges)
+
+    def __repr__(self):
+        return f'<RollFilter {self.outcome} {self.ranges}>'
+
+    @property
+    def empty(self):
+        return self.outcome is None and not self.ranges
+
+    def narrow(self, column, low=None, high=None):
+        """Intersects the column range with the `[low, high]` one."""
+        current_low, current_high = self.ranges.get(column, (None, None))
+        if current_low is not None:
+            low = current_low if low is None else max(low, current_low)
+        if current_high is not None:
+            high = current_high if high is None else min(high, current_high)
+        self.ranges[column] = (low, high)
+
+
+def parse_bounds(field, operator, value):
+    """
+    Returns the `(low, high)` inclusive bounds of the query range in column
+    units, i.e. gwei for bets and epoch seconds for (UTC) days.
+    """
+    if field == 'roll':
+        start = int(value)
+        # next possible value
+        end = start + 1
+    elif field == 'bet':
+        start = round(float(value) * GWEI)
+        end = start + 1
+    else:
+        start = calendar.timegm(
+            datetime.strptime(value, DATE_FORMAT).utctimetuple())
+        end = start + SECONDS_PER_DAY
+    return {
+        '=': (start, end - 1),
+        '<': (None, start - 1),
+        '<=': (None, end - 1),
+        '>': (end, None),
+        '>=': (start, None),
+    }[operator]
+
+
+def parse_query(query):
+    """
+    Parses space separated search terms, all of which must match, e.g.
+    `won roll<50 bet>=0.5 date>=2019-08-01`.
+    Outcomes are `won`, `lost` or `pending`, ranges compare the roll under
+    value, the bet size in ether or the UTC day.
+    Raises `ValueError` on invalid terms.
+    """
+    roll_filter = RollFilter()
+    for term in query.lower().split():
+        if term in OUTCOMES:
+            roll_filter.outcome = term
+            continue
+        match = QUERY_RANGE_REGEX.match(term)
+        if match is None or match.group('field') not in QUERY_FIELDS:
+            raise ValueError(f'Invalid search term {term}')
+        field = match.group('field')
+        low, high = parse_bounds(
+            field, match.group('operator'), match.group('value'))
+        roll_filter.narrow(QUERY_FIELDS[field], low, high)
+    return roll_filter
+
+
+def get_outcomes(dice_result, roll_under):
+    """`outcome -> bitmap` of the rows."""
+    pending = dice_result == UNKNOWN
+    won = ~pending & (dice_result < roll_under)
+    return {'won': won, 'lost': ~pending & ~won, 'pending': pending}
+
+
+class RollIndex:
+    """
+    Incremental indexes of a `RollStore`.
+    One per store, shared by the whole process.
+    """
+
+    # store path -> RollIndex
+    _indexes: Dict[str, 'RollIndex'] = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        # rows indexed so far
+        self.length = 0
+        # column -> (rows sorted by value, sorted values)
+        self.sorted_columns = {
+            column: (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            for column in QUERY_FIELDS.values()
+        }
+        self.outcomes = get_outcomes(
+            np.zeros(0, dtype=np.int16), np.zeros(0, dtype=np.int16))
+
+    @classmethod
+    def get_or_create(cls, store):
+        with cls._indexes_lock:
+            index = cls._indexes.get(store.path)
+            if index is None:
+                index = cls(store)
+                cls._indexes[store.path] = index
+        return index
+
+    def update(self):
+        """
+        Indexes the rows appended since the last update and the results
+        filled in since, returns how many rows were appended.
+        """
+        with self._lock:
+            columns = self.store.columns()
+            length = len(columns['dice_result'])
+            start = self.length
+            for column in self.sorted_columns:
+                self._merge_sorted(column, columns[column][start:length])
+            self._update_outcomes(
+                columns['dice_result'][:length],
+                columns['roll_under'][:length])
+            self.length = length
+            return length - start
+
+    def _merge_sorted(self, column, new_values):
+        if not len(new_values):
+            return
+        rows, values = self.sorted_columns[column]
+        new_rows = np.argsort(new_values, kind='stable')
+        new_values = new_values[new_rows].astype(np.int64)
+        new_rows += self.length
+        # after the equal values, so rows order is kept between equals
+        positions = np.searchsorted(values, new_values, side='right')
+        self.sorted_columns[column] = (
+            np.insert(rows, positions, new_rows),
+            np.insert(values, positions, new_values),
+        )
+
+    def _update_outcomes(self, dice_result, roll_under):
+        # only pending outcomes may change
+        changed = np.flatnonzero(self.outcomes['pending'])
+        changed_outcomes = get_outcomes(
+            dice_result[changed], roll_under[changed])
+        new_outcomes = get_outcomes(
+            dice_result[self.length:], roll_under[self.length:])
+        for outcome, bitmap in self.outcomes.items():
+            bitmap[changed] = changed_outcomes[outcome]
+            self.outcomes[outcome] = np.concatenate(
+                (bitmap, new_outcomes[outcome]))
+
+    def select(self, roll_filter):
+        """Returns the rows matching the `RollFilter`, least recent first."""
+        with self._lock:
+            if roll_filter.outcome is None:
+                mask = np.ones(self.length, dtype=bool)
+            else:
+                mask = self.outcomes[roll_filter.outcome].copy()
+            for column, (low, high) in roll_filter.ranges.items():
+                rows, values = self.sorted_columns[column]
+                start = 0 if low is None else np.searchsorted(values, low)
+                end = len(values) if high is None else np.searchsorted(
+                    values, high, side='right')
+                in_range = np.zeros(self.length, dtype=bool)
+                in_range[rows[start:end]] = True
+                mask &= in_range
+        return np.flatnonzero(mask)
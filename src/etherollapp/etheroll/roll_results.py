@@ -1,14 +1,21 @@
+import math
+
 from kivy.app import App
 from kivy.clock import Clock, mainthread
-from kivy.properties import ListProperty
+from kivy.logger import Logger
+from kivy.properties import ListProperty, ObjectProperty, StringProperty
 from kivymd.label import MDLabel
 from kivymd.list import ILeftBody, ThreeLineAvatarListItem
 from pyetheroll.constants import ROUND_DIGITS
 
-from etherollapp.etheroll.ui_utils import Dialog, SubScreen, load_kv_from_py
-from etherollapp.etheroll.utils import run_in_thread
+from etherollapp.etheroll import chain_cache
+from etherollapp.etheroll.rolls import RollRecord
+from etherollapp.etheroll.ui_utils import SubScreen, load_kv_from_py
+from etherollapp.etheroll.utils import SupersedingWorker
 
 load_kv_from_py(__file__)
+# most recent rolls listed, matching the search if any
+MAX_LISTED_ROLLS = 100
 
 
 class DiceResultWidget(ILeftBody, MDLabel):
@@ -17,12 +24,27 @@ class DiceResultWidget(ILeftBody, MDLabel):
 
 class RollResultsScreen(SubScreen):
 
-    roll_logs = ListProperty()
+    # `RollRecord` list, least recent first
+    rolls = ListProperty()
+    # statistics of the whole stored account history
+    stats_text = StringProperty()
+    # `RollFilter` of the search, `None` to show all `rolls`
+    roll_filter = ObjectProperty(None, allownone=True)
+    # most recent stored rolls matching `roll_filter`, least recent first
+    matching_rolls = ListProperty()
+    # search results count or error
+    search_text = StringProperty()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # TODO: make it a property that starts/stops spinner on set
         self._fetching_results = False
+        # address the displayed `rolls` belong to
+        self._rolls_address = None
+        # pending bets items listed above the rolls ones
+        self._pending_items = 0
+        self._results_worker = SupersedingWorker()
+        self._search_worker = SupersedingWorker()
         Clock.schedule_once(self._after_init)
 
     def _after_init(self, dt):
@@ -39,6 +61,14 @@ class RollResultsScreen(SubScreen):
             if not self._fetching_results:
                 self.get_last_results()
 
+    def on_leave(self):
+        """Cancels pending fetches so they don't update a hidden screen."""
+        super().on_leave()
+        self._results_worker.cancel()
+        self._search_worker.cancel()
+        self.toggle_spinner(show=False)
+        self._fetching_results = False
+
     def toggle_spinner(self, show):
         spinner = self.ids.spinner_id
         spinner.toggle(show)
@@ -54,26 +84,39 @@ class RollResultsScreen(SubScreen):
         return controller.pyetheroll
 
     @mainthread
-    def on_roll_logs(self, instance, value):
-        """Updates UI using roll results list."""
+    def on_matching_rolls(self, instance, value):
         self.update_roll_list()
 
-    @staticmethod
-    @mainthread
-    def on_connection_refused():
-        title = 'No network'
-        body = 'No network, could not retrieve roll history.'
-        dialog = Dialog.create_dialog(title, body)
-        dialog.open()
+    def on_roll_filter(self, instance, value):
+        self.update_roll_list()
 
-    @run_in_thread
     def get_last_results(self):
         """
-        Gets last rolls & results using pyetheroll lib and updates `roll_logs`
+        Fetches (async) last rolls & results, superseding any fetch still
+        queued or in flight.
+        Results of a previously selected account are cleared right away.
+        """
+        controller = App.get_running_app().root
+        account = controller.current_account
+        address = account and "0x" + account.address.hex()
+        if address != self._rolls_address:
+            self._rolls_address = None
+            self.rolls = []
+            self.update_roll_list()
+            self.stats_text = ''
+            self.ids.chart_id.series = None
+            self._search_worker.cancel()
+            self.matching_rolls = []
+        return self._results_worker.submit(self._get_last_results)
+
+    def _get_last_results(self, token):
+        """
+        Gets last rolls & results using pyetheroll lib and updates `rolls`
         list property.
         """
         # lazy loading
         from etherscan.client import ConnectionRefused
+        from requests.exceptions import ConnectionError
         controller = App.get_running_app().root
         account = controller.current_account
         if not account:
@@ -83,24 +126,200 @@ class RollResultsScreen(SubScreen):
         self._fetching_results = True
         self.toggle_spinner(show=True)
         address = "0x" + account.address.hex()
+        rolls = None
+        # rolls fetched before the page
+        offset = 0
+
+        def on_page(page):
+            nonlocal offset
+            self.sync_store(address, page)
+            self.update_rolls_page(token, address, page, offset)
+            offset += len(page)
+        try:
+            rolls = chain_cache.get_rolls(self.pyetheroll, address, on_page)
+        except (ConnectionRefused, ConnectionError):
+            # surfaced by the controller offline indicator
+            pass
+        if rolls is not None:
+            self.store_rolls(token, address, rolls)
+            # the search results may have grown too
+            roll_filter = self.roll_filter
+            if roll_filter is not None:
+                self._search(token, address, roll_filter)
+        self.update_rolls(token, address, rolls)
+
+    def sync_store(self, address, rolls):
+        """
+        Grows the account on disk roll history with the fetched rolls,
+        returns the `RollStore` or `None` if it can't be written.
+        """
+        # lazy loading
+        from etherollapp.etheroll.roll_store import RollStore
+        try:
+            store = RollStore.get_or_create(self.pyetheroll.chain_id, address)
+            store.sync(rolls)
+        except OSError as exception:
+            Logger.warning(f'RollResultsScreen: {exception}')
+            return None
+        return store
+
+    def store_rolls(self, token, address, rolls):
+        """
+        Grows the account on disk roll history with the fetched rolls and
+        updates its statistics and chart.
+        """
+        # lazy loading
+        from etherollapp.etheroll.fairness import FairnessAudit
+        from etherollapp.etheroll.roll_chart import ProfitLossSeries
+        from etherollapp.etheroll.roll_index import RollIndex
+        from etherollapp.etheroll.roll_stats import RollStats
+        store = self.sync_store(address, rolls)
+        if store is None:
+            return
+        stats = RollStats.get_or_create(store)
+        stats.update()
+        series = ProfitLossSeries.get_or_create(store)
+        series.sync(stats)
+        audit = FairnessAudit.get_or_create(store)
+        audit.update()
+        RollIndex.get_or_create(store).update()
+        self.update_stats(token, stats.summary(), audit.report(), series)
+
+    @staticmethod
+    def get_stats_text(summary):
+        if not summary['rolls']:
+            return ''
+        lines = [
+            '{rolls} rolls, {win_rate:.0%} won, '
+            '{profit_loss:+.{round_digits}f} ETH'.format(**{
+                'rolls': summary['rolls'],
+                'win_rate': summary['win_rate'],
+                'profit_loss': summary['profit_loss_ether'],
+                'round_digits': ROUND_DIGITS}),
+            'Max drawdown {max_drawdown:.{round_digits}f} ETH, '
+            'longest streaks {wins}W {losses}L'.format(**{
+                'max_drawdown': summary['max_drawdown_ether'],
+                'wins': summary['longest_win_streak'],
+                'losses': summary['longest_loss_streak'],
+                'round_digits': ROUND_DIGITS}),
+        ]
+        # win rate per chances of winning
+        bucket_size = 100 // len(summary['bucket_win_rates'])
+        lines.append(' '.join(
+            '{0}-{1}: {2:.0%}'.format(
+                index * bucket_size + 1, (index + 1) * bucket_size, win_rate)
+            for index, win_rate in enumerate(summary['bucket_win_rates'])
+            if not math.isnan(win_rate)))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def get_fairness_text(report):
+        """Dice results tests p-values, low values hint at unfair dice."""
+        if report['chi_square_p_value'] is None:
+            return ''
+        runs_p_value = report['runs_p_value']
+        return 'Fairness p-values: dice {0:.2f}, runs {1}'.format(
+            report['chi_square_p_value'],
+            '?' if runs_p_value is None else '{0:.2f}'.format(runs_p_value))
+
+    @mainthread
+    def update_stats(self, token, summary, report, series):
+        if token.cancelled:
+            return
+        self.stats_text = '\n'.join(filter(None, (
+            self.get_stats_text(summary), self.get_fairness_text(report))))
+        chart = self.ids.chart_id
+        chart.series = series
+        # the series may have grown in place
+        chart.redraw()
+
+    def search(self, query):
+        """
+        Filters (async) the stored account rolls with the search query,
+        see `roll_index.parse_query()`, superseding any search still
+        queued or running.
+        """
+        # lazy loading
+        from etherollapp.etheroll.roll_index import parse_query
+        try:
+            roll_filter = parse_query(query)
+        except ValueError as exception:
+            self.search_text = str(exception)
+            return
+        self._search_worker.cancel()
+        if roll_filter.empty:
+            self.search_text = ''
+            self.roll_filter = None
+            return
+        self.roll_filter = roll_filter
+        address = self._rolls_address
+        # searched once the account rolls are fetched otherwise
+        if address is None:
+            self.matching_rolls = []
+            return
+        return self._search_worker.submit(self._search, address, roll_filter)
+
+    def _search(self, token, address, roll_filter):
+        # lazy loading
+        from etherollapp.etheroll.roll_index import RollIndex
+        from etherollapp.etheroll.roll_store import RollStore
         try:
-            self.roll_logs = self.pyetheroll.get_merged_logs(
-                address=address)
-        except ConnectionRefused:
-            self.on_connection_refused()
+            store = RollStore.get_or_create(self.pyetheroll.chain_id, address)
+        except OSError as exception:
+            Logger.warning(f'RollResultsScreen: {exception}')
+            return
+        index = RollIndex.get_or_create(store)
+        index.update()
+        rows = index.select(roll_filter)
+        rolls = store.take(rows[-MAX_LISTED_ROLLS:])
+        self.update_matching_rolls(token, roll_filter, rolls, len(rows))
+
+    @mainthread
+    def update_matching_rolls(self, token, roll_filter, rolls, count):
+        if token.cancelled or roll_filter != self.roll_filter:
+            return
+        self.search_text = '{0} matching rolls'.format(count)
+        self.matching_rolls = rolls
+
+    @mainthread
+    def update_rolls_page(self, token, address, rolls, offset):
+        """
+        Appends the page of newly fetched rolls, while the rest is still
+        being fetched, `offset` being the number of rolls fetched before.
+        Only the page items get created, the first page replaces the list.
+        """
+        if token.cancelled:
+            return
+        self._rolls_address = address
+        if not offset:
+            self.rolls = rolls
+            self.update_roll_list()
+            return
+        self.rolls.extend(rolls)
+        if self.roll_filter is None:
+            self.add_roll_items(rolls)
+
+    @mainthread
+    def update_rolls(self, token, address, rolls):
+        """
+        Updates `rolls` from main thread, unless the request got
+        superseded in the meantime, in which case the response is dropped
+        before any widget gets created.
+        """
+        if token.cancelled:
+            return
+        if rolls is not None:
+            self._rolls_address = address
+            self.rolls = rolls
+            self.update_roll_list()
         self.toggle_spinner(show=False)
         self._fetching_results = False
 
     @staticmethod
-    def create_item_from_dict(roll_log):
-        """Creates a roll list item from a roll log dictionary."""
-        # lazy loading
-        from pyetheroll.utils import EtherollUtils
-        bet_log = roll_log['bet_log']
-        bet_result = roll_log['bet_result']
-        bet_value_ether = bet_log['bet_value_ether']
-        roll_under = bet_log['roll_under']
-        date_time = bet_log['datetime']
+    def create_item_from_roll(roll):
+        """Creates a roll list item from a `RollRecord`."""
+        roll_under = roll.roll_under
+        date_time = roll.datetime
         # will keep default value on unresolved bets
         dice_result = '?'
         player_won = None
@@ -111,18 +330,15 @@ class RollResultsScreen(SubScreen):
         text_color = unresolved_color
         profit_loss_str = '?'
         # resolved bets case
-        if bet_result is not None:
-            dice_result = bet_result['dice_result']
-            player_won = dice_result < roll_under
+        if roll.resolved:
+            dice_result = roll.dice_result
+            player_won = roll.won
             sign = '<' if player_won else '>'
             text_color = win_color if player_won else loss_color
-            chances_win = roll_under - 1
-            profit = EtherollUtils.compute_profit(bet_value_ether, chances_win)
-            profit_loss = profit if player_won else -bet_value_ether
             profit_loss_str = (
                 '{profit_loss:+.{round_digits}f}'
             ).format(**{
-                'profit_loss': profit_loss,
+                'profit_loss': roll.profit_loss_ether,
                 'round_digits': ROUND_DIGITS})
         text = ('{0} ETH').format(profit_loss_str)
         secondary_text = '{0} {1} {2}'.format(
@@ -138,11 +354,84 @@ class RollResultsScreen(SubScreen):
         list_item.add_widget(avatar_sample_widget)
         return list_item
 
+    @staticmethod
+    def create_item_from_submission(submission):
+        """
+        Creates a roll list item from a bet still in the submission pipeline
+        or not yet picked up by the roll history.
+        """
+        details = submission.details
+        text = '{0} ETH'.format(details['bet_value_ether'])
+        secondary_text = '? < {0}\n{1}'.format(
+            details['roll_under'], submission.status.value.capitalize())
+        unresolved_color = (0.5, 0.5, 0.5, 1)
+        avatar_sample_widget = DiceResultWidget(
+            text='?', font_style='Title',
+            theme_text_color='Custom', text_color=unresolved_color)
+        list_item = ThreeLineAvatarListItem(
+            text=text, secondary_text=secondary_text)
+        list_item.add_widget(avatar_sample_widget)
+        return list_item
+
+    def get_pending_rolls(self):
+        """
+        Returns the current account bets sent from the app, most recent
+        first, which are not yet in the roll history.
+        """
+        controller = App.get_running_app().root
+        account = controller.current_account
+        if account is None:
+            return []
+        transaction_hashes = {roll.transaction_hash for roll in self.rolls}
+        return [
+            submission for submission in reversed(
+                controller.submission_pipeline.submissions)
+            if submission.kind == 'roll' and
+            submission.account.address == account.address and (
+                submission.tx_hash is None or
+                submission.tx_hash.hex() not in transaction_hashes)
+        ]
+
+    def add_roll_items(self, rolls):
+        """
+        Adds the items of the rolls, more recent than the listed ones,
+        below the pending bets, dropping the least recent ones past
+        `MAX_LISTED_ROLLS`.
+        """
+        roll_list = self.ids.roll_list_id
+        for roll in rolls[-MAX_LISTED_ROLLS:]:
+            # last children are listed first
+            index = len(roll_list.children) - self._pending_items
+            roll_list.add_widget(self.create_item_from_roll(roll), index)
+        while len(roll_list.children) - self._pending_items > \
+                MAX_LISTED_ROLLS:
+            roll_list.remove_widget(roll_list.children[0])
+
     def update_roll_list(self):
-        """Updates the roll results list widget."""
+        """
+        Updates the roll results list widget, with only the rolls matching
+        the search if any, up to the `MAX_LISTED_ROLLS` most recent ones.
+        """
         roll_list = self.ids.roll_list_id
         roll_list.clear_widgets()
-        roll_logs = reversed(self.roll_logs)
-        for roll_log in roll_logs:
-            list_item = self.create_item_from_dict(roll_log)
+        self._pending_items = 0
+        if self.roll_filter is not None:
+            for roll in reversed(self.matching_rolls):
+                roll_list.add_widget(self.create_item_from_roll(roll))
+            return
+        controller = App.get_running_app().root
+        bet_results = controller.bet_watcher.results
+        pending_rolls = self.get_pending_rolls()
+        for submission in pending_rolls:
+            bet_log = submission.event
+            if bet_log is None:
+                list_item = self.create_item_from_submission(submission)
+            else:
+                # placed, possibly already resolved
+                list_item = self.create_item_from_roll(RollRecord.from_logs(
+                    bet_log, bet_results.get(bet_log['bet_id'])))
+            roll_list.add_widget(list_item)
+        self._pending_items = len(pending_rolls)
+        for roll in reversed(self.rolls[-MAX_LISTED_ROLLS:]):
+            list_item = self.create_item_from_roll(roll)
             roll_list.add_widget(list_item)
@@ -0,0 +1,232 @@
+"""
+Roll statistics computed with vectorized array operations over the
+`RollStore` columns.
+Aggregates are updated incrementally, only the rows appended (or resolved)
+since the last update get processed. Bets taken as void getting a result
+after all make them start over.
+"""
+import threading
+from typing import Dict
+
+import numpy as np
+
+from etherollapp.etheroll.roll_store import GWEI, UNKNOWN
+
+SECONDS_PER_DAY = 24 * 60 * 60
+# unresolved bets older than that (from the last roll) are considered void,
+# e.g. refunded, and no longer hold back the statistics
+PENDING_SECONDS = SECONDS_PER_DAY
+# roll_under buckets width, e.g. 1-10, 11-20...
+BUCKET_SIZE = 10
+BUCKETS = 100 // BUCKET_SIZE
+
+
+def get_settled_length(dice_result, timestamp, pending_seconds):
+    """
+    Returns the length of the rows prefix that won't change anymore, that is
+    up to the first unresolved bet still likely to get a result.
+    """
+    if not len(dice_result):
+        return 0
+    pending = (dice_result == UNKNOWN) & (
+        timestamp > timestamp[-1] - pending_seconds)
+    pending_indexes = np.flatnonzero(pending)
+    return pending_indexes[0] if len(pending_indexes) else len(dice_result)
+
+
+def any_resolved(dice_result, rows):
+    """Whether any of the rows, processed as void, got a result since."""
+    return bool((dice_result[rows] != UNKNOWN).any())
+
+
+def get_profit_loss(columns):
+    """Per roll won profit or lost bet (negative) in gwei, 0 if void."""
+    dice_result = columns['dice_result']
+    resolved = dice_result != UNKNOWN
+    won = resolved & (dice_result < columns['roll_under'])
+    return np.where(
+        won, columns['profit_value_gwei'],
+        np.where(resolved, -columns['bet_value_gwei'], 0))
+
+
+def get_longest_streak(outcomes, current):
+    """
+    Returns `(longest, current)` streaks of `True` values, `current` being
+    the streak carried over from the previous rows.
+    """
+    if not len(outcomes):
+        return current, current
+    # padded so the runs start and end show as edges in the diff
+    values = np.concatenate(([False], outcomes, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(values))
+    starts, ends = edges[::2], edges[1::2]
+    lengths = ends - starts
+    if len(lengths) and starts[0] == 0:
+        lengths[0] += current
+    longest = lengths.max() if len(lengths) else 0
+    tail = lengths[-1] if len(lengths) and ends[-1] == len(outcomes) else 0
+    return max(longest, current), tail
+
+
+class RollStats:
+    """
+    Incremental statistics of a `RollStore`.
+    One per store, shared by the whole process.
+    """
+
+    # store path -> RollStats
+    _stats: Dict[str, 'RollStats'] = {}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, store, pending_seconds=PENDING_SECONDS):
+        self.store = store
+        self.pending_seconds = pending_seconds
+        self._lock = threading.Lock()
+        # times the statistics started over
+        self.resets = 0
+        self.reset()
+
+    def reset(self):
+        # rows processed so far, and those processed as void
+        self.length = 0
+        self.void_rows = np.zeros(0, dtype=np.int64)
+        self.rolls = 0
+        self.wins = 0
+        self.wagered_gwei = 0
+        self.bucket_rolls = np.zeros(BUCKETS, dtype=np.int64)
+        self.bucket_wins = np.zeros(BUCKETS, dtype=np.int64)
+        # per processed row cumulated profit/loss
+        self.cumulative_gwei = np.zeros(0, dtype=np.int64)
+        self.peak_gwei = 0
+        self.max_drawdown_gwei = 0
+        self.longest_win_streak = self.longest_loss_streak = 0
+        self.win_streak = self.loss_streak = 0
+        # days since epoch -> (rolls, profit/loss gwei)
+        self.days = np.zeros(0, dtype=np.int64)
+        self.daily_rolls = np.zeros(0, dtype=np.int64)
+        self.daily_gwei = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def get_or_create(cls, store):
+        with cls._stats_lock:
+            stats = cls._stats.get(store.path)
+            if stats is None:
+                stats = cls(store)
+                cls._stats[store.path] = stats
+        return stats
+
+    @property
+    def losses(self):
+        return self.rolls - self.wins
+
+    @property
+    def win_rate(self):
+        return self.wins / self.rolls if self.rolls else None
+
+    @property
+    def profit_loss_gwei(self):
+        return int(self.cumulative_gwei[-1]) if self.length else 0
+
+    def bucket_win_rates(self):
+        """Per `roll_under` bucket win rate, `nan` for empty buckets."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.bucket_wins / self.bucket_rolls
+
+    def update(self):
+        """
+        Processes the rows settled since the last update, returns how many.
+        """
+        with self._lock:
+            columns = self.store.columns()
+            if any_resolved(columns['dice_result'], self.void_rows):
+                self.reset()
+                self.resets += 1
+            length = get_settled_length(
+                columns['dice_result'], columns['timestamp'],
+                self.pending_seconds)
+            if length <= self.length:
+                return 0
+            new = {
+                name: column[self.length:length]
+                for name, column in columns.items()}
+            self._update(new)
+            self.void_rows = np.concatenate((
+                self.void_rows,
+                self.length + np.flatnonzero(new['dice_result'] == UNKNOWN)))
+            processed = length - self.length
+            self.length = length
+            return processed
+
+    def _update(self, new):
+        dice_result = new['dice_result']
+        roll_under = new['roll_under']
+        resolved = dice_result != UNKNOWN
+        won = resolved & (dice_result < roll_under)
+        lost = resolved & ~won
+        profit_loss = get_profit_loss(new)
+        # totals
+        self.rolls += int(resolved.sum())
+        self.wins += int(won.sum())
+        self.wagered_gwei += int(new['bet_value_gwei'][resolved].sum())
+        # win rate per roll_under bucket
+        buckets = np.clip((roll_under - 1) // BUCKET_SIZE, 0, BUCKETS - 1)
+        self.bucket_rolls += np.bincount(
+            buckets[resolved], minlength=BUCKETS)
+        self.bucket_wins += np.bincount(buckets[won], minlength=BUCKETS)
+        # cumulative profit/loss and max drawdown
+        cumulative = self.profit_loss_gwei + np.cumsum(profit_loss)
+        peaks = np.maximum.accumulate(np.maximum(cumulative, self.peak_gwei))
+        self.peak_gwei = int(peaks[-1])
+        self.max_drawdown_gwei = max(
+            self.max_drawdown_gwei, int((peaks - cumulative).max()))
+        self.cumulative_gwei = np.concatenate(
+            (self.cumulative_gwei, cumulative))
+        # streaks, void bets neither break nor extend them
+        longest, self.win_streak = get_longest_streak(
+            won[resolved], self.win_streak)
+        self.longest_win_streak = max(self.longest_win_streak, longest)
+        longest, self.loss_streak = get_longest_streak(
+            lost[resolved], self.loss_streak)
+        self.longest_loss_streak = max(self.longest_loss_streak, longest)
+        # daily rollups
+        days, inverse = np.unique(
+            new['timestamp'][resolved] // SECONDS_PER_DAY,
+            return_inverse=True)
+        daily_rolls = np.bincount(inverse, minlength=len(days))
+        daily_gwei = np.bincount(
+            inverse, weights=profit_loss[resolved],
+            minlength=len(days)).astype(np.int64)
+        self._merge_days(days, daily_rolls, daily_gwei)
+
+    def _merge_days(self, days, daily_rolls, daily_gwei):
+        all_days = np.union1d(self.days, days)
+        merged_rolls = np.zeros(len(all_days), dtype=np.int64)
+        merged_gwei = np.zeros(len(all_days), dtype=np.int64)
+        for day_values, rolls, gwei in (
+                (self.days, self.daily_rolls, self.daily_gwei),
+                (days, daily_rolls, daily_gwei)):
+            indexes = np.searchsorted(all_days, day_values)
+            np.add.at(merged_rolls, indexes, rolls)
+            np.add.at(merged_gwei, indexes, gwei)
+        self.days = all_days
+        self.daily_rolls = merged_rolls
+        self.daily_gwei = merged_gwei
+
+    def summary(self):
+        """Statistics in ether, ready to be displayed."""
+        with self._lock:
+            return {
+                'rolls': self.rolls,
+                'wins': self.wins,
+                'losses': self.losses,
+                'win_rate': self.win_rate,
+                'wagered_ether': self.wagered_gwei / GWEI,
+                'profit_loss_ether': self.profit_loss_gwei / GWEI,
+                'max_drawdown_ether': self.max_drawdown_gwei / GWEI,
+                'longest_win_streak': self.longest_win_streak,
+                'longest_loss_streak': self.longest_loss_streak,
+                'bucket_win_rates': self.bucket_win_rates().tolist(),
+                'last_day_profit_loss_ether': (
+                    int(self.daily_gwei[-1]) / GWEI
+                    if len(self.daily_gwei) else 0),
+            }
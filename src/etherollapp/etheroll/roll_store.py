@@ -0,0 +1,221 @@
+"""
+Memory-mapped columnar roll history.
+Rolls of each chain and account are stored under the app `user_data_dir`,
+one raw NumPy array file per column, only ever appended to by the history
+sync and memory-mapped for zero-copy reads, so statistics and charts can
+work on arrays without loading Python objects.
+Wei values are stored in gwei to fit `int64`.
+"""
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+from kivy.app import App
+
+from etherollapp.etheroll.rolls import RollRecord
+
+ROLLS_DIR = 'rolls_v1'
+GWEI = 10 ** 9
+# `block_number` and `dice_result` of unknown values
+UNKNOWN = -1
+COLUMNS = (
+    ('bet_id', 'S32'),
+    ('transaction_hash', 'S32'),
+    ('block_number', np.int64),
+    ('timestamp', np.int64),
+    ('bet_value_gwei', np.int64),
+    ('profit_value_gwei', np.int64),
+    ('roll_under', np.int16),
+    ('dice_result', np.int16),
+)
+
+
+def get_chain_dir(chain_id):
+    app = App.get_running_app()
+    chain_name = getattr(chain_id, 'name', str(chain_id)).lower()
+    return os.path.join(app.user_data_dir, ROLLS_DIR, chain_name)
+
+
+def get_rolls_dir(chain_id, address):
+    return os.path.join(get_chain_dir(chain_id), address.lower())
+
+
+def to_bytes32(value):
+    """`S32` items lose their trailing null bytes."""
+    return value.ljust(32, b'\0')
+
+
+def to_row(roll):
+    """Returns the `RollRecord` as a tuple of the columns values."""
+    return (
+        bytes.fromhex(roll.bet_id),
+        bytes.fromhex(roll.transaction_hash[2:]),
+        UNKNOWN if roll.block_number is None else roll.block_number,
+        roll.timestamp,
+        roll.bet_value_wei // GWEI,
+        roll.profit_value_wei // GWEI,
+        roll.roll_under,
+        UNKNOWN if roll.dice_result is None else roll.dice_result,
+    )
+
+
+class RollStore:
+    """
+    Append-only columns of an account rolls, least recent first.
+    Only the results of rolls stored unresolved get updated in place.
+    One store per directory, shared by the whole process.
+    """
+
+    # path -> RollStore
+    _stores: Dict[str, 'RollStore'] = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._columns = {}
+        self._open()
+
+    def __len__(self):
+        return len(self._columns['bet_id'])
+
+    @classmethod
+    def get_or_create(cls, chain_id, address):
+        path = get_rolls_dir(chain_id, address)
+        with cls._stores_lock:
+            store = cls._stores.get(path)
+            if store is None:
+                store = cls(path)
+                cls._stores[path] = store
+        return store
+
+    @classmethod
+    def get_all(cls, chain_id):
+        """Returns the stores of all the accounts with a stored history."""
+        chain_dir = get_chain_dir(chain_id)
+        if not os.path.isdir(chain_dir):
+            return []
+        return [
+            cls.get_or_create(chain_id, address)
+            for address in sorted(os.listdir(chain_dir))
+            if os.path.isdir(os.path.join(chain_dir, address))
+        ]
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _map(self, name, dtype, length):
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(
+            self._column_path(name), dtype=dtype, mode='r+', shape=(length,))
+
+    def _open(self):
+        """
+        Maps the columns, truncating them to the shortest one in case an
+        append got interrupted.
+        """
+        lengths = {}
+        for name, dtype in COLUMNS:
+            column_path = self._column_path(name)
+            if not os.path.exists(column_path):
+                open(column_path, 'wb').close()
+            lengths[name] = (
+                os.path.getsize(column_path) // np.dtype(dtype).itemsize)
+        length = min(lengths.values())
+        for name, dtype in COLUMNS:
+            if lengths[name] != length:
+                os.truncate(
+                    self._column_path(name),
+                    length * np.dtype(dtype).itemsize)
+            self._columns[name] = self._map(name, dtype, length)
+
+    def column(self, name):
+        """Read-only zero-copy view of the column."""
+        column = self._columns[name].view()
+        column.flags.writeable = False
+        return column
+
+    def columns(self):
+        """`name -> column` read-only views, all of the same length."""
+        with self._lock:
+            return {name: self.column(name) for name, _ in COLUMNS}
+
+    def append(self, rolls):
+        """Appends the `RollRecord`, returns the number of rows appended."""
+        rows = np.array(
+            [to_row(roll) for roll in rolls],
+            dtype=[(name, dtype) for name, dtype in COLUMNS])
+        if not len(rows):
+            return 0
+        with self._lock:
+            length = len(self) + len(rows)
+            for name, dtype in COLUMNS:
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(rows[name].tobytes())
+            for name, dtype in COLUMNS:
+                self._columns[name] = self._map(name, dtype, length)
+        return len(rows)
+
+    def sync(self, rolls):
+        """
+        Appends the rolls not stored yet and fills in the results of the
+        stored unresolved ones, returns the number of rows appended.
+        `rolls` are least recent first, e.g. from `history.get_rolls()`.
+        """
+        rolls = list(rolls)
+        bet_ids = np.array(
+            [bytes.fromhex(roll.bet_id) for roll in rolls], dtype='S32')
+        with self._lock:
+            stored = np.isin(bet_ids, self._columns['bet_id'])
+            dice_results = self._columns['dice_result']
+            pending = np.flatnonzero(dice_results == UNKNOWN)
+            # stored bet_id -> row, of the unresolved ones only
+            pending_rows = dict(zip(
+                self._columns['bet_id'][pending].tolist(), pending.tolist()))
+            for index in np.flatnonzero(stored).tolist():
+                row = pending_rows.get(bet_ids[index])
+                if row is not None and rolls[index].resolved:
+                    dice_results[row] = rolls[index].dice_result
+            if pending_rows:
+                dice_results.flush()
+        return self.append(
+            roll for roll, is_stored in zip(rolls, stored) if not is_stored)
+
+    def rolls(self, start=0, stop=None):
+        """
+        Returns the rows as `RollRecord`, meant for a few rows, e.g. the
+        ones to display.
+        """
+        columns = self.columns()
+        return self._to_rolls(
+            column[start:stop] for column in columns.values())
+
+    def take(self, rows):
+        """
+        Returns the rows at the `rows` indexes as `RollRecord`, e.g. the
+        ones matching a filter.
+        """
+        columns = self.columns()
+        return self._to_rolls(column[rows] for column in columns.values())
+
+    @staticmethod
+    def _to_rolls(columns):
+        """Converts the `COLUMNS` ordered arrays to `RollRecord`."""
+        rolls = []
+        for row in zip(*(column.tolist() for column in columns)):
+            (bet_id, transaction_hash, block_number, timestamp,
+             bet_value_gwei, profit_value_gwei, roll_under, dice_result) = row
+            rolls.append(RollRecord(
+                bet_id=to_bytes32(bet_id).hex(),
+                transaction_hash='0x' + to_bytes32(transaction_hash).hex(),
+                block_number=None if block_number == UNKNOWN else block_number,
+                timestamp=timestamp,
+                bet_value_wei=bet_value_gwei * GWEI,
+                profit_value_wei=profit_value_gwei * GWEI,
+                roll_under=roll_under,
+                dice_result=None if dice_result == UNKNOWN else dice_result,
+            ))
+        return rolls
@@ -0,0 +1,115 @@
+"""
+Compact roll model.
+Bet and result logs dictionaries from pyetheroll are converted to
+`RollRecord` at the history boundary, with integer wei values, the outcome
+computed once and an epoch timestamp.
+"""
+import calendar
+from datetime import datetime
+from decimal import Decimal
+
+from eth_utils import to_wei
+
+
+def ether_to_wei(value_ether):
+    """Converts the (rounded) float ether value back to wei."""
+    return to_wei(Decimal(str(value_ether)), 'ether')
+
+
+def get_epoch(bet_log):
+    """
+    Returns the bet log timestamp in seconds, which is either a decimal or
+    hexadecimal string, or `None` with only the UTC datetime set.
+    """
+    timestamp = bet_log['timestamp']
+    if timestamp is None:
+        return calendar.timegm(bet_log['datetime'].utctimetuple())
+    base = 16 if timestamp.startswith('0x') else 10
+    return int(timestamp, base)
+
+
+class RollRecord:
+    """A bet and its result, result fields are `None` until resolved."""
+
+    __slots__ = (
+        'bet_id',
+        'transaction_hash',
+        'block_number',
+        'timestamp',
+        'bet_value_wei',
+        'profit_value_wei',
+        'roll_under',
+        'dice_result',
+        'won',
+    )
+
+    def __init__(
+            self, bet_id, transaction_hash, block_number, timestamp,
+            bet_value_wei, profit_value_wei, roll_under, dice_result=None):
+        self.bet_id = bet_id
+        self.transaction_hash = transaction_hash
+        self.block_number = block_number
+        self.timestamp = timestamp
+        self.bet_value_wei = bet_value_wei
+        self.profit_value_wei = profit_value_wei
+        self.roll_under = roll_under
+        self.dice_result = dice_result
+        self.won = None if dice_result is None else dice_result < roll_under
+
+    def __repr__(self):
+        return (
+            f'<RollRecord {self.bet_id} {self.dice_result} < '
+            f'{self.roll_under}>')
+
+    def _astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, RollRecord):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    @classmethod
+    def from_logs(cls, bet_log, bet_result=None):
+        """Converts pyetheroll bet log and bet result dictionaries."""
+        return cls(
+            bet_id=bet_log['bet_id'],
+            transaction_hash=bet_log['transaction_hash'],
+            block_number=bet_log.get('block_number'),
+            timestamp=get_epoch(bet_log),
+            bet_value_wei=ether_to_wei(bet_log['bet_value_ether']),
+            profit_value_wei=ether_to_wei(bet_log['profit_value_ether']),
+            roll_under=bet_log['roll_under'],
+            dice_result=(
+                None if bet_result is None else bet_result['dice_result']),
+        )
+
+    @classmethod
+    def from_merged_log(cls, merged_log):
+        """Converts a `Etheroll.get_merged_logs()` item."""
+        return cls.from_logs(merged_log['bet_log'], merged_log['bet_result'])
+
+    @property
+    def resolved(self):
+        return self.dice_result is not None
+
+    @property
+    def profit_loss_wei(self):
+        """Won profit or lost bet (negative), `None` until resolved."""
+        if self.won is None:
+            return None
+        return self.profit_value_wei if self.won else -self.bet_value_wei
+
+    @property
+    def bet_value_ether(self):
+        return self.bet_value_wei / 1e18
+
+    @property
+    def profit_loss_ether(self):
+        profit_loss_wei = self.profit_loss_wei
+        return None if profit_loss_wei is None else profit_loss_wei / 1e18
+
+    @property
+    def datetime(self):
+        """UTC datetime, like pyetheroll logs ones."""
+        return datetime.utcfromtimestamp(self.timestamp)
@@ -0,0 +1,218 @@
+"""
+Raw JSON-RPC helpers for what web3 doesn't provide, e.g. batch requests.
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict
+
+import requests
+from eth_utils import to_int
+
+from etherollapp.etheroll.endpoints import EndpointPool
+
+logger = logging.getLogger(__name__)
+
+# seconds before giving up on the node
+REQUEST_TIMEOUT = 10
+# reads issued within that window are sent as a single batch request
+BATCH_WINDOW_SECONDS = 0.05
+# flushes right away past that many queued reads
+MAX_BATCH_SIZE = 100
+
+
+class RPCError(Exception):
+    """Error returned by the node for a given call."""
+
+
+def batch_request(pyetheroll, calls):
+    """
+    Sends the `(method, params)` calls as a single JSON-RPC batch request to
+    the node and returns their results in the same order.
+    Calls the node failed to process get an `RPCError` as result.
+    The request goes to the best ranked of the chain endpoints.
+    """
+    pool = EndpointPool.get_or_create(pyetheroll)
+    return pool.request(lambda endpoint_uri: post_batch(endpoint_uri, calls))
+
+
+def request(pyetheroll, method, params):
+    """
+    Sends a single JSON-RPC request to the best ranked of the chain
+    endpoints and returns its result, see `post_request()`.
+    """
+    pool = EndpointPool.get_or_create(pyetheroll)
+    return pool.request(
+        lambda endpoint_uri: post_request(endpoint_uri, method, params))
+
+
+def send_request(pyetheroll, method, params):
+    """
+    Like `request()` for writes, which are sent to a single endpoint at a
+    time, see `EndpointPool.send()`.
+    """
+    pool = EndpointPool.get_or_create(pyetheroll)
+    return pool.send(
+        lambda endpoint_uri: post_request(endpoint_uri, method, params))
+
+
+def post_request(endpoint_uri, method, params):
+    """
+    Sends a single JSON-RPC request to the given endpoint and returns its
+    result, raises `RPCError` if the node failed to process it.
+    """
+    payload = {'jsonrpc': '2.0', 'id': 0, 'method': method, 'params': params}
+    response = requests.post(
+        endpoint_uri, json=payload, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    item = response.json()
+    if item.get('error') is not None:
+        raise RPCError(item['error'].get('message'))
+    return item.get('result')
+
+
+def post_batch(endpoint_uri, calls):
+    """Sends the batch request to the given endpoint, see `batch_request()`."""
+    payload = [
+        {'jsonrpc': '2.0', 'id': request_id, 'method': method,
+         'params': params}
+        for request_id, (method, params) in enumerate(calls)
+    ]
+    response = requests.post(
+        endpoint_uri, json=payload, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    responses = response.json()
+    if not isinstance(responses, list):
+        # e.g. the node doesn't support batches
+        error = responses.get('error') or {}
+        raise RPCError(error.get('message', 'Invalid batch response'))
+    responses = {item.get('id'): item for item in responses}
+    results = []
+    for request_id in range(len(calls)):
+        item = responses.get(request_id)
+        if item is None:
+            results.append(RPCError('Missing response'))
+        elif item.get('error') is not None:
+            results.append(RPCError(item['error'].get('message')))
+        else:
+            results.append(item.get('result'))
+    return results
+
+
+class RequestBatcher:
+    """
+    Gathers the JSON-RPC reads issued within a short window, from any
+    thread, into a single batch request.
+    Each read gets a `Future` resolved with its own result or `RPCError`.
+    One batcher per node, shared by the whole process.
+    """
+
+    # endpoint_uri -> RequestBatcher
+    _batchers: Dict[str, 'RequestBatcher'] = {}
+    _batchers_lock = threading.Lock()
+
+    def __init__(
+            self, send_batch, window=BATCH_WINDOW_SECONDS,
+            max_size=MAX_BATCH_SIZE):
+        self.send_batch = send_batch
+        self.window = window
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # [(method, params, future)]
+        self._queue = []
+        self._timer = None
+
+    @classmethod
+    def get_or_create(cls, pyetheroll):
+        endpoint_uri = pyetheroll.web3.provider.endpoint_uri
+        with cls._batchers_lock:
+            batcher = cls._batchers.get(endpoint_uri)
+            if batcher is None:
+                batcher = cls(lambda calls: batch_request(pyetheroll, calls))
+                cls._batchers[endpoint_uri] = batcher
+        return batcher
+
+    def submit(self, method, params):
+        """Queues the read and returns its `Future`."""
+        future = Future()
+        with self._lock:
+            self._queue.append((method, params, future))
+            full = len(self._queue) >= self.max_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+    def request(self, method, params):
+        """Blocks until the read is done, raises `RPCError` on failure."""
+        return self.submit(method, params).result()
+
+    def request_many(self, calls):
+        """
+        Sends the `(method, params)` calls together, without waiting for the
+        window, returns their results in order, `RPCError` on failures.
+        """
+        futures = [self.submit(method, params) for method, params in calls]
+        self.flush()
+        return [
+            future.exception() or future.result() for future in futures]
+
+    def flush(self):
+        """Sends the queued reads right away."""
+        with self._lock:
+            queue, self._queue = self._queue, []
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not queue:
+            return
+        calls = [(method, params) for method, params, _ in queue]
+        try:
+            results = self.send_batch(calls)
+        except Exception as exception:
+            logger.warning('Error sending %s batched reads', len(calls))
+            for _, _, future in queue:
+                future.set_exception(exception)
+            return
+        for (_, _, future), result in zip(queue, results):
+            if isinstance(result, RPCError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def get_balances(pyetheroll, addresses):
+    """
+    Returns the accounts balances in wei, `RPCError` for the failed ones,
+    with a single round trip.
+    """
+    batcher = RequestBatcher.get_or_create(pyetheroll)
+    results = batcher.request_many([
+        ('eth_getBalance', [address, 'latest']) for address in addresses])
+    return [
+        result if isinstance(result, RPCError) else to_int(hexstr=result)
+        for result in results]
+
+
+def get_balance(pyetheroll, address):
+    """Account balance in wei, batched with concurrent reads."""
+    batcher = RequestBatcher.get_or_create(pyetheroll)
+    return to_int(hexstr=batcher.request(
+        'eth_getBalance', [address, 'latest']))
+
+
+def call_uint(pyetheroll, function_name):
+    """
+    Calls the contract constant function returning a `uint` e.g. `minBet()`,
+    batched with concurrent reads.
+    """
+    contract = pyetheroll.contract
+    call = {
+        'to': pyetheroll.contract_address,
+        'data': contract.encodeABI(fn_name=function_name),
+    }
+    batcher = RequestBatcher.get_or_create(pyetheroll)
+    return to_int(hexstr=batcher.request('eth_call', [call, 'latest']))
@@ -10,6 +10,8 @@ from etherollapp.etheroll.store import Store
 NETWORK_SETTINGS = 'network'
 GAS_PRICE_SETTINGS = 'gas_price'
 PERSIST_KEYSTORE_SETTINGS = 'persist_keystore'
+SIGNER_CACHE_TIMEOUT_SETTINGS = 'signer_cache_timeout'
+BROADCAST_ALL_SETTINGS = 'broadcast_all_endpoints'
 
 
 class Settings:
@@ -84,6 +86,46 @@ class Settings:
         store = Store.get_store()
         store.put(PERSIST_KEYSTORE_SETTINGS, value=persist_keystore)
 
+    @classmethod
+    def get_stored_signer_cache_timeout(cls):
+        """
+        Retrieves for how long (in seconds) an unlocked account stays
+        unlocked when idle. Defaults to 0, meaning it's relocked right away.
+        """
+        store = Store.get_store()
+        try:
+            signer_cache_timeout_dict = store[SIGNER_CACHE_TIMEOUT_SETTINGS]
+        except KeyError:
+            signer_cache_timeout_dict = {}
+        signer_cache_timeout = signer_cache_timeout_dict.get('value', 0)
+        return signer_cache_timeout
+
+    @classmethod
+    def set_stored_signer_cache_timeout(cls, signer_cache_timeout: int):
+        """Persists unlocked account idle timeout settings."""
+        store = Store.get_store()
+        store.put(SIGNER_CACHE_TIMEOUT_SETTINGS, value=signer_cache_timeout)
+
+    @classmethod
+    def is_broadcast_all_endpoints(cls):
+        """
+        Retrieves whether transactions get broadcast to all the configured
+        endpoints rather than only the main one. Defaults to False.
+        """
+        store = Store.get_store()
+        try:
+            broadcast_all_dict = store[BROADCAST_ALL_SETTINGS]
+        except KeyError:
+            broadcast_all_dict = {}
+        broadcast_all = broadcast_all_dict.get('value', False)
+        return broadcast_all
+
+    @classmethod
+    def set_is_broadcast_all_endpoints(cls, broadcast_all: bool):
+        """Persists the broadcast to all endpoints settings."""
+        store = Store.get_store()
+        store.put(BROADCAST_ALL_SETTINGS, value=broadcast_all)
+
     @staticmethod
     def get_persistent_keystore_path():
         app = App.get_running_app()
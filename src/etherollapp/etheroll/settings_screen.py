@@ -19,6 +19,7 @@ class SettingsScreen(SubScreen):
     is_stored_mainnet = BooleanProperty()
     is_stored_testnet = BooleanProperty()
     stored_gas_price = NumericProperty()
+    stored_signer_cache_timeout = NumericProperty()
 
     def store_network(self):
         """Saves selected network to the store."""
@@ -30,6 +31,11 @@ class SettingsScreen(SubScreen):
         gas_price = self.get_ui_gas_price()
         Settings.set_stored_gas_price(gas_price)
 
+    def store_signer_cache_timeout(self):
+        """Saves the unlocked account idle timeout to the store."""
+        signer_cache_timeout = self.get_ui_signer_cache_timeout()
+        Settings.set_stored_signer_cache_timeout(signer_cache_timeout)
+
     def store_is_persistent_keystore(self):
         """
         Saves the persistency option to the store.
@@ -91,6 +97,11 @@ class SettingsScreen(SubScreen):
         else:
             cls.sync_keystore_to_non_persistent()
 
+    def store_is_broadcast_all_endpoints(self):
+        """Saves the broadcast to all endpoints option to the store."""
+        broadcast_all = self.is_ui_broadcast_all_endpoints()
+        Settings.set_is_broadcast_all_endpoints(broadcast_all)
+
     def set_persist_keystore_switch_state(self, active):
         """
         The MDSwitch UI look doesn't seem to be binded to its status.
@@ -100,20 +111,32 @@ class SettingsScreen(SubScreen):
         if self.is_ui_persistent_keystore() != active:
             mdswitch.ids.thumb.trigger_action()
 
+    def set_broadcast_all_switch_state(self, active):
+        """See `set_persist_keystore_switch_state()`."""
+        mdswitch = self.ids.broadcast_all_switch_id
+        if self.is_ui_broadcast_all_endpoints() != active:
+            mdswitch.ids.thumb.trigger_action()
+
     def load_settings(self):
         """Load json store settings to UI properties."""
         self.is_stored_mainnet = Settings.is_stored_mainnet()
         self.is_stored_testnet = Settings.is_stored_testnet()
         self.stored_gas_price = Settings.get_stored_gas_price()
+        self.stored_signer_cache_timeout = (
+            Settings.get_stored_signer_cache_timeout())
         is_persistent_keystore = (
             Settings.is_persistent_keystore() and check_write_permission())
         self.set_persist_keystore_switch_state(is_persistent_keystore)
+        self.set_broadcast_all_switch_state(
+            Settings.is_broadcast_all_endpoints())
 
     def store_settings(self):
         """Stores settings to json store."""
         self.store_gas_price()
+        self.store_signer_cache_timeout()
         self.store_network()
         self.store_is_persistent_keystore()
+        self.store_is_broadcast_all_endpoints()
 
     def get_ui_network(self):
         """Retrieves network values from UI."""
@@ -128,9 +151,16 @@ class SettingsScreen(SubScreen):
     def get_ui_gas_price(self):
         return self.ids.gas_price_slider_id.value
 
+    def get_ui_signer_cache_timeout(self):
+        """Slider is in minutes, the settings in seconds."""
+        return int(self.ids.signer_cache_timeout_slider_id.value) * 60
+
     def is_ui_persistent_keystore(self):
         return self.ids.persist_keystore_switch_id.active
 
+    def is_ui_broadcast_all_endpoints(self):
+        return self.ids.broadcast_all_switch_id.active
+
     def check_request_write_permission(self):
         # previous state before the toggle
         if self.is_ui_persistent_keystore():
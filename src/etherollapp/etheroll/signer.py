@@ -0,0 +1,148 @@
+"""
+Unlocked signers and their time-limited cache.
+Decrypting a keystore runs the full KDF which takes seconds on Android,
+keeping the decrypted key around for a while makes consecutive bets sign in
+milliseconds.
+"""
+import json
+import threading
+from time import monotonic
+
+from etherollapp.etheroll.crypto_worker import UnknownKeyError
+
+
+class Signer:
+    """
+    Holds an unlocked private key able to sign transactions.
+    With a `CryptoWorker`, the key is only held by the crypto process and
+    transactions are signed there by key handle.
+    """
+
+    def __init__(
+            self, address, private_key=None, crypto_worker=None,
+            key_handle=None):
+        self.address = address
+        # mutable so it can be zeroised once no longer needed
+        self._private_key = bytearray(private_key or b'')
+        self.crypto_worker = crypto_worker
+        self._key_handle = key_handle
+        self.locked = False
+
+    @classmethod
+    def unlock(cls, keyfile_path, password, crypto_worker=None):
+        """
+        Decrypts the keyfile and returns the corresponding signer.
+        Raises `ValueError` ("MAC mismatch") on wrong password.
+        """
+        with open(keyfile_path) as f:
+            keyfile = json.load(f)
+        address = keyfile['address']
+        if crypto_worker is not None:
+            key_handle = crypto_worker.unlock_key(keyfile, password)
+            return cls(
+                address, crypto_worker=crypto_worker, key_handle=key_handle)
+        # lazy loading
+        from eth_account import Account
+        return cls(address, Account.decrypt(keyfile, password))
+
+    def sign_transaction(self, transaction):
+        """Signs the transaction dictionary, returns the signed transaction."""
+        if self.locked:
+            raise ValueError('Signer is locked')
+        if self._key_handle is not None:
+            try:
+                return self.crypto_worker.sign_tx_with_key(
+                    transaction, self._key_handle)
+            except UnknownKeyError:
+                # e.g. the crypto process got restarted, the key is gone
+                self.locked = True
+                raise
+        # lazy loading
+        from eth_account import Account
+        # signs with the key itself, rather than a copy
+        return Account.sign_transaction(transaction, self._private_key)
+
+    def zeroise(self):
+        """Overwrites the private key in memory and locks the signer."""
+        for i in range(len(self._private_key)):
+            self._private_key[i] = 0
+        if self._key_handle is not None and not self.locked:
+            self.crypto_worker.forget_key(self._key_handle)
+        self.locked = True
+
+
+class SignerCache:
+    """
+    Per account cache of unlocked signers.
+    Signers not used for `timeout` seconds get zeroised and evicted, a zero
+    timeout disables the cache.
+    """
+
+    def __init__(self, timeout=0, clock=monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        # address -> (signer, last used time)
+        self._signers = {}
+        self._timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout
+        self.purge_expired()
+
+    @property
+    def enabled(self):
+        return self._timeout > 0
+
+    def get(self, address):
+        """Returns the cached signer and refreshes its idle timer."""
+        self.purge_expired()
+        with self._lock:
+            try:
+                signer, _ = self._signers[address]
+            except KeyError:
+                return None
+            if signer.locked:
+                # needs unlocking again
+                del self._signers[address]
+                return None
+            self._signers[address] = (signer, self._clock())
+        return signer
+
+    def put(self, address, signer):
+        """Caches the signer, unless the cache is disabled."""
+        if not self.enabled:
+            return
+        with self._lock:
+            previous = self._signers.get(address)
+            if previous is not None and previous[0] is not signer:
+                previous[0].zeroise()
+            self._signers[address] = (signer, self._clock())
+
+    def lock(self, address=None):
+        """Zeroises and evicts the given account signer or all of them."""
+        with self._lock:
+            addresses = (
+                list(self._signers) if address is None else [address])
+            for address in addresses:
+                try:
+                    signer, _ = self._signers.pop(address)
+                except KeyError:
+                    continue
+                signer.zeroise()
+
+    def purge_expired(self):
+        """Zeroises and evicts signers idle for longer than the timeout."""
+        now = self._clock()
+        with self._lock:
+            expired = [
+                address for address, (_, last_used) in self._signers.items()
+                if not self.enabled or now - last_used >= self._timeout
+            ]
+            for address in expired:
+                signer, _ = self._signers.pop(address)
+                signer.zeroise()
@@ -0,0 +1,85 @@
+"""
+Monte Carlo bankroll simulation of the roll screen bet parameters.
+Bet sequences are sampled as whole arrays of paths, betting the same amount
+each roll until the bankroll can no longer cover the bet, so the risk of
+ruin and outcomes spread show beyond the single bet payout.
+"""
+import numpy as np
+
+# contract house edge, see `EtherollUtils.compute_profit()`
+HOUSE_EDGE = 1.0 / 100
+PATHS = 100000
+ROLLS = 100
+PERCENTILES = (5, 25, 50, 75, 95)
+# paths sampled at once, keeps the intermediate arrays to a few MB
+CHUNK_PATHS = 10000
+
+
+def get_profit(bet_size, chances_win):
+    """Profit of a winning bet, `None` for out of range chances."""
+    if chances_win <= 0 or chances_win >= 100:
+        return None
+    chances_loss = 100 - chances_win
+    payout = ((chances_loss / chances_win) * bet_size) + bet_size
+    payout *= (1 - HOUSE_EDGE)
+    return payout - bet_size
+
+
+def simulate_paths(rng, paths, rolls, bankroll, bet_size, roll_under):
+    """
+    Returns the final bankroll of each path and whether it got ruined, i.e.
+    couldn't cover the next bet before the `rolls` were all placed.
+    """
+    # dice results are drawn from 1 to 100 and win when under `roll_under`
+    chances_win = roll_under - 1
+    profit = get_profit(bet_size, chances_win)
+    wins = rng.random((paths, rolls), dtype=np.float32) < chances_win / 100
+    win_counts = np.cumsum(wins, axis=1, dtype=np.int32)
+    placed = np.arange(1, rolls + 1, dtype=np.int32)
+    losses = placed - win_counts
+    balances = bankroll + win_counts * profit - losses * bet_size
+    # no bet follows the last roll, so its balance can't ruin
+    broke = balances[:, :-1] < bet_size
+    ruined = broke.any(axis=1)
+    # ruined paths stop betting at the first roll they can't cover
+    stop = np.full(paths, rolls - 1)
+    if ruined.any():
+        stop[ruined] = broke[ruined].argmax(axis=1)
+    final = balances[np.arange(paths), stop]
+    return final, ruined
+
+
+def simulate(
+        bankroll, bet_size, roll_under, rolls=ROLLS, paths=PATHS,
+        seed=None):
+    """
+    Simulates `paths` sequences of up to `rolls` bets of `bet_size` under
+    `roll_under`, starting with `bankroll`.
+    Returns the risk of ruin, the expected profit/loss and the final
+    profit/loss percentiles, or `None` for out of range parameters.
+    """
+    if get_profit(bet_size, roll_under - 1) is None or bet_size <= 0 or \
+            rolls <= 0:
+        return None
+    rng = np.random.default_rng(seed)
+    if bankroll < bet_size:
+        final = np.full(paths, float(bankroll))
+        ruined = np.ones(paths, dtype=bool)
+    else:
+        results = [
+            simulate_paths(
+                rng, min(CHUNK_PATHS, paths - start), rolls, bankroll,
+                bet_size, roll_under)
+            for start in range(0, paths, CHUNK_PATHS)
+        ]
+        final = np.concatenate([result[0] for result in results])
+        ruined = np.concatenate([result[1] for result in results])
+    profit_loss = final - bankroll
+    return {
+        'rolls': rolls,
+        'paths': paths,
+        'risk_of_ruin': float(ruined.mean()),
+        'expected_profit_loss': float(profit_loss.mean()),
+        'percentiles': dict(zip(
+            PERCENTILES, np.percentile(profit_loss, PERCENTILES).tolist())),
+    }
@@ -0,0 +1,341 @@
+"""
+Transaction submission pipeline shared by rolls and sends.
+Each submission goes through: queued -> signed -> broadcast -> mined,
+or failed at any step, or expired if its receipt doesn't show up in time.
+Signing and broadcasting happen in a worker thread, receipts get polled
+from another one, so nothing blocks the render loop.
+Both threads only live while there's something to process.
+"""
+import itertools
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from functools import partial
+from time import monotonic, sleep
+
+from etherollapp.etheroll import receipts, transactions
+
+logger = logging.getLogger(__name__)
+
+# how often pending transaction receipts get polled
+RECEIPT_POLL_SECONDS = 5
+# stops tracking transactions still not mined after that delay
+RECEIPT_TIMEOUT_SECONDS = 30 * 60
+# concurrent broadcasts of a batch
+BROADCAST_WORKERS = 4
+# finished submissions kept, the oldest ones get dropped past that
+DONE_RETENTION = 100
+
+
+class SubmissionStatus(Enum):
+    QUEUED = 'queued'
+    SIGNED = 'signed'
+    BROADCAST = 'broadcast'
+    MINED = 'mined'
+    FAILED = 'failed'
+    # no longer tracked, e.g. dropped by the nodes
+    EXPIRED = 'expired'
+
+
+class Submission:
+    """
+    A transaction making its way through the pipeline.
+    `build_transaction(pyetheroll, nonce)` returns the transaction dictionary
+    to sign, `kind` tells the UI how to report it (e.g. 'roll' or 'send')
+    and `details` is what it needs to display it (e.g. bet size).
+    `decode_receipt(pyetheroll, receipt)` optionally decodes the event of
+    interest from the receipt once mined, e.g. the bet log.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(
+            self, kind, account, password, build_transaction, details=None,
+            decode_receipt=None):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.account = account
+        self.details = details or {}
+        # submissions sent together, see `SubmissionPipeline.submit_batch()`
+        self.batch = None
+        # only kept until the account is unlocked
+        self.password = password
+        self.build_transaction = build_transaction
+        self.decode_receipt = decode_receipt
+        self.status = SubmissionStatus.QUEUED
+        self.nonce = None
+        self.tx_hash = None
+        self.receipt = None
+        # decoded from the receipt with `decode_receipt()`
+        self.event = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.status in (
+            SubmissionStatus.MINED, SubmissionStatus.FAILED,
+            SubmissionStatus.EXPIRED)
+
+    def __repr__(self):
+        return f'<Submission {self.id} {self.kind} {self.status.value}>'
+
+
+class SubmissionPipeline:
+    """
+    Queues submissions, signs and broadcasts them one at a time, then tracks
+    their receipts.
+    Listeners are called from the pipeline threads on every status change
+    with the submission as parameter.
+    """
+
+    def __init__(
+            self, get_pyetheroll, get_signer,
+            receipt_poll_seconds=RECEIPT_POLL_SECONDS,
+            receipt_timeout_seconds=RECEIPT_TIMEOUT_SECONDS,
+            clock=monotonic, get_broadcast_all=lambda: False,
+            done_retention=DONE_RETENTION):
+        """
+        `get_pyetheroll()` returns the `Etheroll` object of the current chain,
+        `get_signer(account, password)` returns an unlocked `Signer`,
+        `get_broadcast_all()` whether to broadcast to all chain endpoints.
+        Only the last `done_retention` finished submissions are kept.
+        """
+        self.get_pyetheroll = get_pyetheroll
+        self.get_signer = get_signer
+        self.get_broadcast_all = get_broadcast_all
+        self.receipt_poll_seconds = receipt_poll_seconds
+        self.receipt_timeout_seconds = receipt_timeout_seconds
+        self.done_retention = done_retention
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._queue = deque()
+        # (submission, pyetheroll, broadcast time) waiting for a receipt
+        self._tracked = []
+        self._worker = None
+        self._tracker = None
+        self.submissions = []
+
+    def bind(self, listener):
+        self._listeners.append(listener)
+
+    def unbind(self, listener):
+        self._listeners.remove(listener)
+
+    def _set_status(self, submission, status, **attributes):
+        for name, value in attributes.items():
+            setattr(submission, name, value)
+        submission.status = status
+        if submission.done:
+            self._drop_done()
+        for listener in list(self._listeners):
+            try:
+                listener(submission)
+            except Exception:
+                logger.exception('Error notifying %s', submission)
+
+    def _drop_done(self):
+        """Drops the oldest finished submissions past the retention."""
+        with self._lock:
+            excess = sum(
+                submission.done for submission in self.submissions
+            ) - self.done_retention
+            if excess <= 0:
+                return
+            kept = []
+            for submission in self.submissions:
+                if submission.done and excess > 0:
+                    excess -= 1
+                    continue
+                kept.append(submission)
+            self.submissions = kept
+
+    @property
+    def pending(self):
+        """Submissions not yet mined, failed nor expired."""
+        with self._lock:
+            return [
+                submission for submission in self.submissions
+                if not submission.done]
+
+    def submit(self, submission):
+        """Queues the submission and returns it."""
+        self._enqueue([submission])
+        return submission
+
+    def submit_batch(self, submissions):
+        """
+        Queues submissions of a same account to be signed all up front with
+        consecutive nonces and broadcast concurrently, returns them.
+        """
+        for submission in submissions:
+            submission.batch = submissions
+        self._enqueue(submissions)
+        return submissions
+
+    def _enqueue(self, submissions):
+        with self._lock:
+            self.submissions.extend(submissions)
+            self._queue.append(submissions)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_worker)
+                self._worker.start()
+        for submission in submissions:
+            self._set_status(submission, SubmissionStatus.QUEUED)
+
+    def join(self, timeout=None):
+        """Waits for the worker and tracker threads to be done."""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        # the worker may have started the tracker in the meantime
+        tracker = self._tracker
+        if tracker is not None:
+            tracker.join(timeout)
+
+    def _run_worker(self):
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._worker = None
+                    return
+                submissions = self._queue.popleft()
+            if len(submissions) == 1:
+                self.process(submissions[0])
+            else:
+                self.process_batch(submissions)
+
+    def _fail(self, submissions, exception):
+        for submission in submissions:
+            logger.info('%s failed: %s', submission, exception)
+            submission.password = None
+            self._set_status(
+                submission, SubmissionStatus.FAILED, error=exception)
+
+    def process(self, submission):
+        """Signs and broadcasts the submission, then tracks its receipt."""
+        try:
+            pyetheroll = self.get_pyetheroll()
+            signer = self.get_signer(submission.account, submission.password)
+            submission.password = None
+            nonce_manager, nonce, signed_tx = transactions.sign_with_nonce(
+                pyetheroll, signer,
+                partial(submission.build_transaction, pyetheroll))
+        except Exception as exception:
+            self._fail([submission], exception)
+            return
+        self._set_status(submission, SubmissionStatus.SIGNED, nonce=nonce)
+        self.broadcast(
+            submission, pyetheroll, nonce_manager, nonce, signed_tx)
+
+    def process_batch(self, submissions):
+        """
+        Unlocks the account once and signs all the submissions up front,
+        then broadcasts them concurrently and tracks their receipts.
+        """
+        first = submissions[0]
+        try:
+            pyetheroll = self.get_pyetheroll()
+            signer = self.get_signer(first.account, first.password)
+            build_transactions = [
+                partial(submission.build_transaction, pyetheroll)
+                for submission in submissions
+            ]
+            nonce_manager, signed_txs = transactions.sign_many_with_nonces(
+                pyetheroll, signer, build_transactions)
+        except Exception as exception:
+            self._fail(submissions, exception)
+            return
+        for submission, (nonce, _) in zip(submissions, signed_txs):
+            submission.password = None
+            self._set_status(submission, SubmissionStatus.SIGNED, nonce=nonce)
+        max_workers = min(len(submissions), BROADCAST_WORKERS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for submission, (nonce, signed_tx) in zip(
+                    submissions, signed_txs):
+                executor.submit(
+                    self.broadcast, submission, pyetheroll, nonce_manager,
+                    nonce, signed_tx)
+
+    def broadcast(
+            self, submission, pyetheroll, nonce_manager, nonce, signed_tx):
+        """Broadcasts the signed submission, then tracks its receipt."""
+        try:
+            tx_hash = transactions.broadcast_with_nonce(
+                pyetheroll, nonce_manager, nonce, signed_tx,
+                self.get_broadcast_all())
+        except Exception as exception:
+            self._fail([submission], exception)
+            return
+        self._set_status(
+            submission, SubmissionStatus.BROADCAST, tx_hash=tx_hash)
+        self.track(submission, pyetheroll)
+
+    def track(self, submission, pyetheroll):
+        """Polls the broadcast submission receipt until it gets mined."""
+        with self._lock:
+            self._tracked.append((submission, pyetheroll, self._clock()))
+            if self._tracker is None:
+                self._tracker = threading.Thread(target=self._run_tracker)
+                self._tracker.start()
+
+    def _run_tracker(self):
+        while True:
+            with self._lock:
+                if not self._tracked:
+                    self._tracker = None
+                    return
+            sleep(self.receipt_poll_seconds)
+            self.poll_receipts()
+
+    def poll_receipts(self):
+        """
+        Checks tracked submissions receipts once, with a single request per
+        chain.
+        """
+        with self._lock:
+            tracked = list(self._tracked)
+        chains = {}
+        for item in tracked:
+            _, pyetheroll, _ = item
+            chains.setdefault(id(pyetheroll), []).append(item)
+        done = []
+        for items in chains.values():
+            pyetheroll = items[0][1]
+            try:
+                receipts_list = receipts.get_receipts(
+                    pyetheroll, [item[0].tx_hash for item in items])
+            except Exception:
+                # network hiccup, will try again next time
+                logger.exception('Error polling receipts')
+                receipts_list = [None] * len(items)
+            for item, receipt in zip(items, receipts_list):
+                submission, pyetheroll, broadcast_time = item
+                if receipt is not None:
+                    self.on_receipt(submission, pyetheroll, receipt)
+                    done.append(item)
+                elif (self._clock() - broadcast_time >=
+                        self.receipt_timeout_seconds):
+                    logger.info('Stopped tracking %s', submission)
+                    self._set_status(submission, SubmissionStatus.EXPIRED)
+                    done.append(item)
+        with self._lock:
+            self._tracked = [
+                item for item in self._tracked if item not in done]
+
+    def on_receipt(self, submission, pyetheroll, receipt):
+        if receipt['status'] != 1:
+            self._set_status(
+                submission, SubmissionStatus.FAILED, receipt=receipt,
+                error=ValueError('Transaction reverted'))
+            return
+        event = None
+        if submission.decode_receipt is not None:
+            try:
+                event = submission.decode_receipt(pyetheroll, receipt)
+            except Exception:
+                logger.exception('Error decoding %s receipt', submission)
+        self._set_status(
+            submission, SubmissionStatus.MINED, receipt=receipt, event=event)
@@ -1,9 +1,14 @@
 from kivy.app import App
 from kivy.clock import Clock, mainthread
+from kivy.logger import Logger
 from kivy.properties import ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
-from kivymd.list import OneLineListItem
+from kivymd.list import TwoLineListItem
+from pyetheroll.constants import ROUND_DIGITS
+from requests.exceptions import ConnectionError
 
+from etherollapp.etheroll import chain_cache
+from etherollapp.etheroll.rpc import RPCError
 from etherollapp.etheroll.ui_utils import Dialog, SubScreen, load_kv_from_py
 from etherollapp.etheroll.utils import run_in_thread
 
@@ -13,6 +18,11 @@ load_kv_from_py(__file__)
 class SwitchAccount(BoxLayout):
     __events__ = ('on_account_selected',)
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # address -> list item
+        self.list_items = {}
+
     def on_release(self, list_item):
         """Fires on_account_selected() event."""
         self.dispatch('on_account_selected', list_item.account)
@@ -24,7 +34,8 @@ class SwitchAccount(BoxLayout):
     def create_item(self, account):
         """Creates an account list item from given account."""
         address = "0x" + account.address.hex()
-        list_item = OneLineListItem(text=address)
+        # the balance gets filled once fetched
+        list_item = TwoLineListItem(text=address, secondary_text='')
         # makes sure the address doesn't overlap on small screen
         list_item.ids._lbl_primary.shorten = True
         list_item.account = account
@@ -35,12 +46,42 @@ class SwitchAccount(BoxLayout):
     def update_account_list(self, accounts):
         account_list_id = self.ids.account_list_id
         account_list_id.clear_widgets()
+        self.list_items = {}
         if len(accounts) == 0:
             self.on_empty_account_list()
         for account in accounts:
             list_item = self.create_item(account)
+            self.list_items[list_item.text] = list_item
             account_list_id.add_widget(list_item)
 
+    @mainthread
+    def update_balances(self, balances):
+        """Shows the `address -> balance` balances, `None` if unknown."""
+        for address, balance in balances.items():
+            list_item = self.list_items.get(address)
+            if list_item is None:
+                continue
+            list_item.secondary_text = '' if balance is None else \
+                '{balance:.{round_digits}f} ETH'.format(
+                    balance=balance, round_digits=ROUND_DIGITS)
+
+    def fetch_balances(self, accounts):
+        """
+        Retrieves all the accounts balances with a single request, balances
+        are only fetched once per block.
+        """
+        addresses = ["0x" + account.address.hex() for account in accounts]
+        if not addresses:
+            return
+        try:
+            balances = chain_cache.get_balances(
+                self.controller.pyetheroll, addresses)
+        except (ConnectionError, RPCError):
+            # the list is still usable without balances
+            Logger.warning('SwitchAccount: Error fetching balances')
+            return
+        self.update_balances(dict(zip(addresses, balances)))
+
     @run_in_thread
     def load_account_list(self):
         """
@@ -54,6 +95,7 @@ class SwitchAccount(BoxLayout):
         accounts = self.controller.account_utils.get_account_list()
         self.update_account_list(accounts)
         self.toggle_spinner(show=False)
+        self.fetch_balances(accounts)
 
     @staticmethod
     def on_empty_account_list():
@@ -0,0 +1,226 @@
+"""
+Builds, signs and broadcasts transactions from an unlocked `Signer`.
+Mirrors `Etheroll.player_roll_dice()` and `Etheroll.transaction()` which
+both require the keystore password and decrypt it on every call.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from eth_utils import to_checksum_address, to_hex, to_int
+from hexbytes import HexBytes
+
+from etherollapp.etheroll import rpc
+from etherollapp.etheroll.endpoints import get_endpoint_uris
+from etherollapp.etheroll.nonce_manager import NonceManager
+
+ROLL_GAS = 310000
+TRANSFER_GAS = 25000
+# node errors meaning the transaction is already in its pool
+KNOWN_TRANSACTION_ERRORS = (
+    'known transaction',
+    'already known',
+)
+# node errors meaning our local nonce view is out of sync with the chain
+NONCE_ERRORS = (
+    'nonce too low',
+    'replacement transaction underpriced',
+) + KNOWN_TRANSACTION_ERRORS
+
+
+def get_nonce_manager(pyetheroll, address):
+    """Returns the account nonce manager for the current chain."""
+    address = to_checksum_address(address)
+
+    def get_transaction_count():
+        return to_int(hexstr=rpc.request(
+            pyetheroll, 'eth_getTransactionCount', [address, 'pending']))
+    return NonceManager.get_or_create(
+        pyetheroll.chain_id, address, get_transaction_count)
+
+
+def is_nonce_error(exception):
+    message = str(exception).lower()
+    return any(error in message for error in NONCE_ERRORS)
+
+
+def is_known_transaction_error(exception):
+    message = str(exception).lower()
+    return any(error in message for error in KNOWN_TRANSACTION_ERRORS)
+
+
+def build_roll_transaction(
+        pyetheroll, bet_size_wei, chances, gas_price_wei, nonce):
+    """Returns the `playerRollDice()` transaction dictionary."""
+    roll_under = chances
+    transaction = {
+        'chainId': pyetheroll.chain_id.value,
+        'gas': ROLL_GAS,
+        'gasPrice': gas_price_wei,
+        'nonce': nonce,
+        'value': bet_size_wei,
+    }
+    return pyetheroll.contract.functions.playerRollDice(
+        roll_under).buildTransaction(transaction)
+
+
+def build_transfer_transaction(to, value, gas_price_wei, nonce, chain_id):
+    """Returns an Ether transfer transaction dictionary."""
+    return {
+        'chainId': chain_id.value,
+        'gas': TRANSFER_GAS,
+        'gasPrice': gas_price_wei,
+        'nonce': nonce,
+        'value': value,
+        'to': to,
+    }
+
+
+def broadcast(pyetheroll, signed_tx, all_endpoints=False):
+    """
+    Broadcasts the signed transaction, returns the transaction hash.
+    A node already knowing the transaction counts as accepting it.
+    With `all_endpoints` it's sent to all the chain endpoints, see
+    `broadcast_all()`.
+    """
+    if all_endpoints and len(get_endpoint_uris(pyetheroll)) > 1:
+        return broadcast_all(pyetheroll, signed_tx)
+    try:
+        return HexBytes(rpc.send_request(
+            pyetheroll, 'eth_sendRawTransaction',
+            [to_hex(signed_tx.rawTransaction)]))
+    except rpc.RPCError as exception:
+        # e.g. resent after a timeout, it's in the pool either way
+        if not is_known_transaction_error(exception):
+            raise
+    return HexBytes(signed_tx.hash)
+
+
+def broadcast_all(pyetheroll, signed_tx):
+    """
+    Broadcasts the signed transaction to all the chain endpoints in
+    parallel and returns the transaction hash as soon as one accepted it.
+    Endpoints that already got it from their peers count as accepting it.
+    Raises a node error rather than a network one if they all failed.
+    """
+    uris = get_endpoint_uris(pyetheroll)
+    raw_transaction = to_hex(signed_tx.rawTransaction)
+    tx_hash = HexBytes(signed_tx.hash)
+
+    def send(uri):
+        try:
+            rpc.post_request(
+                uri, 'eth_sendRawTransaction', [raw_transaction])
+        except rpc.RPCError as exception:
+            if not is_known_transaction_error(exception):
+                raise
+        return tx_hash
+    executor = ThreadPoolExecutor(max_workers=len(uris))
+    futures = [executor.submit(send, uri) for uri in uris]
+    # the other endpoints still get the transaction in the background
+    executor.shutdown(wait=False)
+    errors = []
+    for future in as_completed(futures):
+        try:
+            return future.result()
+        except Exception as exception:
+            errors.append(exception)
+    raise next(
+        (error for error in errors if isinstance(error, rpc.RPCError)),
+        errors[0])
+
+
+def send_transaction(pyetheroll, signer, transaction):
+    """Signs and broadcasts the transaction, returns the transaction hash."""
+    signed_tx = signer.sign_transaction(transaction)
+    return broadcast(pyetheroll, signed_tx)
+
+
+def release_nonces(nonce_manager, nonces, exception):
+    """
+    Gives back the nonces of transactions that won't make it, resyncing with
+    the chain on nonce errors.
+    """
+    # last first so they get given back rather than leaving gaps
+    for nonce in reversed(nonces):
+        nonce_manager.release(nonce)
+    if is_nonce_error(exception):
+        nonce_manager.resync()
+
+
+def sign_with_nonce(pyetheroll, signer, build_transaction):
+    """
+    Reserves the next local nonce, builds the transaction with it using
+    `build_transaction(nonce)` and signs it.
+    Returns a `(nonce_manager, nonce, signed_tx)` tuple, the nonce is
+    released on failure.
+    """
+    nonce_manager = get_nonce_manager(pyetheroll, signer.address)
+    nonce = nonce_manager.reserve()
+    try:
+        transaction = build_transaction(nonce)
+        signed_tx = signer.sign_transaction(transaction)
+    except Exception as exception:
+        release_nonces(nonce_manager, [nonce], exception)
+        raise
+    return nonce_manager, nonce, signed_tx
+
+
+def sign_many_with_nonces(pyetheroll, signer, build_transactions):
+    """
+    Reserves one nonce per `build_transaction(nonce)` callable at once,
+    then builds and signs all the transactions up front.
+    Returns a `(nonce_manager, [(nonce, signed_tx), ...])` tuple, all the
+    nonces are released on failure.
+    """
+    nonce_manager = get_nonce_manager(pyetheroll, signer.address)
+    nonces = nonce_manager.reserve_many(len(build_transactions))
+    try:
+        signed_txs = [
+            signer.sign_transaction(build_transaction(nonce))
+            for build_transaction, nonce in zip(build_transactions, nonces)
+        ]
+    except Exception as exception:
+        release_nonces(nonce_manager, nonces, exception)
+        raise
+    return nonce_manager, list(zip(nonces, signed_txs))
+
+
+def broadcast_with_nonce(
+        pyetheroll, nonce_manager, nonce, signed_tx, all_endpoints=False):
+    """
+    Broadcasts a transaction signed with `sign_with_nonce()`.
+    The nonce is released on failure and marked broadcast on success.
+    """
+    try:
+        tx_hash = broadcast(pyetheroll, signed_tx, all_endpoints)
+    except Exception as exception:
+        release_nonces(nonce_manager, [nonce], exception)
+        raise
+    nonce_manager.mark_broadcast(nonce)
+    return tx_hash
+
+
+def send_with_nonce(pyetheroll, signer, build_transaction):
+    """
+    Reserves the next local nonce, builds the transaction with it using
+    `build_transaction(nonce)`, then signs and broadcasts it.
+    The nonce is released on failure and the local view resynced with the
+    chain on nonce errors.
+    """
+    nonce_manager, nonce, signed_tx = sign_with_nonce(
+        pyetheroll, signer, build_transaction)
+    return broadcast_with_nonce(pyetheroll, nonce_manager, nonce, signed_tx)
+
+
+def player_roll_dice(
+        pyetheroll, signer, bet_size_wei, chances, gas_price_wei):
+    """Signs and broadcasts `playerRollDice` transaction."""
+    return send_with_nonce(
+        pyetheroll, signer, lambda nonce: build_roll_transaction(
+            pyetheroll, bet_size_wei, chances, gas_price_wei, nonce))
+
+
+def transaction(pyetheroll, signer, to, value, gas_price_wei):
+    """Signs and broadcasts an Ether transfer transaction."""
+    return send_with_nonce(
+        pyetheroll, signer, lambda nonce: build_transfer_transaction(
+            to, value, gas_price_wei, nonce, pyetheroll.chain_id))
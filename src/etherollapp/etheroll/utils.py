@@ -30,6 +30,92 @@ def run_in_thread(fn):
     return run
 
 
+class CancellationToken:
+    """
+    Handed to background requests so they can tell whether their result is
+    still wanted before doing any further work with it.
+    >>> token = CancellationToken()
+    >>> token.cancelled
+    False
+    >>> token.cancel()
+    >>> token.cancelled
+    True
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class SupersedingWorker:
+    """
+    Runs requests one at a time in a background thread where the last
+    submitted request always wins.
+    Submitting a request drops the one still queued (if any) and cancels the
+    token of the one in flight, so stale responses can be discarded.
+    The thread only lives while there's something to process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = None
+        self._running_token = None
+        self._thread = None
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues `fn(token, *args, **kwargs)` and returns its token.
+        """
+        token = CancellationToken()
+        with self._lock:
+            self._cancel_locked()
+            self._pending = (token, fn, args, kwargs)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.start()
+        return token
+
+    def cancel(self):
+        """Drops the queued request and cancels the one in flight."""
+        with self._lock:
+            self._cancel_locked()
+
+    def join(self, timeout=None):
+        """Waits for the worker thread to process all requests."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _cancel_locked(self):
+        if self._pending is not None:
+            token = self._pending[0]
+            token.cancel()
+            self._pending = None
+        if self._running_token is not None:
+            self._running_token.cancel()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._running_token = None
+                    self._thread = None
+                    return
+                token, fn, args, kwargs = self._pending
+                self._pending = None
+                self._running_token = token
+            try:
+                fn(token, *args, **kwargs)
+            except Exception:
+                logger.exception('Error processing %s', fn)
+
+
 def check_write_permission():
     """Android runtime storage permission check."""
     if platform != "android":
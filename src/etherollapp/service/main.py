@@ -21,11 +21,12 @@ from eth_accounts.account_utils import AccountUtils
 from kivy.app import App
 from kivy.logger import Logger
 from kivy.utils import platform
-from plyer import notification
-from pyetheroll.constants import ROUND_DIGITS
 from pyetheroll.etheroll import Etheroll
 from raven import Client
 
+from etherollapp.etheroll import history, notifications
+from etherollapp.etheroll.chain_cache import HeadTracker
+from etherollapp.etheroll.circuit_breaker import CircuitBreaker
 from etherollapp.etheroll.constants import ENV_PATH
 from etherollapp.etheroll.settings import Settings
 from etherollapp.osc.osc_app_client import OscAppClient
@@ -73,9 +74,11 @@ class MonitorRollsService:
         Set `osc_server_port` to enable UI synchronization with service.
         """
         self._account_utils = None
-        # per address cached merged logs, used to compare with next pulls
-        self.merged_logs = {}
+        # per address rolls digest, used to compare with next pulls
+        self.rolls_digests = {}
         self.last_roll_activity = None
+        # head block number of the last pull
+        self.last_block_number = None
         self.osc_app_client = None
         if osc_server_port is not None:
             self.osc_app_client = OscAppClient('localhost', osc_server_port)
@@ -90,7 +93,7 @@ class MonitorRollsService:
         self.last_roll_activity = time()
         elapsed = (time() - self.last_roll_activity)
         while elapsed < NO_ROLL_ACTIVITY_PERDIOD_SECONDS:
-            self.pull_accounts_rolls()
+            self.pull()
             sleep(PULL_FREQUENCY_SECONDS)
             elapsed = (time() - self.last_roll_activity)
         # service decided to die naturally after no roll activity
@@ -124,23 +127,71 @@ class MonitorRollsService:
         chain_id = Settings.get_stored_network()
         return Etheroll.get_or_create(chain_id)
 
+    def pull(self):
+        """
+        Pulls accounts rolls if a new block got mined.
+        Errors are logged rather than stopping the service, e.g. while the
+        network is down.
+        """
+        try:
+            if self.head_moved():
+                self.pull_accounts_rolls()
+        except Exception:
+            Logger.exception('Error pulling rolls')
+
+    def head_moved(self):
+        """
+        Rolls can't change until a new block is mined, hence no need to pull
+        them again until then.
+        On error assumes it did, so rolls are still pulled, e.g. from
+        Etherscan, unless offline, in which case polling is suspended until
+        the endpoints are back.
+        """
+        try:
+            block_number = HeadTracker.get_or_create(self.pyetheroll).poll()
+        except Exception:
+            if CircuitBreaker.is_offline():
+                return False
+            Logger.exception('Error polling head block')
+            return True
+        moved = block_number != self.last_block_number
+        self.last_block_number = block_number
+        return moved
+
+    @staticmethod
+    def get_rolls_digest(rolls):
+        """
+        Returns the `(rolls, resolved, last_roll)` digest of the streamed
+        rolls, which changes on new bets and results, without keeping the
+        whole history in memory.
+        """
+        count = resolved = 0
+        roll = None
+        for roll in rolls:
+            count += 1
+            resolved += roll.resolved
+        return count, resolved, roll
+
     def pull_account_rolls(self, account):
         """
-        Retrieves the merged logs for the given account and compares it with
-        existing cached value. If it differs notifies and updates cache.
+        Streams the rolls for the given account and compares their digest
+        with the cached one. If it differs notifies and updates cache.
         """
         address = "0x" + account.address.hex()
-        merged_logs = self.pyetheroll.get_merged_logs(address=address)
+        rolls_digest = self.get_rolls_digest(
+            history.iter_rolls(self.pyetheroll, address))
         try:
-            merged_logs_cached = self.merged_logs[address]
+            rolls_digest_cached = self.rolls_digests[address]
         except KeyError:
             # not yet cached, let's cache it for the first time
-            self.merged_logs[address] = merged_logs
+            self.rolls_digests[address] = rolls_digest
             return
-        if merged_logs_cached != merged_logs:
+        if rolls_digest_cached != rolls_digest:
             # since it differs, updates the cache and notifies
-            self.merged_logs[address] = merged_logs
-            self.do_notify(merged_logs)
+            self.rolls_digests[address] = rolls_digest
+            _, _, last_roll = rolls_digest
+            if last_roll is not None:
+                self.do_notify(last_roll)
             self.last_roll_activity = time()
 
     def pull_accounts_rolls(self):
@@ -150,40 +201,22 @@ class MonitorRollsService:
         for account in accounts:
             self.pull_account_rolls(account)
 
-    def do_notify(self, merged_logs):
+    def do_notify(self, roll):
         """
         Notifies the with last roll.
         If the roll has no bet result, notifies it was just placed on the
         blockchain, but not yet resolved by the oracle.
         If it has a result, notifies it.
+        Bets and results already notified by the app are skipped.
         Also notifies the app process via OSC so it can refresh balance.
         """
-        merged_log = merged_logs[-1]
-        bet_log = merged_log['bet_log']
-        bet_result = merged_log['bet_result']
-        bet_value_ether = bet_log['bet_value_ether']
-        roll_under = bet_log['roll_under']
-        ticker = "Ticker"
-        # the bet was just placed, but not resolved by the oracle
-        if bet_result is None:
-            title = "Bet confirmed on chain"
-            message = (
-                '{bet_value_ether:.{round_digits}f} ETH '
-                'to roll under {roll_under}').format(**{
-                    'bet_value_ether': bet_value_ether,
-                    'round_digits': ROUND_DIGITS,
-                    'roll_under': roll_under})
-        else:
-            dice_result = bet_result['dice_result']
-            player_won = dice_result < roll_under
-            sign = '<' if player_won else '>'
-            title = 'You '
-            title += 'won' if player_won else 'lost'
-            message = f'{dice_result} {sign} {roll_under}'
-        kwargs = {'title': title, 'message': message, 'ticker': ticker}
         if self.osc_app_client is not None:
             self.osc_app_client.send_refresh_balance()
-        notification.notify(**kwargs)
+        # the bet was just placed, but not resolved by the oracle
+        if not roll.resolved:
+            notifications.notify_bet_placed(roll)
+        else:
+            notifications.notify_bet_result(roll)
 
 
 def main():
@@ -0,0 +1,161 @@
+import unittest
+from unittest import mock
+
+from eth_abi import encode_abi
+from web3 import Web3
+
+from etherollapp.etheroll import bet_results
+from etherollapp.etheroll.bet_results import PendingBetWatcher
+
+CONTRACT_ADDRESS = '0xA52e014B3f5Cc48287c2D483A3E026C32cc76E6d'
+PLAYER_ADDRESS = '0x46044beAa1E985C67767E04dE58181de5DAAA00F'
+BET_ID = (
+    '15e007148ec621d996c886de0f2b88a0'
+    '3b15a8f2c6b6c8c9b5cbb3b27c0cbd97')
+TX_HASH = (
+    '0x3505de688dc20748eb5062b85efb8f1'
+    '12cfd8e5d7a9e1c5ba7ab8f1a8f2bd5dc')
+LOG_RESULT_ABI = {
+    'anonymous': False,
+    'inputs': [
+        {'indexed': True, 'name': 'ResultSerialNumber', 'type': 'uint256'},
+        {'indexed': True, 'name': 'BetID', 'type': 'bytes32'},
+        {'indexed': True, 'name': 'PlayerAddress', 'type': 'address'},
+        {'indexed': False, 'name': 'PlayerNumber', 'type': 'uint256'},
+        {'indexed': False, 'name': 'DiceResult', 'type': 'uint256'},
+        {'indexed': False, 'name': 'Value', 'type': 'uint256'},
+        {'indexed': False, 'name': 'Status', 'type': 'int256'},
+        {'indexed': False, 'name': 'Proof', 'type': 'bytes'},
+    ],
+    'name': 'LogResult',
+    'type': 'event',
+}
+LOG_RESULT_SIGNATURE = Web3.keccak(
+    text='LogResult(uint256,bytes32,address,uint256,uint256,uint256,int256,'
+    'bytes)')
+
+
+def patch_request():
+    return mock.patch('etherollapp.etheroll.rpc.request')
+
+
+def get_pyetheroll():
+    pyetheroll = mock.Mock()
+    pyetheroll.contract_abi = [LOG_RESULT_ABI]
+    pyetheroll.contract_address = CONTRACT_ADDRESS
+    pyetheroll.events_signatures = {'LogResult': LOG_RESULT_SIGNATURE}
+    return pyetheroll
+
+
+def get_log_result():
+    """Raw `LogResult` log, as returned by `eth_getLogs`."""
+    topics = [
+        LOG_RESULT_SIGNATURE.hex(),
+        '0x' + encode_abi(['uint256'], [1]).hex(),
+        '0x' + BET_ID,
+        '0x' + encode_abi(['address'], [PLAYER_ADDRESS]).hex(),
+    ]
+    data = '0x' + encode_abi(
+        ['uint256', 'uint256', 'uint256', 'int256', 'bytes'],
+        [51, 37, int(0.45e18), 1, b'']).hex()
+    return {
+        'address': CONTRACT_ADDRESS.lower(),
+        'topics': topics,
+        'data': data,
+        'transactionHash': TX_HASH,
+    }
+
+
+class TestBetResults(unittest.TestCase):
+    """Unit tests bet_results functions."""
+
+    def test_get_topic_position(self):
+        contract_abi = [LOG_RESULT_ABI]
+        assert bet_results.get_topic_position(
+            contract_abi, 'LogResult', 'BetID') == 2
+        assert bet_results.get_topic_position(
+            contract_abi, 'LogResult', 'PlayerAddress') == 3
+
+    def test_build_result_filter(self):
+        """Filters on the contract, result event, bet id and block range."""
+        pyetheroll = get_pyetheroll()
+        assert bet_results.build_result_filter(pyetheroll, BET_ID, 16) == {
+            'address': CONTRACT_ADDRESS,
+            'fromBlock': '0x10',
+            'toBlock': 'latest',
+            'topics': [LOG_RESULT_SIGNATURE.hex(), None, '0x' + BET_ID],
+        }
+
+    def test_get_bet_results(self):
+        pyetheroll = get_pyetheroll()
+        bet_log = {'bet_id': BET_ID, 'block_number': 16}
+        with patch_request() as m_request:
+            m_request.return_value = [get_log_result()]
+            assert bet_results.get_bet_results(pyetheroll, [bet_log]) == [{
+                'bet_id': BET_ID,
+                'bet_value_ether': 0.45,
+                'dice_result': 37,
+                'roll_under': 51,
+                'transaction_hash': TX_HASH,
+            }]
+        assert m_request.call_args_list == [mock.call(
+            pyetheroll, 'eth_getLogs',
+            [bet_results.build_result_filter(pyetheroll, BET_ID, 16)])]
+
+    def test_get_bet_results_batch(self):
+        """Several bets are looked up with a single batch request."""
+        pyetheroll = get_pyetheroll()
+        bet_logs = [
+            {'bet_id': BET_ID, 'block_number': 16},
+            {'bet_id': '00' * 32, 'block_number': 17},
+        ]
+        with mock.patch('etherollapp.etheroll.rpc.batch_request') \
+                as m_batch_request:
+            m_batch_request.return_value = [[get_log_result()], []]
+            results = bet_results.get_bet_results(pyetheroll, bet_logs)
+        assert results[0]['dice_result'] == 37
+        assert results[1] is None
+        assert m_batch_request.call_count == 1
+        calls = m_batch_request.call_args[0][1]
+        assert [method for method, _ in calls] == ['eth_getLogs'] * 2
+
+
+class TestPendingBetWatcher(unittest.TestCase):
+    """Unit tests PendingBetWatcher methods."""
+
+    def test_watch(self):
+        """Bets are watched until resolved."""
+        pyetheroll = get_pyetheroll()
+        on_result = mock.Mock()
+        watcher = PendingBetWatcher(on_result, poll_seconds=0)
+        bet_log = {'bet_id': BET_ID, 'block_number': 16}
+        with patch_request() as m_request:
+            m_request.side_effect = [[], [get_log_result()]]
+            watcher.watch(pyetheroll, bet_log)
+            watcher.join()
+        assert m_request.call_count == 2
+        bet_result = watcher.results[BET_ID]
+        assert bet_result['dice_result'] == 37
+        assert on_result.call_args_list == [mock.call(bet_log, bet_result)]
+
+    def test_add_result(self):
+        """Only the most recent results are kept."""
+        watcher = PendingBetWatcher(mock.Mock())
+        with mock.patch('etherollapp.etheroll.bet_results.MAX_RESULTS', 2):
+            for bet_id in ('01', '02', '03'):
+                watcher.add_result(bet_id, {'bet_id': bet_id})
+        assert list(watcher.results) == ['02', '03']
+
+    def test_watch_timeout(self):
+        """Bets never resolved stop being watched."""
+        pyetheroll = get_pyetheroll()
+        on_result = mock.Mock()
+        watcher = PendingBetWatcher(
+            on_result, poll_seconds=0, timeout_seconds=0)
+        with patch_request() as m_request:
+            m_request.return_value = []
+            watcher.watch(
+                pyetheroll, {'bet_id': BET_ID, 'block_number': 16})
+            watcher.join()
+        assert watcher.results == {}
+        assert on_result.call_count == 0
@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+from etherollapp.etheroll.chain_cache import BlockCache, HeadTracker
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHeadTracker(unittest.TestCase):
+    """Unit tests HeadTracker methods."""
+
+    def test_block_number(self):
+        """The head is polled at most once per block interval."""
+        clock = FakeClock()
+        get_block_number = mock.Mock(side_effect=[10, 11])
+        head_tracker = HeadTracker(get_block_number, interval=13, clock=clock)
+        assert head_tracker.block_number == 10
+        clock.now = 12
+        assert head_tracker.block_number == 10
+        assert get_block_number.call_count == 1
+        clock.now = 13
+        assert head_tracker.block_number == 11
+        assert get_block_number.call_count == 2
+
+    def test_bind(self):
+        """Listeners are only notified when the head moves."""
+        get_block_number = mock.Mock(side_effect=[10, 10, 11])
+        head_tracker = HeadTracker(get_block_number)
+        listener = mock.Mock()
+        head_tracker.bind(listener)
+        for _ in range(3):
+            head_tracker.poll()
+        assert listener.call_args_list == [mock.call(10), mock.call(11)]
+        # e.g. from a transaction receipt
+        head_tracker.observe(12)
+        head_tracker.observe(11)
+        assert listener.call_args_list[-1] == mock.call(12)
+        assert listener.call_count == 3
+        assert head_tracker.block_number == 12
+
+    def test_get_or_create(self):
+        """The head is polled through the chain endpoints pool."""
+        pyetheroll = mock.Mock(chain_id='test_get_or_create')
+        self.addCleanup(
+            HeadTracker._head_trackers.pop, pyetheroll.chain_id, None)
+        head_tracker = HeadTracker.get_or_create(pyetheroll)
+        assert HeadTracker.get_or_create(pyetheroll) is head_tracker
+        with mock.patch(
+                'etherollapp.etheroll.chain_cache.rpc.request',
+                return_value='0x10') as m_request:
+            assert head_tracker.poll() == 16
+        assert m_request.call_args_list == [
+            mock.call(pyetheroll, 'eth_blockNumber', [])]
+        assert pyetheroll.web3.eth.mock_calls == []
+
+
+class TestBlockCache(unittest.TestCase):
+    """Unit tests BlockCache methods."""
+
+    def test_get(self):
+        """Reads are served from memory until the head moves."""
+        clock = FakeClock()
+        head_tracker = HeadTracker(
+            mock.Mock(side_effect=[10, 11]), interval=13, clock=clock)
+        block_cache = BlockCache(head_tracker)
+        fetch = mock.Mock(side_effect=['a', 'b'])
+        assert block_cache.get('key', fetch) == 'a'
+        assert block_cache.get('key', fetch) == 'a'
+        assert fetch.call_count == 1
+        clock.now = 13
+        assert block_cache.get('key', fetch) == 'b'
+        assert fetch.call_count == 2
+
+    def test_get_head_error(self):
+        """Reads still go through when the head can't be fetched."""
+        head_tracker = HeadTracker(
+            mock.Mock(side_effect=ConnectionError('Whatever')))
+        block_cache = BlockCache(head_tracker)
+        fetch = mock.Mock(return_value='a')
+        assert block_cache.get('key', fetch) == 'a'
+        assert block_cache.get('key', fetch) == 'a'
+        assert fetch.call_count == 2
+
+    def test_get_many(self):
+        """Only the keys not cached are fetched, failures aren't cached."""
+        head_tracker = HeadTracker(mock.Mock(return_value=10))
+        block_cache = BlockCache(head_tracker)
+        block_cache.get('a', lambda: 1)
+        error = ConnectionError('Whatever')
+        fetch_many = mock.Mock(side_effect=[[2, error], [3]])
+        assert block_cache.get_many(['a', 'b', 'c'], fetch_many) == [
+            1, 2, error]
+        assert block_cache.get_many(['a', 'b', 'c'], fetch_many) == [1, 2, 3]
+        assert fetch_many.call_args_list == [
+            mock.call(['b', 'c']), mock.call(['c'])]
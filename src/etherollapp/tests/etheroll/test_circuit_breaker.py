@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+import pytest
+
+from etherollapp.etheroll.circuit_breaker import (CircuitBreaker,
+                                                  CircuitOpenError,
+                                                  CircuitState)
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Unit tests CircuitBreaker methods."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(CircuitBreaker._breakers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(CircuitBreaker, '_offline', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            'http://a', clock=self.clock, rand=lambda: 0.5)
+        CircuitBreaker._breakers['http://a'] = self.breaker
+
+    def fail(self):
+        with pytest.raises(ConnectionError):
+            self.breaker.call(
+                mock.Mock(side_effect=ConnectionError('Whatever')))
+
+    def test_call(self):
+        """The circuit opens after consecutive network errors only."""
+        with pytest.raises(ValueError):
+            self.breaker.call(mock.Mock(side_effect=ValueError))
+        for _ in range(2):
+            self.fail()
+        assert self.breaker.state is CircuitState.CLOSED
+        self.fail()
+        assert self.breaker.state is CircuitState.OPEN
+        function = mock.Mock()
+        with pytest.raises(CircuitOpenError):
+            self.breaker.call(function)
+        assert function.call_count == 0
+
+    def test_half_open(self):
+        """A single probe is let through after an exponential backoff."""
+        for _ in range(3):
+            self.fail()
+        self.clock.now = 5
+        assert self.breaker.state is CircuitState.HALF_OPEN
+        assert self.breaker.allow() is True
+        assert self.breaker.available is False
+        assert self.breaker.allow() is False
+        # failed probe, the backoff doubles
+        self.breaker.record_failure()
+        assert self.breaker.retry_at == 5 + 10
+        self.clock.now = 15
+        assert self.breaker.call(lambda: 'ok') == 'ok'
+        assert self.breaker.state is CircuitState.CLOSED
+        assert self.breaker.opened == 0
+
+    def test_offline(self):
+        """Listeners are notified when all the circuits open or close."""
+        other = CircuitBreaker('http://b')
+        CircuitBreaker._breakers['http://b'] = other
+        listener = mock.Mock()
+        CircuitBreaker.bind_offline(listener)
+        self.addCleanup(CircuitBreaker.unbind_offline, listener)
+        for _ in range(3):
+            self.fail()
+        assert CircuitBreaker.is_offline() is False
+        for _ in range(3):
+            other.record_failure()
+        assert CircuitBreaker.is_offline() is True
+        self.clock.now = 5
+        self.breaker.call(lambda: 'ok')
+        assert listener.call_args_list == [mock.call(True), mock.call(False)]
@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+from eth_keyfile import create_keyfile_json
+
+from etherollapp.etheroll.crypto_worker import CryptoWorker, UnknownKeyError
+
+PRIVATE_KEY = bytes.fromhex(
+    '4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318')
+TRANSACTION = {
+    'chainId': 1,
+    'gas': 25000,
+    'gasPrice': 4000000000,
+    'nonce': 0,
+    'value': 1,
+    'to': '0x46044beAa1E985C67767E04dE58181de5DAAA00F',
+}
+
+
+class TestCryptoWorker(unittest.TestCase):
+    """Unit tests CryptoWorker methods, against a real crypto process."""
+
+    def setUp(self):
+        self.crypto_worker = CryptoWorker(start_method='spawn')
+        self.crypto_worker.start()
+
+    def tearDown(self):
+        self.crypto_worker.stop()
+
+    def test_unlock(self):
+        """Decrypts the keyfile, wrong password errors are forwarded."""
+        keyfile = create_keyfile_json(
+            PRIVATE_KEY, b'password', kdf='pbkdf2', iterations=2)
+        assert self.crypto_worker.unlock(keyfile, 'password') == PRIVATE_KEY
+        with self.assertRaises(ValueError) as context:
+            self.crypto_worker.unlock(keyfile, 'wrong password')
+        assert context.exception.args == ('MAC mismatch',)
+        metrics = self.crypto_worker.metrics['unlock']
+        assert metrics.count == 2
+        assert metrics.failures == 1
+        assert metrics.max >= metrics.last > 0
+
+    def test_sign_tx(self):
+        signed_tx = self.crypto_worker.sign_tx(TRANSACTION, PRIVATE_KEY)
+        assert len(signed_tx.rawTransaction) > 0
+        assert len(signed_tx.hash) == 32
+
+    def test_sign_tx_with_key(self):
+        """The key stays in the crypto process until forgotten."""
+        keyfile = create_keyfile_json(
+            PRIVATE_KEY, b'password', kdf='pbkdf2', iterations=2)
+        key_handle = self.crypto_worker.unlock_key(keyfile, 'password')
+        assert isinstance(key_handle, str)
+        signed_tx = self.crypto_worker.sign_tx_with_key(
+            TRANSACTION, key_handle)
+        assert signed_tx == self.crypto_worker.sign_tx(
+            TRANSACTION, PRIVATE_KEY)
+        self.crypto_worker.call('forget_key', key_handle)
+        with self.assertRaises(UnknownKeyError):
+            self.crypto_worker.sign_tx_with_key(TRANSACTION, key_handle)
+
+    def test_create_keyfile(self):
+        """The created keyfile can be unlocked with the same password."""
+        keyfile = self.crypto_worker.create_keyfile('password', 2)
+        assert set(keyfile.keys()) == {'address', 'crypto', 'id', 'version'}
+        private_key = self.crypto_worker.unlock(keyfile, 'password')
+        assert len(private_key) == 32
+
+    def test_in_process(self):
+        """Operations still run if the crypto process can't be started."""
+        crypto_worker = CryptoWorker(start_method='spawn')
+        with mock.patch('multiprocessing.get_context', side_effect=OSError):
+            signed_tx = crypto_worker.sign_tx(TRANSACTION, PRIVATE_KEY)
+        assert crypto_worker._in_process is True
+        assert crypto_worker._process is None
+        assert len(signed_tx.hash) == 32
+
+
+if __name__ == '__main__':
+    unittest.main()
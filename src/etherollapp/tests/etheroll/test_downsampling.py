@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from etherollapp.etheroll import downsampling
+from etherollapp.etheroll.downsampling import SeriesPyramid
+
+
+def get_series(length, seed=0):
+    rng = np.random.RandomState(seed)
+    x = np.arange(length, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=length))
+    return x, y
+
+
+class TestDownsampling(unittest.TestCase):
+    """Unit tests downsampling functions."""
+
+    def test_lttb(self):
+        x, y = get_series(1000)
+        # spikes are preserved
+        y[500] = 1000
+        indexes = downsampling.lttb(x, y, 50)
+        assert len(indexes) == 50
+        assert indexes[0] == 0
+        assert indexes[-1] == 999
+        assert 500 in indexes
+        assert (np.diff(indexes) > 0).all()
+        # nothing to downsample
+        assert downsampling.lttb(x[:10], y[:10], 50).tolist() == list(
+            range(10))
+
+    def test_lttb_fixed(self):
+        """Points selected don't change as points get appended."""
+        x, y = get_series(1000)
+        indexes = downsampling.lttb_fixed(x, y, 4)
+        # the last complete bucket depends on the next one
+        assert len(indexes) == 249
+        assert (indexes // 4 == np.arange(249)).all()
+        assert downsampling.lttb_fixed(x[:500], y[:500], 4).tolist() == \
+            indexes[:124].tolist()
+
+
+class TestSeriesPyramid(unittest.TestCase):
+    """Unit tests SeriesPyramid."""
+
+    def test_extend(self):
+        """Levels extended a chunk at a time match extended at once."""
+        x, y = get_series(10000)
+        pyramid = SeriesPyramid(min_points=64)
+        pyramid.extend(x, y)
+        chunked = SeriesPyramid(min_points=64)
+        for start in range(0, 10000, 777):
+            chunked.extend(x[start:start + 777], y[start:start + 777])
+        assert len(chunked) == 10000
+        # 10000, 2499, 623, 154
+        assert [len(level_x) for level_x, _ in pyramid.levels] == [
+            10000, 2499, 623, 154]
+        for (level_x, level_y), (chunked_x, chunked_y) in zip(
+                pyramid.levels, chunked.levels):
+            assert level_x.tolist() == chunked_x.tolist()
+            assert level_y.tolist() == chunked_y.tolist()
+
+    def test_clear(self):
+        """Cleared levels get extended from scratch."""
+        x, y = get_series(1000)
+        pyramid = SeriesPyramid(min_points=64)
+        pyramid.extend(x, y)
+        pyramid.clear()
+        assert len(pyramid) == 0
+        pyramid.extend(x[:300], y[:300])
+        expected = SeriesPyramid(min_points=64)
+        expected.extend(x[:300], y[:300])
+        assert [level_x.tolist() for level_x, _ in pyramid.levels] == [
+            level_x.tolist() for level_x, _ in expected.levels]
+
+    def test_downsample(self):
+        x, y = get_series(10000)
+        pyramid = SeriesPyramid(min_points=64)
+        pyramid.extend(x, y)
+        # zoomed out, from a coarse level
+        points_x, points_y = pyramid.downsample(100)
+        assert len(points_x) == 100
+        assert set(points_x.tolist()) <= set(pyramid.levels[-1][0].tolist())
+        # zoomed in, from the series itself
+        points_x, points_y = pyramid.downsample(100, 5000, 5150)
+        assert len(points_x) == 100
+        assert points_x[0] == 5000
+        assert points_x[-1] == 5150
+        # fewer points than the threshold
+        points_x, _ = pyramid.downsample(100, 5000, 5050)
+        assert points_x.tolist() == x[5000:5051].tolist()
+
+
+if __name__ == '__main__':
+    unittest.main()
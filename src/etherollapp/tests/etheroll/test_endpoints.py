@@ -0,0 +1,140 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+import pytest
+from pyetheroll.constants import ChainID
+from requests.exceptions import ReadTimeout
+
+from etherollapp.etheroll import circuit_breaker, endpoints
+from etherollapp.etheroll.circuit_breaker import CircuitBreaker, CircuitState
+from etherollapp.etheroll.endpoints import EndpointPool
+from etherollapp.etheroll.rpc import RPCError
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEndpoints(unittest.TestCase):
+    """Unit tests endpoints functions."""
+
+    def test_get_endpoint_uris(self):
+        pyetheroll = mock.Mock(chain_id=ChainID.ROPSTEN)
+        pyetheroll.web3.provider.endpoint_uri = 'http://a'
+        environ = {'RPC_ENDPOINTS_ROPSTEN': 'http://b, http://a,,http://c'}
+        with mock.patch.dict(os.environ, environ):
+            uris = endpoints.get_endpoint_uris(pyetheroll)
+        assert uris == ['http://a', 'http://b', 'http://c']
+
+
+class TestEndpointPool(unittest.TestCase):
+    """Unit tests EndpointPool methods."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(CircuitBreaker._breakers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ranked(self):
+        """Endpoints are ranked on latency and error rate."""
+        pool = EndpointPool(['http://a', 'http://b', 'http://c'])
+        a, b, c = pool.endpoints
+        a.record_success(0.5)
+        b.record_success(0.1)
+        c.record_success(0.12)
+        assert pool.ranked() == [b, c, a]
+        b.record_failure()
+        b.record_failure()
+        assert pool.ranked() == [c, b, a]
+
+    def test_request_hedged(self):
+        """Slow requests are hedged to the next endpoint."""
+        pool = EndpointPool(['http://a', 'http://b'])
+        released = threading.Event()
+
+        def fetch(uri):
+            if uri == 'http://a':
+                released.wait(1)
+            return uri
+
+        with mock.patch.object(pool, 'hedge_seconds', return_value=0.01):
+            assert pool.request(fetch) == 'http://b'
+        released.set()
+
+    def test_request_failover(self):
+        """Unreachable endpoints are skipped while their circuit is open."""
+        clock = FakeClock()
+        breaker = CircuitBreaker('http://a', clock=clock, rand=lambda: 0.5)
+        CircuitBreaker._breakers['http://a'] = breaker
+        pool = EndpointPool(['http://a', 'http://b'])
+        a, b = pool.endpoints
+
+        def fetch(uri):
+            if uri == 'http://a':
+                raise ConnectionError('Whatever')
+            return uri
+
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            # never measured endpoints first
+            b.latency = None
+            assert pool.request(fetch) == 'http://b'
+        assert breaker.state is CircuitState.OPEN
+        assert pool.ranked() == [b]
+        clock.now += circuit_breaker.BACKOFF_SECONDS
+        assert a in pool.ranked()
+
+    def test_request_error(self):
+        """The last error is raised when all endpoints failed."""
+        pool = EndpointPool(['http://a', 'http://b'])
+        fetch = mock.Mock(side_effect=ConnectionError('Whatever'))
+        with pytest.raises(ConnectionError, match='Whatever'):
+            pool.request(fetch)
+        assert fetch.call_count == 2
+
+    def test_request_node_error(self):
+        """
+        Node errors are raised right away, without failing over nor
+        counting against the endpoint.
+        """
+        pool = EndpointPool(['http://a', 'http://b'])
+        a, _ = pool.endpoints
+        fetch = mock.Mock(side_effect=RPCError('nonce too low'))
+        with pytest.raises(RPCError, match='nonce too low'):
+            pool.request(fetch)
+        assert fetch.call_args_list == [mock.call('http://a')]
+        assert a.error_rate == 0
+        assert a.breaker.failures == 0
+
+    def test_send(self):
+        """Writes are never hedged, even when slow."""
+        pool = EndpointPool(['http://a', 'http://b'])
+        fetch = mock.Mock(return_value='0xhash')
+        with mock.patch.object(pool, 'hedge_seconds', return_value=0):
+            assert pool.send(fetch) == '0xhash'
+        assert fetch.call_args_list == [mock.call('http://a')]
+
+    def test_send_failover(self):
+        """
+        Writes only go to the next endpoint if the first one couldn't be
+        connected to, it may have gotten the write otherwise.
+        """
+        pool = EndpointPool(['http://a', 'http://b'])
+
+        def fetch(uri):
+            if uri == 'http://a':
+                raise ConnectionError('Whatever')
+            return uri
+        assert pool.send(fetch) == 'http://b'
+        for exception in (ReadTimeout('Whatever'), RPCError('nonce too low')):
+            fetch = mock.Mock(side_effect=exception)
+            with pytest.raises(type(exception)):
+                pool.send(fetch)
+            assert fetch.call_count == 1
@@ -0,0 +1,82 @@
+import os
+import unittest
+from unittest import mock
+
+import pytest
+
+from etherollapp.etheroll import etherscan_keys
+from etherollapp.etheroll.etherscan_keys import EtherscanKeyPool, TokenBucket
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestEtherscanKeys(unittest.TestCase):
+    """Unit tests etherscan_keys functions."""
+
+    def test_get_api_keys(self):
+        environ = {'ETHERSCAN_API_KEYS': 'A, B,,A', 'ETHERSCAN_API_KEY': 'C'}
+        with mock.patch.dict(os.environ, environ):
+            assert etherscan_keys.get_api_keys() == ['A', 'B']
+        environ = {'ETHERSCAN_API_KEYS': '', 'ETHERSCAN_API_KEY': 'C'}
+        with mock.patch.dict(os.environ, environ):
+            assert etherscan_keys.get_api_keys() == ['C']
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, clock=clock)
+        assert [bucket.take() for _ in range(3)] == [True, True, False]
+        assert bucket.wait_seconds() == 0.5
+        clock.now = 0.5
+        assert bucket.take() is True
+
+
+class TestEtherscanKeyPool(unittest.TestCase):
+    """Unit tests EtherscanKeyPool methods."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = EtherscanKeyPool(
+            ['A', 'B'], rate=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_acquire(self):
+        """Keys with the most quota left go first, then waits a refill."""
+        keys = [self.pool.acquire().key for _ in range(5)]
+        assert keys == ['A', 'B', 'A', 'B', 'A']
+        assert self.clock.now == 0.5
+        assert self.pool.usage() == {
+            'A...': {'calls': 3, 'throttled': 0},
+            'B...': {'calls': 2, 'throttled': 0},
+        }
+
+    def test_call(self):
+        """Throttled keys are left aside and the call retried."""
+        pyetheroll = mock.Mock(etherscan_api_key='A')
+
+        def function(keyed_pyetheroll):
+            if keyed_pyetheroll.etherscan_api_key == 'A':
+                raise ValueError('Max rate limit reached')
+            return keyed_pyetheroll.etherscan_api_key
+        assert self.pool.call(pyetheroll, function) == 'B'
+        # the shared object is left untouched
+        assert pyetheroll.etherscan_api_key == 'A'
+        assert [self.pool.acquire().key for _ in range(2)] == ['B', 'B']
+        assert self.pool.usage()['A...']['throttled'] == 1
+
+    def test_call_error(self):
+        """Other errors aren't retried."""
+        for message in ('Whatever', 'NOTOK', 'Invalid API Key'):
+            function = mock.Mock(side_effect=ValueError(message))
+            with pytest.raises(ValueError, match=message):
+                self.pool.call(mock.Mock(), function)
+            assert function.call_count == 1
@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+from etherollapp.etheroll import fairness
+from etherollapp.etheroll.fairness import FairnessAudit
+from etherollapp.etheroll.roll_stats import SECONDS_PER_DAY
+from etherollapp.tests.etheroll.utils import RollStoreTestCase, get_roll
+
+
+def get_rolls(dice_results, roll_under=50, start=0):
+    """One roll a day."""
+    return [
+        get_roll(
+            index, dice_result, roll_under=roll_under,
+            timestamp=index * SECONDS_PER_DAY)
+        for index, dice_result in enumerate(dice_results, start)
+    ]
+
+
+class TestFairness(RollStoreTestCase):
+    """Unit tests the fairness audit."""
+
+    def test_chi_square_p_value(self):
+        # chi-square tables values
+        assert round(fairness.chi_square_p_value(3.841, 1), 3) == 0.05
+        assert round(fairness.chi_square_p_value(6.635, 1), 3) == 0.01
+        assert round(fairness.chi_square_p_value(123.225, 99), 3) == 0.05
+        assert round(fairness.chi_square_p_value(77.046, 99), 3) == 0.95
+        # 2 degrees of freedom is an exponential distribution
+        assert math.isclose(
+            fairness.chi_square_p_value(3, 2), math.exp(-1.5))
+        assert fairness.chi_square_p_value(0, 99) == 1
+
+    def test_get_runs_moments(self):
+        assert fairness.get_runs_moments(10, 10) == (11, 90 / 19)
+        assert fairness.get_runs_moments(1, 0) == (1, 0)
+
+    def test_update(self):
+        """
+        Runs carry over from one update to the next, unresolved bets older
+        than a day are void until they get a result.
+        """
+        # high, low, low, high, high, unresolved
+        self.store.sync(get_rolls([99, 1, 50, 51, 100, None]))
+        audit = FairnessAudit(self.store, pending_seconds=SECONDS_PER_DAY)
+        assert audit.update() == 5
+        assert audit.update() == 0
+        assert audit.dice_counts.sum() == 5
+        assert audit.dice_counts[[0, 49, 50, 98, 99]].tolist() == [1] * 5
+        assert (audit.highs, audit.lows, audit.runs) == (3, 2, 3)
+        # unresolved older than a day are void
+        self.store.sync(get_rolls([100, 2], start=6))
+        assert audit.update() == 3
+        assert (audit.highs, audit.lows, audit.runs) == (4, 3, 4)
+        report = audit.report()
+        assert report['rolls'] == 7
+        assert report['runs'] == 4
+        assert report['expected_runs'] == 2 * 4 * 3 / 7 + 1
+        # `roll_under=50` wins under 50 with a 49% chance
+        assert report['bucket_rolls'][4] == 7
+        assert report['bucket_win_rates'][4] == 2 / 7
+        assert math.isclose(report['bucket_expected_win_rates'][4], 0.49)
+        assert math.isnan(report['bucket_win_rates'][0])
+        # resolved after all, the counts start over
+        self.store.sync(get_rolls([1], start=5))
+        assert audit.update() == 8
+        assert (audit.highs, audit.lows, audit.runs) == (4, 4, 6)
+        assert audit.void_rows.tolist() == []
+
+    def test_report_fair(self):
+        rng = np.random.RandomState(0)
+        dice_results = rng.randint(1, 101, 5000).tolist()
+        self.store.sync(get_rolls(dice_results))
+        audit = FairnessAudit(self.store)
+        audit.update()
+        report = audit.report()
+        assert report['rolls'] == 5000
+        assert report['chi_square_p_value'] > 0.01
+        assert report['runs_p_value'] > 0.01
+        assert abs(report['bucket_z'][4]) < 3
+
+    def test_report_unfair(self):
+        """Skewed dice and alternating high/low results get flagged."""
+        self.store.sync(get_rolls([1, 99] * 1000))
+        audit = FairnessAudit(self.store)
+        audit.update()
+        report = audit.report()
+        assert report['chi_square_p_value'] < 1e-6
+        assert report['runs'] == 2000
+        assert report['runs_z'] > 0
+        assert report['runs_p_value'] < 1e-6
+        # half won rather than 49%
+        assert report['bucket_win_rates'][4] == 0.5
+
+    def test_get_report(self):
+        """Accounts histories add up."""
+        other_store = self.create_store()
+        self.store.sync(get_rolls([1, 99, 1]))
+        other_store.sync(get_rolls([99, 1]))
+        audits = [FairnessAudit(self.store), FairnessAudit(other_store)]
+        for audit in audits:
+            audit.update()
+        report = fairness.get_report(audits)
+        assert report['rolls'] == 5
+        assert report['runs'] == 5
+        assert report['expected_runs'] == (
+            fairness.get_runs_moments(1, 2)[0] +
+            fairness.get_runs_moments(1, 1)[0])
+        assert fairness.get_report([])['chi_square_p_value'] is None
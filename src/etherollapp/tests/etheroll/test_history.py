@@ -0,0 +1,333 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from etherollapp.etheroll import history
+from etherollapp.etheroll.circuit_breaker import CircuitBreaker
+from etherollapp.etheroll.etherscan_keys import (EtherscanError,
+                                                 EtherscanKeyPool)
+from etherollapp.etheroll.history import EtherscanHistory, NodeHistory
+from etherollapp.etheroll.rolls import RollRecord
+from etherollapp.tests.etheroll.test_bet_results import (LOG_RESULT_ABI,
+                                                         LOG_RESULT_SIGNATURE,
+                                                         get_log_result)
+from etherollapp.tests.etheroll.test_receipts import (BET_ID, CONTRACT_ADDRESS,
+                                                      LOG_BET_ABI,
+                                                      LOG_BET_SIGNATURE,
+                                                      PLAYER_ADDRESS, TX_HASH,
+                                                      get_log_bet)
+
+TIMESTAMP = 1566645978
+
+
+def get_bet_result(bet_id, dice_result):
+    return {'bet_id': bet_id, 'dice_result': dice_result}
+
+
+class ConcurrentEtheroll:
+    """
+    Etherscan side of `Etheroll`, the bets and results logs of a page can
+    only be returned while both are being requested, unless not
+    `concurrent`.
+    """
+
+    def __init__(self, logs, concurrent=True):
+        self.chain_id = 'test'
+        self.etherscan_api_key = None
+        self.contract_abi = [LOG_BET_ABI, LOG_RESULT_ABI]
+        self.logs = logs
+        self.barrier = threading.Barrier(2, timeout=5) if concurrent else None
+        # `(signature, from_block, to_block)` of the calls
+        self.calls = []
+
+    def get_last_bets_blocks(self, address):
+        return {'from_block': 1, 'to_block': 800}
+
+    def get_events(self, signature, from_block, to_block):
+        self.calls.append((signature, from_block, to_block))
+        if self.barrier is not None:
+            self.barrier.wait()
+        return [
+            log for log in self.logs
+            if log['topics'][0] == signature.hex() and
+            from_block <= int(log['blockNumber'], 16) <= to_block
+        ]
+
+    def get_log_bet_events(self, address, from_block, to_block):
+        return self.get_events(LOG_BET_SIGNATURE, from_block, to_block)
+
+    def get_log_result_events(self, address, from_block, to_block):
+        return self.get_events(LOG_RESULT_SIGNATURE, from_block, to_block)
+
+
+class NodeStandIn:
+    """Local JSON-RPC node serving in memory logs."""
+
+    def __init__(self, logs, head, max_range=None):
+        self.logs = logs
+        self.head = head
+        # `eth_getLogs` block ranges rejected past that
+        self.max_range = max_range
+        self.rejected = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                payload = json.loads(self.rfile.read(length))
+                if isinstance(payload, list):
+                    response = [stand_in.handle(item) for item in payload]
+                else:
+                    response = stand_in.handle(payload)
+                body = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    @property
+    def uri(self):
+        return 'http://127.0.0.1:{}'.format(self.server.server_port)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def get_logs(self, log_filter):
+        from_block = int(log_filter['fromBlock'], 16)
+        to_block = int(log_filter['toBlock'], 16)
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            self.rejected += 1
+            raise ValueError('query returned more than 10000 results')
+        return [
+            log for log in self.logs
+            if log['address'] == log_filter['address'].lower() and
+            from_block <= int(log['blockNumber'], 16) <= to_block and
+            all(topic is None or topic == log_topic for topic, log_topic in
+                zip(log_filter['topics'], log['topics']))
+        ]
+
+    def handle(self, item):
+        method, params = item['method'], item['params']
+        response = {'jsonrpc': '2.0', 'id': item['id']}
+        try:
+            if method == 'eth_blockNumber':
+                response['result'] = hex(self.head)
+            elif method == 'eth_getBlockByNumber':
+                response['result'] = {
+                    'number': params[0],
+                    'timestamp': hex(TIMESTAMP + int(params[0], 16))}
+            elif method == 'eth_getLogs':
+                response['result'] = self.get_logs(params[0])
+            else:
+                raise ValueError('Method not found')
+        except ValueError as exception:
+            response['error'] = {'code': -32000, 'message': str(exception)}
+        return response
+
+
+def get_etherscan_log(log, block_number):
+    """Raw log as returned by the Etherscan log API."""
+    return dict(
+        log, blockNumber=hex(block_number),
+        timeStamp=hex(TIMESTAMP + block_number), transactionHash=TX_HASH)
+
+
+def get_etherscan_logs():
+    """Two player bets, only the first one resolved."""
+    bet_log = dict(get_etherscan_log(get_log_bet(), 100), logIndex='0x1')
+    other_log = dict(bet_log, blockNumber=hex(500))
+    other_log['topics'] = list(bet_log['topics'])
+    other_log['topics'][1] = '0x' + '00' * 31 + '02'
+    result_log = get_etherscan_log(get_log_result(), 700)
+    return [bet_log, other_log, result_log]
+
+
+def get_logs():
+    """The player bet and its result, plus another player bet."""
+    bet_log = dict(
+        get_log_bet(), blockNumber=hex(100), logIndex='0x1',
+        transactionHash=TX_HASH)
+    other_log = dict(bet_log, logIndex='0x2')
+    other_log['topics'] = list(bet_log['topics'])
+    other_log['topics'][2] = '0x' + '00' * 31 + '01'
+    result_log = dict(get_log_result(), blockNumber=hex(700), logIndex='0x0')
+    return [bet_log, other_log, result_log]
+
+
+class TestNodeHistory(unittest.TestCase):
+    """Unit tests NodeHistory against a local node."""
+
+    def setUp(self):
+        self.stand_in = NodeStandIn(get_logs(), head=1000)
+        self.addCleanup(self.stand_in.stop)
+        self.pyetheroll = mock.Mock()
+        self.pyetheroll.web3.provider.endpoint_uri = self.stand_in.uri
+        self.pyetheroll.contract_abi = [LOG_BET_ABI, LOG_RESULT_ABI]
+        self.pyetheroll.contract_address = CONTRACT_ADDRESS
+        self.pyetheroll.events_signatures = {
+            'LogBet': LOG_BET_SIGNATURE, 'LogResult': LOG_RESULT_SIGNATURE}
+
+    def test_split_range(self):
+        assert history.split_range(10, 34, 10) == [
+            (10, 19), (20, 29), (30, 34)]
+
+    def test_get_rolls(self):
+        """Player rolls are looked up and decoded locally."""
+        node_history = NodeHistory(history_blocks=1000, chunk_blocks=300)
+        on_page = mock.Mock()
+        rolls = node_history.get_rolls(
+            self.pyetheroll, PLAYER_ADDRESS, on_page)
+        assert rolls == (RollRecord(
+            bet_id=BET_ID.hex(), transaction_hash=TX_HASH, block_number=100,
+            timestamp=TIMESTAMP + 100, bet_value_wei=int(0.45e18),
+            profit_value_wei=int(44.1e18), roll_under=2, dice_result=37),)
+        # the bet got held until its result showed up
+        assert on_page.call_args_list == [mock.call(rolls)]
+
+    def test_iter_merged_logs(self):
+        node_history = NodeHistory(history_blocks=1000, chunk_blocks=300)
+        merged_logs = list(node_history.iter_merged_logs(
+            self.pyetheroll, PLAYER_ADDRESS))
+        assert len(merged_logs) == 1
+        bet_log = merged_logs[0]['bet_log']
+        bet_result = merged_logs[0]['bet_result']
+        assert bet_log.pop('datetime') is not None
+        assert bet_log == {
+            'bet_id': BET_ID.hex(),
+            'bet_value_ether': 0.45,
+            'block_number': 100,
+            'profit_value_ether': 44.1,
+            'reward_value_ether': 44.55,
+            'roll_under': 2,
+            'timestamp': hex(TIMESTAMP + 100),
+            'transaction_hash': TX_HASH,
+        }
+        assert bet_result['bet_id'] == BET_ID.hex()
+        assert bet_result['dice_result'] == 37
+        assert bet_result['timestamp'] == hex(TIMESTAMP + 700)
+
+    def test_get_rolls_range(self):
+        """Ranges rejected by the node get split and the chunks shrink."""
+        self.stand_in.max_range = 300
+        node_history = NodeHistory(history_blocks=1000, chunk_blocks=1001)
+        rolls = node_history.get_rolls(self.pyetheroll, PLAYER_ADDRESS)
+        assert len(rolls) == 1
+        assert rolls[0].resolved
+        assert self.stand_in.rejected > 0
+        assert node_history.chunk_blocks < 1001
+
+
+def get_node_bet_log(bet_id, block_number):
+    return {'bet_id': bet_id, 'block_number': block_number}
+
+
+class TestIterMergedPages(unittest.TestCase):
+    """Unit tests iter_merged_pages()."""
+
+    def test_iter_merged_pages(self):
+        """Bets are held until resolved, or for `pending_blocks` blocks."""
+        events_pages = [
+            ('LogBet', 99, [
+                get_node_bet_log('01', 10), get_node_bet_log('02', 20)]),
+            ('LogResult', 99, [
+                get_bet_result('00', 1), get_bet_result('02', 50)]),
+            ('LogBet', 199, [get_node_bet_log('03', 150)]),
+            ('LogResult', 199, [get_bet_result('03', 60)]),
+            ('LogBet', 299, [get_node_bet_log('04', 250)]),
+            ('LogResult', 299, []),
+        ]
+        pages = history.iter_merged_pages(
+            iter(events_pages), pending_blocks=100)
+        # `01` is unresolved and holds the following ones
+        assert next(pages) == []
+        # until it's `pending_blocks` old
+        assert next(pages) == [
+            {'bet_log': get_node_bet_log('01', 10), 'bet_result': None},
+            {'bet_log': get_node_bet_log('02', 20),
+             'bet_result': get_bet_result('02', 50)},
+            {'bet_log': get_node_bet_log('03', 150),
+             'bet_result': get_bet_result('03', 60)},
+        ]
+        assert next(pages) == []
+        # what's left pending comes last
+        assert list(pages) == [[
+            {'bet_log': get_node_bet_log('04', 250), 'bet_result': None},
+        ]]
+
+
+class TestEtherscanHistory(unittest.TestCase):
+    """Unit tests EtherscanHistory."""
+
+    def setUp(self):
+        patchers = (
+            mock.patch.dict(CircuitBreaker._breakers, clear=True),
+            mock.patch.object(CircuitBreaker, '_offline', False),
+            mock.patch.object(
+                EtherscanKeyPool, 'get_or_create',
+                return_value=EtherscanKeyPool(['KEY'], rate=100)),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_get_rolls(self):
+        """
+        Bets and results logs are fetched concurrently over the whole range,
+        the new rolls get passed to `on_page()` as they arrive.
+        """
+        pyetheroll = ConcurrentEtheroll(get_etherscan_logs())
+        on_page = mock.Mock()
+        rolls = EtherscanHistory().get_rolls(
+            pyetheroll, PLAYER_ADDRESS, on_page)
+        assert [roll.block_number for roll in rolls] == [100, 500]
+        assert rolls[0].bet_id == BET_ID.hex()
+        assert rolls[0].dice_result == 37
+        assert rolls[1].dice_result is None
+        # the first bet once its result showed up, then the pending one
+        assert on_page.call_args_list == [
+            mock.call(rolls[:1]), mock.call(rolls[1:])]
+        # one call per event
+        assert set(pyetheroll.calls) == {
+            (LOG_BET_SIGNATURE, 1, 800), (LOG_RESULT_SIGNATURE, 1, 800)}
+        assert len(pyetheroll.calls) == 2
+
+    def test_get_rolls_full_page(self):
+        """Ranges with as many logs as the results cap get split."""
+        pyetheroll = ConcurrentEtheroll(
+            get_etherscan_logs(), concurrent=False)
+        rolls = EtherscanHistory(max_results=2).get_rolls(
+            pyetheroll, PLAYER_ADDRESS)
+        assert [roll.block_number for roll in rolls] == [100, 500]
+        assert rolls[0].dice_result == 37
+        bets_calls = [
+            call for call in pyetheroll.calls if call[0] == LOG_BET_SIGNATURE]
+        assert bets_calls == [
+            (LOG_BET_SIGNATURE, 1, 800),
+            (LOG_BET_SIGNATURE, 1, 400),
+            (LOG_BET_SIGNATURE, 401, 800),
+        ]
+
+    def test_get_rolls_no_bets(self):
+        pyetheroll = ConcurrentEtheroll([])
+        pyetheroll.get_last_bets_blocks = lambda address: None
+        assert EtherscanHistory().get_rolls(pyetheroll, PLAYER_ADDRESS) == ()
+
+    def test_get_rolls_error(self):
+        """Etherscan error messages returned as result are raised."""
+        pyetheroll = ConcurrentEtheroll([])
+        pyetheroll.get_events = mock.Mock(return_value='Query Timeout occured')
+        with self.assertRaises(EtherscanError):
+            EtherscanHistory().get_rolls(pyetheroll, PLAYER_ADDRESS)
@@ -0,0 +1,86 @@
+import unittest
+from threading import Thread
+from unittest import mock
+
+from etherollapp.etheroll.nonce_manager import NonceManager
+
+
+class TestNonceManager(unittest.TestCase):
+    """Unit tests NonceManager methods."""
+
+    def test_reserve(self):
+        """Syncs once with the chain, then allocates locally."""
+        get_transaction_count = mock.Mock(return_value=5)
+        nonce_manager = NonceManager(get_transaction_count)
+        assert [nonce_manager.reserve() for _ in range(3)] == [5, 6, 7]
+        assert get_transaction_count.call_count == 1
+
+    def test_reserve_concurrently(self):
+        """Concurrent reservations never collide."""
+        nonce_manager = NonceManager(lambda: 0)
+        nonces = []
+
+        def reserve():
+            for _ in range(100):
+                nonces.append(nonce_manager.reserve())
+        threads = [Thread(target=reserve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(nonces) == list(range(400))
+
+    def test_release(self):
+        """
+        Releasing the last nonce gives it back, releasing an older one leaves
+        a gap which gets filled first.
+        """
+        nonce_manager = NonceManager(lambda: 0)
+        assert nonce_manager.reserve_many(3) == [0, 1, 2]
+        nonce_manager.release(2)
+        assert nonce_manager.gaps == []
+        assert nonce_manager.reserve() == 2
+        nonce_manager.mark_broadcast(0)
+        nonce_manager.release(1)
+        assert nonce_manager.gaps == [1]
+        assert nonce_manager.reserve() == 1
+        assert nonce_manager.reserve() == 3
+        # releasing the last one also gives back the gaps below it
+        nonce_manager.release(1)
+        nonce_manager.release(3)
+        nonce_manager.release(2)
+        assert nonce_manager.gaps == []
+        assert nonce_manager.reserve() == 1
+
+    def test_resync(self):
+        """
+        On resync the chain is trusted for mined transactions while
+        broadcast and in flight ones are kept, the rest being gaps.
+        """
+        get_transaction_count = mock.Mock(return_value=0)
+        nonce_manager = NonceManager(get_transaction_count)
+        assert nonce_manager.reserve_many(5) == [0, 1, 2, 3, 4]
+        nonce_manager.mark_broadcast(0)
+        nonce_manager.mark_broadcast(1)
+        nonce_manager.mark_broadcast(3)
+        nonce_manager.release(2)
+        # 0 got mined, 1 and 3 are still propagating, 4 is in flight
+        get_transaction_count.return_value = 1
+        nonce_manager.resync()
+        assert nonce_manager.gaps == [2]
+        assert nonce_manager.reserve_many(2) == [2, 5]
+        # the chain moved ahead (e.g. transactions sent from another wallet)
+        get_transaction_count.return_value = 10
+        nonce_manager.resync()
+        assert nonce_manager.gaps == []
+        assert nonce_manager.reserve() == 10
+
+    def test_get_or_create(self):
+        """One manager per chain and (case insensitive) address."""
+        nonce_manager = NonceManager.get_or_create(1, '0xAb', lambda: 0)
+        assert NonceManager.get_or_create(1, '0xab', None) is nonce_manager
+        assert NonceManager.get_or_create(3, '0xab', None) is not nonce_manager
+
+
+if __name__ == '__main__':
+    unittest.main()
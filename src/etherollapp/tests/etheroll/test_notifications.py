@@ -0,0 +1,58 @@
+import os
+import shutil
+import threading
+import unittest
+from tempfile import mkdtemp
+from unittest import mock
+
+from etherollapp.etheroll import notifications
+from etherollapp.etheroll.notifications import NOTIFIED_BETS_KEY
+
+
+class TestNotifications(unittest.TestCase):
+    """Unit tests the notified identifiers store."""
+
+    def setUp(self):
+        self.path = mkdtemp(prefix='etheroll')
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        patcher = mock.patch(
+            'etherollapp.etheroll.notifications.Store.get_store_path',
+            return_value=os.path.join(self.path, 'store.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_set_notified(self):
+        assert notifications.get_notified(NOTIFIED_BETS_KEY) == []
+        assert notifications.set_notified(NOTIFIED_BETS_KEY, '0xAB') is True
+        assert notifications.set_notified(NOTIFIED_BETS_KEY, '0xab') is False
+        assert notifications.get_notified(NOTIFIED_BETS_KEY) == ['0xab']
+        # only the most recent ones are kept
+        for index in range(notifications.MAX_NOTIFIED):
+            notifications.set_notified(NOTIFIED_BETS_KEY, f'0x{index:x}')
+        notified = notifications.get_notified(NOTIFIED_BETS_KEY)
+        assert len(notified) == notifications.MAX_NOTIFIED
+        assert '0xab' not in notified
+        # the temporary files got replaced
+        assert sorted(os.listdir(self.path)) == [
+            'notified.json', 'notified.json.lock']
+
+    def test_set_notified_concurrent(self):
+        """Identifiers are only recorded once, none of them gets lost."""
+        barrier = threading.Barrier(8, timeout=5)
+        results = []
+
+        def set_notified(index):
+            barrier.wait()
+            results.append(notifications.set_notified(
+                NOTIFIED_BETS_KEY, f'0x{index % 4:x}'))
+        threads = [
+            threading.Thread(target=set_notified, args=(index, ))
+            for index in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 4
+        assert sorted(notifications.get_notified(NOTIFIED_BETS_KEY)) == [
+            '0x0', '0x1', '0x2', '0x3']
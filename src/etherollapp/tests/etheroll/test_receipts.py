@@ -0,0 +1,125 @@
+import unittest
+from unittest import mock
+
+from eth_abi import encode_abi
+from web3 import Web3
+
+from etherollapp.etheroll import receipts
+from etherollapp.etheroll.rpc import RPCError
+
+CONTRACT_ADDRESS = '0xA52e014B3f5Cc48287c2D483A3E026C32cc76E6d'
+PLAYER_ADDRESS = '0x46044beAa1E985C67767E04dE58181de5DAAA00F'
+BET_ID = bytes.fromhex(
+    '15e007148ec621d996c886de0f2b88a0'
+    '3b15a8f2c6b6c8c9b5cbb3b27c0cbd97')
+TX_HASH = (
+    '0xf363906a9278c4dd300c50a3c9a2790'
+    '0bb85df60596c49f7833c232f2944d1cb')
+LOG_BET_ABI = {
+    'anonymous': False,
+    'inputs': [
+        {'indexed': True, 'name': 'BetID', 'type': 'bytes32'},
+        {'indexed': True, 'name': 'PlayerAddress', 'type': 'address'},
+        {'indexed': True, 'name': 'RewardValue', 'type': 'uint256'},
+        {'indexed': False, 'name': 'ProfitValue', 'type': 'uint256'},
+        {'indexed': False, 'name': 'BetValue', 'type': 'uint256'},
+        {'indexed': False, 'name': 'PlayerNumber', 'type': 'uint256'},
+        {'indexed': False, 'name': 'RandomQueryID', 'type': 'uint256'},
+    ],
+    'name': 'LogBet',
+    'type': 'event',
+}
+LOG_BET_SIGNATURE = Web3.keccak(
+    text='LogBet(bytes32,address,uint256,uint256,uint256,uint256,uint256)')
+
+
+def get_pyetheroll():
+    pyetheroll = mock.Mock()
+    pyetheroll.contract_abi = [LOG_BET_ABI]
+    pyetheroll.contract_address = CONTRACT_ADDRESS
+    pyetheroll.events_signatures = {'LogBet': LOG_BET_SIGNATURE}
+    return pyetheroll
+
+
+def get_log_bet():
+    """Raw `LogBet` log, as found in the transaction receipt."""
+    topics = [
+        LOG_BET_SIGNATURE.hex(),
+        '0x' + BET_ID.hex(),
+        '0x' + encode_abi(['address'], [PLAYER_ADDRESS]).hex(),
+        '0x' + encode_abi(['uint256'], [int(44.55e18)]).hex(),
+    ]
+    data = '0x' + encode_abi(
+        ['uint256'] * 4, [int(44.1e18), int(0.45e18), 2, 0]).hex()
+    return {'address': CONTRACT_ADDRESS.lower(), 'topics': topics,
+            'data': data}
+
+
+class TestReceipts(unittest.TestCase):
+    """Unit tests receipts functions."""
+
+    def test_decode_bet_log(self):
+        pyetheroll = get_pyetheroll()
+        other_log = dict(get_log_bet(), address=PLAYER_ADDRESS)
+        receipt = {
+            'blockNumber': 5394094,
+            'logs': [other_log, get_log_bet()],
+            'status': 1,
+            'transactionHash': TX_HASH,
+        }
+        bet_log = receipts.decode_bet_log(pyetheroll, receipt)
+        assert bet_log.pop('datetime') is not None
+        assert bet_log == {
+            'bet_id': BET_ID.hex(),
+            'bet_value_ether': 0.45,
+            'block_number': 5394094,
+            'profit_value_ether': 44.1,
+            'reward_value_ether': 44.55,
+            'roll_under': 2,
+            'timestamp': None,
+            'transaction_hash': TX_HASH,
+        }
+
+    def test_decode_bet_log_none(self):
+        """No `LogBet` event, no bet placed."""
+        pyetheroll = get_pyetheroll()
+        receipt = {'blockNumber': 1, 'logs': [], 'status': 1}
+        assert receipts.decode_bet_log(pyetheroll, receipt) is None
+
+    def test_get_receipts(self):
+        """A single transaction doesn't need a batch request."""
+        pyetheroll = get_pyetheroll()
+        with mock.patch('etherollapp.etheroll.rpc.batch_request') \
+                as m_batch_request, \
+                mock.patch('etherollapp.etheroll.rpc.request') as m_request:
+            m_request.return_value = None
+            assert receipts.get_receipts(pyetheroll, [b'\x01']) == [None]
+            m_request.return_value = {'status': '0x1', 'blockNumber': '0x10'}
+            assert receipts.get_receipts(pyetheroll, [b'\x01']) == [
+                {'status': 1, 'blockNumber': 16}]
+        assert m_batch_request.call_count == 0
+        assert m_request.call_args == mock.call(
+            pyetheroll, 'eth_getTransactionReceipt', ['0x01'])
+
+    def test_get_receipts_batch(self):
+        """Several transactions are looked up with a batch request."""
+        pyetheroll = get_pyetheroll()
+        results = [
+            {'status': '0x1', 'blockNumber': '0x10', 'logs': []},
+            None,
+            RPCError('Whatever error'),
+        ]
+        with mock.patch('etherollapp.etheroll.rpc.batch_request') \
+                as m_batch_request:
+            m_batch_request.return_value = results
+            assert receipts.get_receipts(
+                pyetheroll, [b'\x01', b'\x02', b'\x03']) == [
+                    {'status': 1, 'blockNumber': 16, 'logs': []},
+                    None,
+                    None,
+                ]
+        assert m_batch_request.call_args_list == [mock.call(pyetheroll, [
+            ('eth_getTransactionReceipt', ['0x01']),
+            ('eth_getTransactionReceipt', ['0x02']),
+            ('eth_getTransactionReceipt', ['0x03']),
+        ])]
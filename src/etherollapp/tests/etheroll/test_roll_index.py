@@ -0,0 +1,87 @@
+import numpy as np
+
+from etherollapp.etheroll import roll_index
+from etherollapp.etheroll.roll_index import RollFilter, RollIndex
+from etherollapp.etheroll.roll_stats import SECONDS_PER_DAY
+from etherollapp.tests.etheroll import utils
+from etherollapp.tests.etheroll.utils import RollStoreTestCase
+
+# 2019-08-01 00:00:00 UTC
+AUGUST_1ST = 1564617600
+
+
+def get_roll(index, dice_result, roll_under=50, bet_ether=0.1, day=0):
+    return utils.get_roll(
+        index, dice_result, roll_under=roll_under,
+        timestamp=AUGUST_1ST + day * SECONDS_PER_DAY + index,
+        bet_value_wei=int(bet_ether * 1e18))
+
+
+class TestRollIndex(RollStoreTestCase):
+    """Unit tests RollIndex and the search queries."""
+
+    def test_parse_query(self):
+        assert roll_index.parse_query('') == RollFilter()
+        assert roll_index.parse_query('').empty
+        assert roll_index.parse_query(
+            'Won roll<50 roll>=10 bet>0.5 date=2019-08-01'
+        ) == RollFilter('won', {
+            'roll_under': (10, 49),
+            'bet_value_gwei': (int(0.5e9) + 1, None),
+            'timestamp': (AUGUST_1ST, AUGUST_1ST + SECONDS_PER_DAY - 1),
+        })
+        # ranges of the same column get intersected
+        assert roll_index.parse_query(
+            'date>2019-08-01 date<=2019-08-03 date<2019-08-31'
+        ).ranges == {'timestamp': (
+            AUGUST_1ST + SECONDS_PER_DAY,
+            AUGUST_1ST + 3 * SECONDS_PER_DAY - 1,
+        )}
+        for query in ('lucky', 'roll<', 'roll<ten', 'size>1', 'date>08/01'):
+            with self.assertRaises(ValueError):
+                roll_index.parse_query(query)
+
+    def test_select(self):
+        self.store.sync([
+            get_roll(0, 10, roll_under=50, bet_ether=0.1, day=0),
+            get_roll(1, 60, roll_under=50, bet_ether=0.5, day=1),
+            get_roll(2, 20, roll_under=30, bet_ether=1, day=2),
+            get_roll(3, None, roll_under=90, bet_ether=0.5, day=2),
+        ])
+        index = RollIndex(self.store)
+        assert index.update() == 4
+
+        def select(query):
+            return index.select(roll_index.parse_query(query)).tolist()
+        assert select('') == [0, 1, 2, 3]
+        assert select('won') == [0, 2]
+        assert select('lost') == [1]
+        assert select('pending') == [3]
+        assert select('roll<50') == [2]
+        assert select('roll>=50') == [0, 1, 3]
+        assert select('bet=0.5') == [1, 3]
+        assert select('bet>0.1 bet<1') == [1, 3]
+        assert select('date>=2019-08-02') == [1, 2, 3]
+        assert select('won date=2019-08-03') == [2]
+        assert select('lost roll<50') == []
+
+    def test_update(self):
+        """New rows get merged and pending ones resolved."""
+        self.store.sync([
+            get_roll(0, None, bet_ether=0.5), get_roll(1, 10, bet_ether=1)])
+        index = RollIndex(self.store)
+        index.update()
+        assert index.select(RollFilter('pending')).tolist() == [0]
+        self.store.sync([
+            get_roll(0, 90, bet_ether=0.5), get_roll(2, 1, bet_ether=0.1),
+            get_roll(3, 2, bet_ether=0.5)])
+        assert index.update() == 2
+        assert index.update() == 0
+        assert index.select(RollFilter('pending')).tolist() == []
+        assert index.select(RollFilter('lost')).tolist() == [0]
+        assert index.select(RollFilter('won')).tolist() == [1, 2, 3]
+        rows, values = index.sorted_columns['bet_value_gwei']
+        assert rows.tolist() == [2, 0, 3, 1]
+        assert (np.diff(values) >= 0).all()
+        assert index.select(
+            roll_index.parse_query('bet=0.5')).tolist() == [0, 3]
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from etherollapp.etheroll import roll_stats
+from etherollapp.etheroll.roll_stats import SECONDS_PER_DAY, RollStats
+from etherollapp.etheroll.roll_store import GWEI
+from etherollapp.tests.etheroll.utils import RollStoreTestCase, get_roll
+
+
+class TestRollStats(RollStoreTestCase):
+    """Unit tests RollStats."""
+
+    def test_get_longest_streak(self):
+        outcomes = np.array([True, True, False, True, True, True, False, True])
+        assert roll_stats.get_longest_streak(outcomes, 0) == (3, 1)
+        # carried over streak
+        assert roll_stats.get_longest_streak(outcomes, 2) == (4, 1)
+        assert roll_stats.get_longest_streak(outcomes[:2], 2) == (4, 4)
+        assert roll_stats.get_longest_streak(outcomes[2:3], 2) == (2, 0)
+
+    def test_update(self):
+        # win, loss, loss, win, win, win, loss
+        dice_results = [10, 60, 70, 1, 2, 3, 99]
+        self.store.sync(
+            get_roll(index, dice_result, timestamp=index * SECONDS_PER_DAY)
+            for index, dice_result in enumerate(dice_results))
+        stats = RollStats(self.store)
+        assert stats.update() == 7
+        assert stats.update() == 0
+        summary = stats.summary()
+        assert summary['rolls'] == 7
+        assert summary['wins'] == 4
+        assert summary['win_rate'] == 4 / 7
+        assert summary['profit_loss_ether'] == (4 * 2 - 3) / GWEI
+        assert stats.cumulative_gwei.tolist() == [2, 1, 0, 2, 4, 6, 5]
+        # from the first win down to the second loss
+        assert summary['max_drawdown_ether'] == 2 / GWEI
+        assert summary['longest_win_streak'] == 3
+        assert summary['longest_loss_streak'] == 2
+        assert stats.bucket_rolls.tolist()[4] == 7
+        assert np.isnan(summary['bucket_win_rates'][0])
+        assert stats.daily_rolls.tolist() == [1] * 7
+        assert stats.daily_gwei.tolist() == [2, -1, -1, 2, 2, 2, -1]
+
+    def test_update_incremental(self):
+        """Updates one roll at a time match a single update."""
+        rng = np.random.RandomState(0)
+        rolls = [
+            get_roll(index, int(rng.randint(1, 101)),
+                     roll_under=int(rng.randint(2, 100)))
+            for index in range(200)]
+        stats = RollStats(self.store)
+        for roll in rolls:
+            self.store.sync([roll])
+            assert stats.update() == 1
+        other_store = self.create_store()
+        other_store.sync(rolls)
+        other_stats = RollStats(other_store)
+        other_stats.update()
+        assert stats.summary() == other_stats.summary()
+        assert stats.cumulative_gwei.tolist() == \
+            other_stats.cumulative_gwei.tolist()
+        assert stats.daily_gwei.tolist() == other_stats.daily_gwei.tolist()
+
+    def test_update_pending(self):
+        """Unresolved bets hold back the statistics until resolved or void."""
+        self.store.sync([get_roll(0, 10), get_roll(1, None), get_roll(2, 60)])
+        stats = RollStats(self.store, pending_seconds=SECONDS_PER_DAY)
+        assert stats.update() == 1
+        self.store.sync([get_roll(1, 20)])
+        assert stats.update() == 2
+        assert stats.summary()['wins'] == 2
+        # never resolved, e.g. refunded
+        self.store.sync([
+            get_roll(3, None),
+            get_roll(4, 30, timestamp=2 * SECONDS_PER_DAY)])
+        assert stats.update() == 2
+        assert stats.summary()['rolls'] == 4
+        assert stats.resets == 0
+        # resolved after all, the statistics start over
+        self.store.sync([get_roll(3, 40)])
+        assert stats.update() == 5
+        assert stats.resets == 1
+        summary = stats.summary()
+        assert summary['rolls'] == 5
+        assert summary['wins'] == 4
+        assert stats.cumulative_gwei.tolist() == [2, 4, 3, 5, 7]
+        assert stats.update() == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from etherollapp.etheroll.roll_store import COLUMNS, RollStore
+from etherollapp.tests.etheroll import utils
+from etherollapp.tests.etheroll.utils import RollStoreTestCase
+
+TX_HASH = '0xf363906a9278c4dd300c50a3c9a27900bb85df60596c49f7833c232f2944d1cb'
+
+
+def get_roll(index, dice_result=None):
+    # bet ids with trailing null bytes must survive the roundtrip
+    bet_id = (bytes([index]) + b'\0' * 31).hex()
+    return utils.get_roll(
+        index, dice_result, bet_id=bet_id, transaction_hash=TX_HASH,
+        bet_value_wei=int(0.45e18))
+
+
+class TestRollStore(RollStoreTestCase):
+    """Unit tests RollStore."""
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.store.path
+
+    def test_sync(self):
+        """New rolls get appended and pending ones resolved."""
+        store = RollStore(self.path)
+        assert len(store) == 0
+        assert store.sync([get_roll(1, 37), get_roll(2)]) == 2
+        columns = store.columns()
+        assert columns['dice_result'].tolist() == [37, -1]
+        assert columns['bet_value_gwei'].tolist() == [int(0.45e9)] * 2
+        # read-only views
+        with self.assertRaises(ValueError):
+            columns['dice_result'][0] = 1
+        assert store.sync([get_roll(2, 1), get_roll(3)]) == 1
+        assert store.column('dice_result').tolist() == [37, 1, -1]
+        # already fetched views are left untouched by appends
+        assert len(columns['dice_result']) == 2
+        assert store.rolls() == [get_roll(1, 37), get_roll(2, 1), get_roll(3)]
+        # persisted
+        store = RollStore(self.path)
+        assert store.rolls(start=1) == [get_roll(2, 1), get_roll(3)]
+
+    def test_take(self):
+        store = RollStore(self.path)
+        store.sync([get_roll(1, 37), get_roll(2), get_roll(3, 1)])
+        assert store.take([2, 0]) == [get_roll(3, 1), get_roll(1, 37)]
+        assert store.take([]) == []
+
+    def test_open_interrupted(self):
+        """Columns longer than the others get truncated on open."""
+        store = RollStore(self.path)
+        store.append([get_roll(1), get_roll(2)])
+        name, dtype = COLUMNS[-1]
+        with open(os.path.join(self.path, name + '.bin'), 'ab') as f:
+            f.write(np.array([5], dtype=dtype).tobytes())
+        store = RollStore(self.path)
+        assert len(store) == 2
+        assert store.column(name).tolist() == [-1, -1]
+
+    def test_get_all(self):
+        """Stores of all the accounts of the chain with a stored history."""
+        with mock.patch('etherollapp.etheroll.roll_store.App') as m_app:
+            m_app.get_running_app().user_data_dir = self.path
+            assert RollStore.get_all('mainnet') == []
+            store = RollStore.get_or_create('mainnet', '0xB')
+            RollStore.get_or_create('ropsten', '0xA')
+            assert RollStore.get_all('mainnet') == [store]
+            assert store.path == os.path.join(
+                self.path, 'rolls_v1', 'mainnet', '0xb')
+
+
+if __name__ == '__main__':
+    unittest.main()
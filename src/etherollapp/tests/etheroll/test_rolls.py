@@ -0,0 +1,78 @@
+import unittest
+from datetime import datetime
+
+from etherollapp.etheroll.rolls import RollRecord
+
+BET_ID = '15e007148ec621d996c886de0f2b88a03b15a8f2c6b6c8c9b5cbb3b27c0cbd97'
+TX_HASH = '0xf363906a9278c4dd300c50a3c9a27900bb85df60596c49f7833c232f2944d1cb'
+
+
+def get_bet_log():
+    """Bet log, as returned by `Etheroll.get_bets_logs()`."""
+    return {
+        'bet_id': BET_ID,
+        'reward_value_ether': 44.55,
+        'profit_value_ether': 44.1,
+        'bet_value_ether': 0.45,
+        'roll_under': 2,
+        'timestamp': '0x5d611eda',
+        'datetime': datetime(2019, 8, 24, 11, 26, 18),
+        'transaction_hash': TX_HASH,
+    }
+
+
+def get_bet_result(dice_result):
+    """Bet result, as returned by `Etheroll.get_bet_results_logs()`."""
+    return {
+        'bet_id': BET_ID,
+        'roll_under': 2,
+        'dice_result': dice_result,
+        'bet_value_ether': 44.55,
+        'timestamp': '0x5d611f00',
+        'datetime': datetime(2019, 8, 24, 11, 26, 56),
+        'transaction_hash': TX_HASH,
+    }
+
+
+class TestRollRecord(unittest.TestCase):
+    """Unit tests RollRecord."""
+
+    def test_from_merged_log(self):
+        roll = RollRecord.from_merged_log({
+            'bet_log': get_bet_log(),
+            'bet_result': get_bet_result(1),
+        })
+        assert roll == RollRecord(
+            bet_id=BET_ID,
+            transaction_hash=TX_HASH,
+            block_number=None,
+            timestamp=1566645978,
+            bet_value_wei=450000000000000000,
+            profit_value_wei=44100000000000000000,
+            roll_under=2,
+            dice_result=1,
+        )
+        assert roll.resolved is True
+        assert roll.won is True
+        assert roll.profit_loss_wei == 44100000000000000000
+        assert roll.profit_loss_ether == 44.1
+        assert roll.datetime == datetime(2019, 8, 24, 11, 26, 18)
+        assert not hasattr(roll, '__dict__')
+
+    def test_from_logs(self):
+        """Unresolved and lost bets."""
+        bet_log = dict(get_bet_log(), timestamp=None, block_number=5394094)
+        roll = RollRecord.from_logs(bet_log)
+        assert roll.block_number == 5394094
+        # falls back to the datetime
+        assert roll.timestamp == 1566645978
+        assert roll.resolved is False
+        assert roll.won is None
+        assert roll.profit_loss_wei is None
+        roll = RollRecord.from_logs(bet_log, get_bet_result(37))
+        assert roll.won is False
+        assert roll.profit_loss_ether == -0.45
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+import pytest
+
+from etherollapp.etheroll import rpc
+
+
+class TestRPC(unittest.TestCase):
+    """Unit tests rpc functions."""
+
+    def test_batch_request(self):
+        """Results are returned in order, with per call errors."""
+        pyetheroll = mock.Mock()
+        pyetheroll.web3.provider.endpoint_uri = 'http://localhost:8545'
+        responses = [
+            {'jsonrpc': '2.0', 'id': 1, 'error': {'message': 'Whatever'}},
+            {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'},
+        ]
+        with mock.patch('etherollapp.etheroll.rpc.requests.post') as m_post:
+            m_post.return_value.json.return_value = responses
+            results = rpc.batch_request(pyetheroll, [
+                ('eth_blockNumber', []),
+                ('eth_getBalance', ['0x00', 'latest']),
+                ('eth_chainId', []),
+            ])
+        assert results[0] == '0x1'
+        assert type(results[1]) is rpc.RPCError
+        assert str(results[1]) == 'Whatever'
+        assert str(results[2]) == 'Missing response'
+        assert m_post.call_args_list == [mock.call(
+            'http://localhost:8545', json=[
+                {'jsonrpc': '2.0', 'id': 0, 'method': 'eth_blockNumber',
+                 'params': []},
+                {'jsonrpc': '2.0', 'id': 1, 'method': 'eth_getBalance',
+                 'params': ['0x00', 'latest']},
+                {'jsonrpc': '2.0', 'id': 2, 'method': 'eth_chainId',
+                 'params': []},
+            ], timeout=rpc.REQUEST_TIMEOUT)]
+
+    def test_batch_request_unsupported(self):
+        """Nodes not supporting batches reply with a single error."""
+        pyetheroll = mock.Mock()
+        with mock.patch('etherollapp.etheroll.rpc.requests.post') as m_post:
+            m_post.return_value.json.return_value = {
+                'jsonrpc': '2.0', 'id': None,
+                'error': {'message': 'Batch not supported'}}
+            with pytest.raises(rpc.RPCError, match='Batch not supported'):
+                rpc.batch_request(pyetheroll, [('eth_blockNumber', [])])
+
+
+class TestRequestBatcher(unittest.TestCase):
+    """Unit tests RequestBatcher methods."""
+
+    def test_submit(self):
+        """Reads within the window are sent as one batch."""
+        send_batch = mock.Mock(return_value=['0x1', rpc.RPCError('Whatever')])
+        batcher = rpc.RequestBatcher(send_batch, window=0.01)
+        futures = [
+            batcher.submit('eth_getBalance', ['0x00', 'latest']),
+            batcher.submit('eth_blockNumber', []),
+        ]
+        assert futures[0].result(timeout=1) == '0x1'
+        with pytest.raises(rpc.RPCError, match='Whatever'):
+            futures[1].result(timeout=1)
+        assert send_batch.call_args_list == [mock.call([
+            ('eth_getBalance', ['0x00', 'latest']),
+            ('eth_blockNumber', []),
+        ])]
+
+    def test_submit_max_size(self):
+        """Full batches are sent right away without waiting the window."""
+        send_batch = mock.Mock(side_effect=lambda calls: ['0x1'] * len(calls))
+        batcher = rpc.RequestBatcher(send_batch, window=60, max_size=2)
+        futures = [batcher.submit('eth_blockNumber', []) for _ in range(2)]
+        assert [future.result(timeout=1) for future in futures] == [
+            '0x1', '0x1']
+        assert send_batch.call_count == 1
+
+    def test_request_many(self):
+        """Grouped reads are sent at once, failures are per batch."""
+        send_batch = mock.Mock(side_effect=ConnectionError('Whatever'))
+        batcher = rpc.RequestBatcher(send_batch, window=60)
+        results = batcher.request_many([
+            ('eth_blockNumber', []), ('eth_chainId', [])])
+        assert [type(result) for result in results] == [
+            ConnectionError, ConnectionError]
+        assert send_batch.call_count == 1
+
+    def test_get_balances(self):
+        pyetheroll = mock.Mock()
+        pyetheroll.web3.provider.endpoint_uri = 'http://localhost:8545'
+        with mock.patch('etherollapp.etheroll.rpc.batch_request') as m_batch:
+            m_batch.return_value = ['0xde0b6b3a7640000', rpc.RPCError()]
+            balances = rpc.get_balances(pyetheroll, ['0x00', '0x01'])
+        assert balances[0] == int(1e18)
+        assert type(balances[1]) is rpc.RPCError
+        assert m_batch.call_args_list == [mock.call(pyetheroll, [
+            ('eth_getBalance', ['0x00', 'latest']),
+            ('eth_getBalance', ['0x01', 'latest']),
+        ])]
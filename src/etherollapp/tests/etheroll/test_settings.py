@@ -54,6 +54,14 @@ class TestSettings(unittest.TestCase):
         Settings.set_stored_gas_price(42)
         assert Settings.get_stored_gas_price() == 42
 
+    def test_get_set_stored_signer_cache_timeout(self):
+        """Checks default signer cache timeout and set method."""
+        # checks default
+        assert Settings.get_stored_signer_cache_timeout() == 0
+        # checks set
+        Settings.set_stored_signer_cache_timeout(300)
+        assert Settings.get_stored_signer_cache_timeout() == 300
+
     def test_get_set_is_persistent_keystore(self):
         """Checks default persist value and set method."""
         # checks default
@@ -62,6 +70,14 @@ class TestSettings(unittest.TestCase):
         Settings.set_is_persistent_keystore(True)
         assert Settings.is_persistent_keystore() is True
 
+    def test_get_set_is_broadcast_all_endpoints(self):
+        """Checks default broadcast value and set method."""
+        # checks default
+        assert Settings.is_broadcast_all_endpoints() is False
+        # checks set
+        Settings.set_is_broadcast_all_endpoints(True)
+        assert Settings.is_broadcast_all_endpoints() is True
+
     def test_get_android_keystore_prefix(self):
         """
         The keystore prefix should be the same as user_data_dir by default.
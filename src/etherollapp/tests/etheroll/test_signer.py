@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import unittest
+from tempfile import mkdtemp
+from unittest import mock
+
+from eth_keyfile import create_keyfile_json
+
+from etherollapp.etheroll.crypto_worker import CryptoWorker, UnknownKeyError
+from etherollapp.etheroll.signer import Signer, SignerCache
+
+PRIVATE_KEY = bytes.fromhex(
+    '4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318')
+ADDRESS = '2c7536e3605d9c16a7a3d7b1898e529396a65c23'
+TRANSACTION = {
+    'chainId': 1,
+    'gas': 25000,
+    'gasPrice': 4000000000,
+    'nonce': 0,
+    'value': 1,
+    'to': '0x46044beAa1E985C67767E04dE58181de5DAAA00F',
+}
+
+
+class FakeClock:
+    """Monotonic clock moved forward by hand."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSigner(unittest.TestCase):
+    """Unit tests Signer methods."""
+
+    def setUp(self):
+        self.temp_path = mkdtemp(prefix='etheroll')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+
+    def create_keyfile(self, password):
+        keyfile = create_keyfile_json(
+            PRIVATE_KEY, password, kdf='pbkdf2', iterations=2)
+        keyfile_path = os.path.join(self.temp_path, ADDRESS)
+        with open(keyfile_path, 'w') as f:
+            json.dump(keyfile, f)
+        return keyfile_path
+
+    def test_unlock(self):
+        """Unlocks using the keyfile password, fails on wrong password."""
+        keyfile_path = self.create_keyfile(b'password')
+        signer = Signer.unlock(keyfile_path, 'password')
+        assert signer.address == ADDRESS
+        assert signer.locked is False
+        with self.assertRaises(ValueError) as context:
+            Signer.unlock(keyfile_path, 'wrong password')
+        assert context.exception.args == ('MAC mismatch',)
+
+    def test_sign_transaction(self):
+        signer = Signer(ADDRESS, PRIVATE_KEY)
+        signed_tx = signer.sign_transaction(TRANSACTION)
+        assert len(signed_tx.rawTransaction) > 0
+        assert len(signed_tx.hash) == 32
+
+    def test_unlock_crypto_worker(self):
+        """
+        The key is only held by the crypto process, transactions get signed
+        by key handle and zeroising forgets it.
+        """
+        keyfile_path = self.create_keyfile(b'password')
+        crypto_worker = CryptoWorker(start_method='spawn')
+        # runs the operations in process
+        crypto_worker._in_process = True
+        signer = Signer.unlock(keyfile_path, 'password', crypto_worker)
+        assert signer.address == ADDRESS
+        assert signer._private_key == bytearray()
+        signed_tx = signer.sign_transaction(TRANSACTION)
+        assert signed_tx.hash == Signer(
+            ADDRESS, PRIVATE_KEY).sign_transaction(TRANSACTION).hash
+        with mock.patch.object(crypto_worker, 'forget_key') as m_forget_key:
+            signer.zeroise()
+        assert m_forget_key.call_args_list == [mock.call(signer._key_handle)]
+        assert signer.locked is True
+
+    def test_sign_transaction_key_lost(self):
+        """The signer gets locked if the crypto process lost its key."""
+        crypto_worker = CryptoWorker(start_method='spawn')
+        crypto_worker._in_process = True
+        signer = Signer(
+            ADDRESS, crypto_worker=crypto_worker, key_handle='unknown')
+        with self.assertRaises(UnknownKeyError):
+            signer.sign_transaction(TRANSACTION)
+        assert signer.locked is True
+
+    def test_zeroise(self):
+        """The key is overwritten and the signer can no longer sign."""
+        signer = Signer(ADDRESS, PRIVATE_KEY)
+        signer.zeroise()
+        assert signer.locked is True
+        assert signer._private_key == bytearray(len(PRIVATE_KEY))
+        with self.assertRaises(ValueError):
+            signer.sign_transaction({})
+
+
+class TestSignerCache(unittest.TestCase):
+    """Unit tests SignerCache methods."""
+
+    def test_disabled(self):
+        """Nothing gets cached with the default zero timeout."""
+        cache = SignerCache()
+        assert cache.enabled is False
+        cache.put(ADDRESS, Signer(ADDRESS, PRIVATE_KEY))
+        assert cache.get(ADDRESS) is None
+
+    def test_timeout(self):
+        """Idle signers get zeroised, using them resets the idle timer."""
+        clock = FakeClock()
+        cache = SignerCache(timeout=60, clock=clock)
+        signer = Signer(ADDRESS, PRIVATE_KEY)
+        cache.put(ADDRESS, signer)
+        clock.now = 50
+        assert cache.get(ADDRESS) is signer
+        clock.now = 100
+        assert cache.get(ADDRESS) is signer
+        clock.now = 160
+        cache.purge_expired()
+        assert signer.locked is True
+        assert cache.get(ADDRESS) is None
+
+    def test_timeout_setter(self):
+        """Disabling the cache zeroises the cached signers."""
+        cache = SignerCache(timeout=60)
+        signer = Signer(ADDRESS, PRIVATE_KEY)
+        cache.put(ADDRESS, signer)
+        cache.timeout = 0
+        assert signer.locked is True
+        assert cache.get(ADDRESS) is None
+
+    def test_get_locked(self):
+        """Signers locked in the meantime need unlocking again."""
+        cache = SignerCache(timeout=60)
+        signer = Signer(ADDRESS, PRIVATE_KEY)
+        cache.put(ADDRESS, signer)
+        signer.locked = True
+        assert cache.get(ADDRESS) is None
+
+    def test_lock(self):
+        """Locks one or all accounts right away."""
+        cache = SignerCache(timeout=60)
+        signer1 = Signer(ADDRESS, PRIVATE_KEY)
+        signer2 = Signer('address2', PRIVATE_KEY)
+        cache.put(ADDRESS, signer1)
+        cache.put('address2', signer2)
+        cache.lock(ADDRESS)
+        assert signer1.locked is True
+        assert signer2.locked is False
+        assert cache.get('address2') is signer2
+        cache.lock()
+        assert signer2.locked is True
+        assert cache.get('address2') is None
+
+
+if __name__ == '__main__':
+    unittest.main()
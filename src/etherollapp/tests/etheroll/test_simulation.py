@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+from pyetheroll.utils import EtherollUtils
+
+from etherollapp.etheroll import simulation
+
+
+class TestSimulation(unittest.TestCase):
+    """Unit tests the bankroll simulation."""
+
+    def test_get_profit(self):
+        for bet_size, chances_win in ((0.1, 50), (1, 1), (2.5, 97)):
+            assert round(simulation.get_profit(bet_size, chances_win), 2) == \
+                EtherollUtils.compute_profit(bet_size, chances_win)
+        assert simulation.get_profit(1, 0) is None
+        assert simulation.get_profit(1, 100) is None
+
+    def test_simulate(self):
+        """The bankroll covers all the bets, nothing gets ruined."""
+        bet_size, roll_under, rolls = 0.1, 51, 100
+        result = simulation.simulate(
+            rolls * bet_size, bet_size, roll_under, rolls=rolls,
+            paths=20000, seed=0)
+        assert result['rolls'] == rolls
+        assert result['paths'] == 20000
+        assert result['risk_of_ruin'] == 0
+        profit = simulation.get_profit(bet_size, roll_under - 1)
+        expected = rolls * (0.5 * profit - 0.5 * bet_size)
+        assert abs(result['expected_profit_loss'] - expected) < 0.02
+        percentiles = list(result['percentiles'].values())
+        assert list(result['percentiles']) == list(simulation.PERCENTILES)
+        assert percentiles == sorted(percentiles)
+        # worst and best cases bounds
+        assert percentiles[0] >= -rolls * bet_size
+        assert percentiles[-1] <= rolls * profit
+
+    def test_simulate_paths_win_rate(self):
+        """Dice results from 1 to 100 only win strictly under roll under."""
+        rng = np.random.default_rng(0)
+        for roll_under in (2, 11, 51, 100):
+            final, ruined = simulation.simulate_paths(
+                rng, 100000, 1, 10, 1, roll_under)
+            # a lost roll leaves 9
+            win_rate = (final > 9).mean()
+            assert abs(win_rate - (roll_under - 1) / 100) < 0.005
+            assert not ruined.any()
+
+    def test_simulate_ruin(self):
+        """
+        Betting the whole bankroll at 50% with two rolls is only ruined when
+        losing the first one, the balance after the last roll doesn't matter.
+        """
+        result = simulation.simulate(1, 1, 51, rolls=2, paths=40000, seed=0)
+        assert abs(result['risk_of_ruin'] - 0.5) < 0.01
+        # ruined paths stop betting, so never lose more than the bankroll
+        assert result['percentiles'][5] == -1
+        # with three rolls, losing the second one ruins too
+        result = simulation.simulate(1, 1, 51, rolls=3, paths=40000, seed=0)
+        assert abs(result['risk_of_ruin'] - 0.75) < 0.01
+        # a single roll never ruins
+        result = simulation.simulate(1, 1, 51, rolls=1, paths=1000, seed=0)
+        assert result['risk_of_ruin'] == 0
+
+    def test_simulate_chunks(self):
+        """Paths sampled over several chunks, the seed makes it repeatable."""
+        paths = simulation.CHUNK_PATHS + 10
+        result = simulation.simulate(1, 0.1, 50, paths=paths, seed=1)
+        assert result['paths'] == paths
+        assert result == simulation.simulate(1, 0.1, 50, paths=paths, seed=1)
+
+    def test_simulate_edge_cases(self):
+        # can't even place the first bet
+        result = simulation.simulate(0.05, 0.1, 50, paths=10)
+        assert result['risk_of_ruin'] == 1
+        assert result['expected_profit_loss'] == 0
+        # out of range parameters
+        assert simulation.simulate(1, 0.1, 1) is None
+        assert simulation.simulate(1, 0, 50) is None
+        assert simulation.simulate(1, 0.1, 50, rolls=0) is None
@@ -0,0 +1,213 @@
+import unittest
+from unittest import mock
+
+from etherollapp.etheroll import transactions
+from etherollapp.etheroll.signer import Signer
+from etherollapp.etheroll.submission import (Submission, SubmissionPipeline,
+                                             SubmissionStatus)
+
+PRIVATE_KEY = bytes.fromhex(
+    '4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318')
+ADDRESS = '2c7536e3605d9c16a7a3d7b1898e529396a65c23'
+TO = '0x46044beAa1E985C67767E04dE58181de5DAAA00F'
+
+
+def build_transaction(pyetheroll, nonce):
+    return {
+        'chainId': 1,
+        'gas': transactions.TRANSFER_GAS,
+        'gasPrice': 1,
+        'nonce': nonce,
+        'value': 1,
+        'to': TO,
+    }
+
+
+def patch_batch_request():
+    """Receipts of several transactions are looked up in one request."""
+    def batch_request(pyetheroll, calls):
+        return [{'status': '0x1'}] * len(calls)
+    return mock.patch(
+        'etherollapp.etheroll.rpc.batch_request', side_effect=batch_request)
+
+
+class TestSubmissionPipeline(unittest.TestCase):
+    """Unit tests SubmissionPipeline methods."""
+
+    def setUp(self):
+        self.pyetheroll = mock.Mock()
+        # nonce managers are per chain, keeps tests isolated
+        self.pyetheroll.chain_id = object()
+        # JSON-RPC method -> mock, called with the request params
+        self.node = mock.Mock()
+        self.node.eth_getTransactionCount.return_value = '0x3'
+        self.node.eth_sendRawTransaction.return_value = '0x' + b'hash'.hex()
+        self.node.eth_getTransactionReceipt.return_value = None
+        # reads and writes
+        for name in ('request', 'send_request'):
+            patcher = mock.patch(
+                f'etherollapp.etheroll.rpc.{name}',
+                side_effect=lambda pyetheroll, method, params: getattr(
+                    self.node, method)(*params))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.get_signer = mock.Mock(
+            return_value=Signer(ADDRESS, PRIVATE_KEY))
+        self.pipeline = SubmissionPipeline(
+            lambda: self.pyetheroll, self.get_signer, receipt_poll_seconds=0)
+        self.statuses = []
+        self.pipeline.bind(
+            lambda submission: self.statuses.append(submission.status))
+
+    def submit(self):
+        submission = self.pipeline.submit(
+            Submission('send', mock.sentinel.account, 'password',
+                       build_transaction))
+        self.pipeline.join()
+        return submission
+
+    def test_submit(self):
+        """Goes through all the steps up to mined."""
+        self.node.eth_getTransactionReceipt.side_effect = [
+            None, {'status': '0x1'}]
+        submission = self.submit()
+        assert self.statuses == [
+            SubmissionStatus.QUEUED,
+            SubmissionStatus.SIGNED,
+            SubmissionStatus.BROADCAST,
+            SubmissionStatus.MINED,
+        ]
+        assert self.get_signer.call_args_list == [
+            mock.call(mock.sentinel.account, 'password')]
+        assert submission.password is None
+        assert submission.nonce == 3
+        assert submission.tx_hash == b'hash'
+        assert submission.receipt == {'status': 1}
+        assert self.pipeline.pending == []
+
+    def test_submit_reverted(self):
+        self.node.eth_getTransactionReceipt.return_value = {
+            'status': '0x0'}
+        submission = self.submit()
+        assert self.statuses[-1] == SubmissionStatus.FAILED
+        assert str(submission.error) == 'Transaction reverted'
+
+    def test_submit_error(self):
+        """Broadcast errors fail the submission and give the nonce back."""
+        self.node.eth_sendRawTransaction.side_effect = \
+            ConnectionError('Whatever ConnectionError')
+        submission = self.submit()
+        assert self.statuses == [
+            SubmissionStatus.QUEUED,
+            SubmissionStatus.SIGNED,
+            SubmissionStatus.FAILED,
+        ]
+        assert str(submission.error) == 'Whatever ConnectionError'
+        nonce_manager = transactions.get_nonce_manager(
+            self.pyetheroll, ADDRESS)
+        assert nonce_manager.reserve() == 3
+
+    def test_submit_locked(self):
+        """Failing to unlock the account doesn't reserve any nonce."""
+        self.get_signer.side_effect = ValueError('MAC mismatch')
+        submission = self.submit()
+        assert self.statuses == [
+            SubmissionStatus.QUEUED, SubmissionStatus.FAILED]
+        assert str(submission.error) == 'MAC mismatch'
+        assert submission.password is None
+        assert self.node.eth_getTransactionCount.call_count == 0
+
+    def test_submit_decode_receipt(self):
+        """The event of interest is decoded from the receipt once mined."""
+        self.node.eth_getTransactionReceipt.return_value = {
+            'status': '0x1'}
+        decode_receipt = mock.Mock(return_value={'bet_id': '00'})
+        submission = self.pipeline.submit(
+            Submission('roll', mock.sentinel.account, 'password',
+                       build_transaction, decode_receipt=decode_receipt))
+        self.pipeline.join()
+        assert submission.status == SubmissionStatus.MINED
+        assert submission.event == {'bet_id': '00'}
+        assert decode_receipt.call_args_list == [
+            mock.call(self.pyetheroll, {'status': 1})]
+
+    def test_receipt_timeout(self):
+        """Transactions never mined stop being tracked and expire."""
+        self.pipeline.receipt_timeout_seconds = 0
+        submission = self.submit()
+        assert self.statuses[-2:] == [
+            SubmissionStatus.BROADCAST, SubmissionStatus.EXPIRED]
+        assert submission.done is True
+        assert self.pipeline.pending == []
+
+    def test_done_retention(self):
+        """Only the last finished submissions are kept."""
+        self.pipeline.done_retention = 2
+        self.node.eth_getTransactionReceipt.return_value = {
+            'status': '0x1'}
+        submissions = [self.submit() for _ in range(3)]
+        assert self.pipeline.submissions == submissions[1:]
+
+    def submit_batch(self, count):
+        submissions = self.pipeline.submit_batch([
+            Submission('roll', mock.sentinel.account, 'password',
+                       build_transaction)
+            for _ in range(count)
+        ])
+        self.pipeline.join()
+        return submissions
+
+    def test_submit_batch(self):
+        """Unlocks once, signs with consecutive nonces, broadcasts all."""
+        self.node.eth_getTransactionReceipt.return_value = {
+            'status': '0x1'}
+        with patch_batch_request():
+            submissions = self.submit_batch(3)
+        assert self.get_signer.call_count == 1
+        assert sorted(submission.nonce for submission in submissions) == [
+            3, 4, 5]
+        assert self.node.eth_sendRawTransaction.call_count == 3
+        assert [submission.status for submission in submissions] == [
+            SubmissionStatus.MINED] * 3
+        assert all(
+            submission.batch is submissions for submission in submissions)
+        # all signed before the first broadcast
+        assert self.statuses[:6] == (
+            [SubmissionStatus.QUEUED] * 3 + [SubmissionStatus.SIGNED] * 3)
+
+    def test_submit_batch_error(self):
+        """A failed broadcast leaves a gap the next transaction fills."""
+        self.node.eth_getTransactionReceipt.return_value = {
+            'status': '0x1'}
+        sent = []
+
+        def send_raw_transaction(raw_transaction):
+            if len(sent) == 1:
+                sent.append(None)
+                raise ConnectionError('Whatever ConnectionError')
+            sent.append(raw_transaction)
+            return '0x' + b'hash'.hex()
+        self.node.eth_sendRawTransaction.side_effect = send_raw_transaction
+        self.pipeline = SubmissionPipeline(
+            lambda: self.pyetheroll, self.get_signer, receipt_poll_seconds=0)
+        # broadcasts sequentially to know which one fails
+        with mock.patch(
+                'etherollapp.etheroll.submission.BROADCAST_WORKERS', 1), \
+                patch_batch_request():
+            submissions = self.submit_batch(3)
+        assert [submission.status for submission in submissions] == [
+            SubmissionStatus.MINED,
+            SubmissionStatus.FAILED,
+            SubmissionStatus.MINED,
+        ]
+        nonce_manager = transactions.get_nonce_manager(
+            self.pyetheroll, ADDRESS)
+        assert nonce_manager.gaps == [4]
+        assert nonce_manager.reserve() == 4
+
+    def test_submit_batch_locked(self):
+        self.get_signer.side_effect = ValueError('MAC mismatch')
+        submissions = self.submit_batch(2)
+        assert [submission.status for submission in submissions] == [
+            SubmissionStatus.FAILED] * 2
+        assert self.node.eth_getTransactionCount.call_count == 0
@@ -0,0 +1,98 @@
+import threading
+import unittest
+from unittest import mock
+
+import pytest
+from hexbytes import HexBytes
+
+from etherollapp.etheroll import transactions
+from etherollapp.etheroll.rpc import RPCError
+
+
+def patch_post_request():
+    return mock.patch('etherollapp.etheroll.rpc.post_request')
+
+
+def patch_send_request():
+    return mock.patch('etherollapp.etheroll.rpc.send_request')
+
+
+class TestTransactions(unittest.TestCase):
+    """Unit tests transactions functions."""
+
+    def setUp(self):
+        self.pyetheroll = mock.Mock()
+        self.signed_tx = mock.Mock(
+            rawTransaction=b'\x01\x02', hash=b'\xab' * 32)
+        patcher = mock.patch(
+            'etherollapp.etheroll.transactions.get_endpoint_uris',
+            return_value=['http://a', 'http://b'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broadcast(self):
+        """Only goes through the endpoints pool unless told otherwise."""
+        with patch_post_request() as m_post_request, \
+                patch_send_request() as m_send_request:
+            m_send_request.return_value = '0x' + 'ab' * 32
+            tx_hash = transactions.broadcast(self.pyetheroll, self.signed_tx)
+        assert tx_hash == HexBytes(b'\xab' * 32)
+        assert m_send_request.call_args_list == [mock.call(
+            self.pyetheroll, 'eth_sendRawTransaction', ['0x0102'])]
+        assert m_post_request.call_count == 0
+
+    def test_broadcast_known(self):
+        """
+        The node already knowing the transaction counts as accepting it,
+        the nonce is then marked broadcast rather than released.
+        """
+        nonce_manager = mock.Mock()
+        with patch_send_request() as m_send_request:
+            m_send_request.side_effect = RPCError('already known')
+            tx_hash = transactions.broadcast_with_nonce(
+                self.pyetheroll, nonce_manager, 3, self.signed_tx)
+        assert tx_hash == HexBytes(b'\xab' * 32)
+        assert nonce_manager.mark_broadcast.call_args_list == [mock.call(3)]
+        assert nonce_manager.release.call_count == 0
+        assert nonce_manager.resync.call_count == 0
+        # other errors still fail it
+        with patch_send_request() as m_send_request, \
+                pytest.raises(RPCError, match='nonce too low'):
+            m_send_request.side_effect = RPCError('nonce too low')
+            transactions.broadcast_with_nonce(
+                self.pyetheroll, nonce_manager, 4, self.signed_tx)
+        assert nonce_manager.release.call_args_list == [mock.call(4)]
+        assert nonce_manager.resync.call_count == 1
+
+    def test_broadcast_all(self):
+        """Endpoints already knowing the transaction count as accepting."""
+        # both endpoints get the transaction before the first one replies
+        barrier = threading.Barrier(2, timeout=1)
+
+        def post_request(uri, method, params):
+            barrier.wait()
+            raise RPCError('already known')
+        with patch_post_request() as m_post_request, \
+                patch_send_request() as m_send_request:
+            m_post_request.side_effect = post_request
+            tx_hash = transactions.broadcast(
+                self.pyetheroll, self.signed_tx, all_endpoints=True)
+        assert tx_hash == HexBytes(b'\xab' * 32)
+        assert sorted(m_post_request.call_args_list) == [
+            mock.call('http://a', 'eth_sendRawTransaction', ['0x0102']),
+            mock.call('http://b', 'eth_sendRawTransaction', ['0x0102']),
+        ]
+        assert m_send_request.call_count == 0
+
+    def test_broadcast_all_error(self):
+        """Node errors are preferred over network ones."""
+        with patch_post_request() as m_post_request:
+            m_post_request.side_effect = self.raise_per_uri
+            with pytest.raises(RPCError, match='nonce too low'):
+                transactions.broadcast_all(self.pyetheroll, self.signed_tx)
+
+    @staticmethod
+    def raise_per_uri(uri, method, params):
+        if uri == 'http://a':
+            raise ConnectionError('Whatever')
+        raise RPCError('nonce too low')
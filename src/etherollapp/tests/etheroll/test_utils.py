@@ -1,6 +1,6 @@
-from threading import Thread
+from threading import Event, Thread
 
-from etherollapp.etheroll.utils import run_in_thread
+from etherollapp.etheroll.utils import SupersedingWorker, run_in_thread
 
 
 class TestUtils:
@@ -16,3 +16,72 @@ class TestUtils:
         assert thread.is_alive() is True
         thread.join()
         assert thread.is_alive() is False
+
+
+class TestSupersedingWorker:
+
+    def test_submit(self):
+        """
+        Newer requests cancel the one in flight and drop the queued one.
+        """
+        worker = SupersedingWorker()
+        started = Event()
+        release = Event()
+        processed = []
+
+        def request(token, name):
+            if name == 'first':
+                started.set()
+                release.wait()
+            processed.append((name, token.cancelled))
+
+        first_token = worker.submit(request, 'first')
+        started.wait()
+        second_token = worker.submit(request, 'second')
+        third_token = worker.submit(request, 'third')
+        assert first_token.cancelled is True
+        assert second_token.cancelled is True
+        assert third_token.cancelled is False
+        release.set()
+        worker.join()
+        # the queued request never ran, the superseded one knows it's stale
+        assert processed == [('first', True), ('third', False)]
+
+    def test_cancel(self):
+        """Cancelling drops the queued request and flags the running one."""
+        worker = SupersedingWorker()
+        started = Event()
+        release = Event()
+        processed = []
+
+        def request(token, name):
+            started.set()
+            release.wait()
+            processed.append((name, token.cancelled))
+
+        token = worker.submit(request, 'first')
+        started.wait()
+        worker.cancel()
+        assert token.cancelled is True
+        release.set()
+        worker.join()
+        assert processed == [('first', True)]
+        # the worker can still be used afterwards
+        token = worker.submit(request, 'second')
+        worker.join()
+        assert token.cancelled is False
+        assert processed == [('first', True), ('second', False)]
+
+    def test_exception(self):
+        """A failing request doesn't prevent next ones from running."""
+        worker = SupersedingWorker()
+        processed = []
+
+        def failing_request(token):
+            raise ValueError()
+
+        worker.submit(failing_request)
+        worker.join()
+        worker.submit(lambda token: processed.append(token))
+        worker.join()
+        assert len(processed) == 1
@@ -0,0 +1,32 @@
+import shutil
+import unittest
+from tempfile import mkdtemp
+
+from etherollapp.etheroll.roll_store import GWEI, RollStore
+from etherollapp.etheroll.rolls import RollRecord
+
+
+def get_roll(index, dice_result=None, **fields):
+    """
+    1 gwei bet with a 2 gwei profit placed `index` minutes after epoch,
+    `fields` override the other `RollRecord` fields.
+    """
+    values = dict(
+        bet_id=f'{index:064x}', transaction_hash='0x' + '00' * 32,
+        block_number=index, timestamp=index * 60, bet_value_wei=GWEI,
+        profit_value_wei=2 * GWEI, roll_under=50, dice_result=dice_result)
+    values.update(fields)
+    return RollRecord(**values)
+
+
+class RollStoreTestCase(unittest.TestCase):
+    """Test case with an empty `RollStore` in a temporary directory."""
+
+    def setUp(self):
+        self.store = self.create_store()
+
+    def create_store(self):
+        """Returns a new store, removed along with its directory after."""
+        path = mkdtemp(prefix='etheroll')
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return RollStore(path)
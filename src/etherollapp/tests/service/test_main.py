@@ -1,4 +1,5 @@
 import binascii
+import shutil
 import tempfile
 import unittest
 from unittest import mock
@@ -7,6 +8,8 @@ from kivy.app import App
 from pyetheroll.constants import ChainID
 from pyetheroll.etheroll import Etheroll
 
+from etherollapp.etheroll.circuit_breaker import CircuitOpenError
+from etherollapp.etheroll.rolls import RollRecord
 from etherollapp.service.main import EtherollApp, MonitorRollsService
 
 
@@ -58,8 +61,8 @@ class TestEtherollApp(unittest.TestCase):
 class TestMonitorRollsService(unittest.TestCase):
     """Unit tests MonitorRollsService methods."""
 
-    def patch_get_merged_logs(m_get):
-        return mock.patch('etherollapp.service.main.Etheroll.get_merged_logs')
+    def patch_iter_rolls(m_get):
+        return mock.patch('etherollapp.service.main.history.iter_rolls')
 
     def test_init(self):
         """
@@ -143,39 +146,41 @@ class TestMonitorRollsService(unittest.TestCase):
 
     def test_pull_account_rolls(self):
         """
-        Makes sure the merged logs are fetched and cached.
-        Also checks were're notifying on merged logs changes.
+        Makes sure the rolls are fetched and their digest cached.
+        Also checks were're notifying on rolls changes.
         """
         service = MonitorRollsService()
         address = '46044beAa1E985C67767E04dE58181de5DAAA00F'
         m_account = mock.MagicMock()
         m_account.address = binascii.unhexlify(address)
-        # beforehand the `MonitorRollsService.merged_logs` is not yet cached
-        assert service.merged_logs == {}
+        # beforehand the `MonitorRollsService.rolls_digests` is not yet cached
+        assert service.rolls_digests == {}
         assert service.last_roll_activity is None
-        merged_logs = []
-        with self.patch_get_merged_logs() as m_get_merged_logs, \
+        with self.patch_iter_rolls() as m_iter_rolls, \
                 patch_get_abi() as m_get_abi:
-            m_get_merged_logs.return_value = merged_logs
+            m_iter_rolls.return_value = iter([])
             service.pull_account_rolls(m_account)
-        assert m_get_merged_logs.mock_calls == [
-            mock.call(address=f'0x{address.lower()}')
+        assert m_iter_rolls.mock_calls == [
+            mock.call(service.pyetheroll, f'0x{address.lower()}')
         ]
         assert m_get_abi.mock_calls == [mock.call()]
-        # then the `merged_logs` for this address should be cached
-        assert service.merged_logs == {f'0x{address.lower()}': merged_logs}
+        # then the rolls digest for this address should be cached
+        assert service.rolls_digests == {
+            f'0x{address.lower()}': (0, 0, None)}
         assert service.last_roll_activity is None
-        # if the `merged_logs` differs, we consider it was a roll activity
-        merged_logs = ['something else']
-        with self.patch_get_merged_logs() as m_get_merged_logs, \
+        # if the rolls differ, we consider it was a roll activity
+        roll = RollRecord('AB', '0xF363', None, 0, 1, 1, 2)
+        with self.patch_iter_rolls() as m_iter_rolls, \
                 mock.patch.object(
                     MonitorRollsService, 'do_notify') as m_do_notify:
-            m_get_merged_logs.return_value = merged_logs
+            m_iter_rolls.return_value = iter([roll])
             service.pull_account_rolls(m_account)
-        assert m_get_merged_logs.mock_calls == [
-            mock.call(address=f'0x{address.lower()}')
+        assert m_iter_rolls.mock_calls == [
+            mock.call(service.pyetheroll, f'0x{address.lower()}')
         ]
-        assert m_do_notify.call_args_list == [mock.call(merged_logs)]
+        assert m_do_notify.call_args_list == [mock.call(roll)]
+        assert service.rolls_digests == {
+            f'0x{address.lower()}': (1, 0, roll)}
 
     def test_pull_accounts_rolls(self):
         """
@@ -198,10 +203,76 @@ class TestMonitorRollsService(unittest.TestCase):
             mock.call(m_account),
         ]
 
-    @unittest.skip("Not implemented")
+    def test_head_moved(self):
+        """Rolls are only pulled again once a new block got mined."""
+        service = MonitorRollsService()
+        with mock.patch(
+                'etherollapp.service.main.HeadTracker.get_or_create'
+                ) as m_get_or_create, mock.patch.object(
+                    MonitorRollsService, 'pyetheroll',
+                    new_callable=mock.PropertyMock):
+            m_get_or_create.return_value.poll.side_effect = [
+                10, 10, 11, ConnectionError('Whatever')]
+            assert [service.head_moved() for _ in range(4)] == [
+                True, False, True, True]
+
+    def test_pull(self):
+        """Errors don't stop the service and polling pauses while offline."""
+        service = MonitorRollsService()
+        with mock.patch.object(
+                MonitorRollsService, 'head_moved', return_value=True
+                ), mock.patch.object(
+                    MonitorRollsService, 'pull_accounts_rolls',
+                    side_effect=ConnectionError('Whatever')
+                ) as m_pull_accounts_rolls:
+            service.pull()
+        assert m_pull_accounts_rolls.call_count == 1
+        with mock.patch(
+                'etherollapp.service.main.HeadTracker.get_or_create'
+                ) as m_get_or_create, mock.patch.object(
+                    MonitorRollsService, 'pyetheroll',
+                    new_callable=mock.PropertyMock):
+            m_get_or_create.return_value.poll.side_effect = CircuitOpenError
+            with mock.patch(
+                    'etherollapp.service.main.CircuitBreaker.is_offline',
+                    return_value=True):
+                assert service.head_moved() is False
+            # other endpoints, e.g. Etherscan, may still be reachable
+            with mock.patch(
+                    'etherollapp.service.main.CircuitBreaker.is_offline',
+                    return_value=False):
+                assert service.head_moved() is True
+
     def test_do_notify(self):
-        """Not yet implemented."""
-        raise NotImplementedError
+        """
+        Bets placed are notified once, unless already notified by the app
+        from the transaction receipt, results are always notified.
+        """
+        service = MonitorRollsService()
+        roll = RollRecord(
+            bet_id='AB', transaction_hash='0xF363', block_number=None,
+            timestamp=0, bet_value_wei=int(0.45e18), profit_value_wei=0,
+            roll_under=2)
+        resolved_roll = RollRecord(
+            bet_id='AB', transaction_hash='0xF363', block_number=None,
+            timestamp=0, bet_value_wei=int(0.45e18), profit_value_wei=0,
+            roll_under=2, dice_result=1)
+        temp_path = tempfile.mkdtemp(prefix='etheroll')
+        self.addCleanup(shutil.rmtree, temp_path, ignore_errors=True)
+        App.get_running_app()._user_data_dir = temp_path
+        with mock.patch(
+                'etherollapp.etheroll.notifications.notification') \
+                as m_notification:
+            service.do_notify(roll)
+            service.do_notify(roll)
+            service.do_notify(resolved_roll)
+            service.do_notify(resolved_roll)
+        assert m_notification.notify.call_args_list == [
+            mock.call(
+                title='Bet confirmed on chain',
+                message='0.45 ETH to roll under 2', ticker='Ticker'),
+            mock.call(title='You won', message='1 < 2', ticker='Ticker'),
+        ]
 
 
 if __name__ == '__main__':
@@ -13,6 +13,7 @@ from kivy.clock import Clock
 from kivy.core.image import Image
 from requests.exceptions import ConnectionError
 
+from etherollapp.etheroll import history
 from etherollapp.etheroll.constants import BASE_DIR
 from etherollapp.etheroll.controller import EtherollApp
 from etherollapp.etheroll.ui_utils import Dialog
@@ -39,6 +40,22 @@ def patch_fetch_update_balance():
     return patch('etherollapp.etheroll.roll.RollScreen.fetch_update_balance')
 
 
+def patch_sign_with_nonce():
+    return patch(
+        'etherollapp.etheroll.transactions.sign_with_nonce',
+        return_value=(mock.Mock(), 0, mock.Mock()))
+
+
+def patch_broadcast_with_nonce():
+    return patch('etherollapp.etheroll.transactions.broadcast_with_nonce')
+
+
+def patch_track():
+    """Receipts polling would keep a thread alive."""
+    return patch(
+        'etherollapp.etheroll.submission.SubmissionPipeline.track')
+
+
 def advance_frames(count):
     """
     Borrowed from Kivy 1.10.0+ /kivy/tests/common.py
@@ -394,13 +411,14 @@ class UITestCase(unittest.TestCase):
         self.assertIsNotNone(controller.current_account)
         screen_manager = controller.screen_manager
         # patches library with fake recent rolls
-        with patch('pyetheroll.etheroll.Etheroll.get_merged_logs') \
-                as m_get_merged_logs:
-            m_get_merged_logs.return_value = merged_logs
+        with patch(
+                'etherollapp.etheroll.history.EtherscanHistory.get_rolls'
+                ) as m_get_rolls:
+            m_get_rolls.return_value = history.to_rolls(merged_logs)
             screen_manager.current = 'roll_results_screen'
             # waits and makes sure the mock to be called, refs #138
-            self.assertTrue(self.wait_mock_called(m_get_merged_logs))
-            # since get_merged_logs got called, the get_last_results thread
+            self.assertTrue(self.wait_mock_called(m_get_rolls))
+            # since get_rolls got called, the get_last_results thread
             # should be over, only main & OSC threads only are running
             thread_info = [(t, t._target) for t in threading.enumerate()]
             self.assertEqual(
@@ -481,26 +499,14 @@ class UITestCase(unittest.TestCase):
         self.assertEqual(dialog.title, 'Enter your password')
         dialog.content.password = 'password'
         unlock_button = dialog._action_buttons[0]
-        with patch('pyetheroll.etheroll.Etheroll.player_roll_dice') \
-                as m_player_roll_dice:
-            m_player_roll_dice.return_value = HexBytes(
+        with patch_sign_with_nonce(), patch_broadcast_with_nonce() \
+                as m_broadcast_with_nonce, patch_track():
+            m_broadcast_with_nonce.return_value = HexBytes(
                 '0x7be6e37621eb12db7dc535954345f69'
                 'd8cc5644b2de0ec32a344ca33c3054237')
             unlock_button.dispatch('on_release')
-            threads = threading.enumerate()
-            # since we may run into race condition with threading.enumerate()
-            # we make the test conditional
-            if len(threads) == 3:
-                # rolls should be fetched from a thread
-                self.assertEqual(len(threads), 3)
-                player_roll_dice_thread = threads[2]
-                self.assertEqual(
-                    type(player_roll_dice_thread), threading.Thread)
-                self.assertTrue(
-                    'function Controller.player_roll_dice'
-                    in str(player_roll_dice_thread._target))
-                # waits for the end of the thread
-                player_roll_dice_thread.join()
+            # signing and broadcasting happen in the pipeline worker thread
+            controller.submission_pipeline.join()
         advance_frames_for_screen()
         # thread has ended, main & OSC threads only are running again
         self.assertEqual(len(threading.enumerate()), 2)
@@ -523,25 +529,11 @@ class UITestCase(unittest.TestCase):
         roll_screen = controller.roll_screen
         roll_button = roll_screen.ids.roll_button_id
         self.assertEqual(roll_button.text, 'Roll')
-        with patch('web3.eth.Eth.getTransactionCount') \
-                as m_getTransactionCount:
-            m_getTransactionCount.side_effect = \
-                ConnectionError('Whatever ConnectionError')
+        with patch('etherollapp.etheroll.rpc.request') as m_request:
+            m_request.side_effect = ConnectionError('Whatever ConnectionError')
             roll_button.dispatch('on_release')
-            threads = threading.enumerate()
-            # since we may run into race condition with threading.enumerate()
-            # we make the test conditional
-            if len(threads) == 3:
-                # rolls should be fetched from a thread
-                self.assertEqual(len(threads), 3)
-                player_roll_dice_thread = threads[2]
-                self.assertEqual(
-                    type(player_roll_dice_thread), threading.Thread)
-                self.assertTrue(
-                    'function Controller.player_roll_dice'
-                    in str(player_roll_dice_thread._target))
-                # waits for the end of the thread
-                player_roll_dice_thread.join()
+            # signing and broadcasting happen in the pipeline worker thread
+            controller.submission_pipeline.join()
         advance_frames_for_screen()
         # thread has ended, main & OSC threads only are running again
         self.assertEqual(len(threading.enumerate()), 2)
@@ -581,20 +573,7 @@ class UITestCase(unittest.TestCase):
         unlock_button = dialog._action_buttons[0]
         unlock_button.dispatch('on_release')
         # runs in a thread since password unlocking and tx signing takes time
-        threads = threading.enumerate()
-        # since we may run into race condition with threading.enumerate()
-        # we make the test conditional
-        if len(threads) == 3:
-            # rolls should be fetched from a thread
-            self.assertEqual(len(threads), 3)
-            player_roll_dice_thread = threads[2]
-            self.assertEqual(
-                type(player_roll_dice_thread), threading.Thread)
-            self.assertTrue(
-                'function Controller.player_roll_dice'
-                in str(player_roll_dice_thread._target))
-            # waits for the end of the thread
-            player_roll_dice_thread.join()
+        controller.submission_pipeline.join()
         advance_frames_for_screen()
         # thread has ended, main & OSC threads only are running again
         self.assertEqual(len(threading.enumerate()), 2)
@@ -659,21 +638,25 @@ class UITestCase(unittest.TestCase):
         password = 'password'
         dialog.content.password = password
         unlock_button = dialog._action_buttons[0]
-        with patch('pyetheroll.etheroll.Etheroll.transaction', autospec=True) \
-                as m_transaction:
-            m_transaction.return_value = HexBytes(
+        with patch_sign_with_nonce() as m_sign_with_nonce, \
+                patch_broadcast_with_nonce() as m_broadcast_with_nonce, \
+                patch_track():
+            m_broadcast_with_nonce.return_value = HexBytes(
                 '0x7be6e37621eb12db7dc535954345f69'
                 'd8cc5644b2de0ec32a344ca33c3054237')
             unlock_button.dispatch('on_release')
+            controller.submission_pipeline.join()
         pyetheroll = controller.pyetheroll
-        to = send_to_address
-        value = int(amount_eth * 1e18)
-        wallet_path = controller.current_account.path
-        gas_price_wei = mock.ANY
-        self.assertEqual(m_transaction.mock_calls, [
-            mock.call(
-                pyetheroll, to, value, wallet_path, password, gas_price_wei)
+        signer = mock.ANY
+        build_transaction = mock.ANY
+        self.assertEqual(m_sign_with_nonce.mock_calls, [
+            mock.call(pyetheroll, signer, build_transaction)
         ])
+        # makes sure the transfer transaction is built as expected
+        build_transaction = m_sign_with_nonce.call_args[0][2]
+        transaction = build_transaction(0)
+        self.assertEqual(transaction['to'], send_to_address)
+        self.assertEqual(transaction['value'], int(amount_eth * 1e18))
         advance_frames_for_screen()
         threads = threading.enumerate()
         # thread has ended, main & OSC threads only are running again